@@ -53,10 +53,29 @@ async def main():
     config.WHISPER_MODEL = args.model if args.model else best_model
     config.COMPUTE_TYPE = compute_type if device == "cuda" else "int8"
 
+    if args.decoding_profile:
+        config.DECODING_PROFILE = args.decoding_profile
+    if args.accurate_repass:
+        config.ACCURATE_REPASS = True
+    if args.record_opus:
+        config.RECORD_OPUS = True
+    if args.metrics_port is not None:
+        config.METRICS_PORT = args.metrics_port
+    if args.profile:
+        config.PROFILE_SECONDS = args.profile
+
+    # Memory budgets for the transcription scheduler
+    config.GPU_MEMORY_GB = sys_info["vram_gb"]
+    config.CPU_MEMORY_GB = sys_info["ram_gb"] * 0.5
+
     print(f"--- Configuration ---")
     print(f"Device: {config.DEVICE}")
     print(f"Model: {config.WHISPER_MODEL}")
     print(f"Compute: {config.COMPUTE_TYPE}")
+    print(f"Profile: {config.DECODING_PROFILE}{' (+accurate re-pass)' if config.ACCURATE_REPASS else ''}")
+    print(f"Recording: {'opus passthrough' if config.RECORD_OPUS else 'wav'}")
+    if config.PROFILE_SECONDS:
+        print(f"Profiling: first {config.PROFILE_SECONDS:g}s of each recording and transcription")
     print(f"Cache: {config.HF_CACHE_DIR}")
     print(f"---------------------")
 
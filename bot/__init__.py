@@ -1,9 +1,98 @@
+import asyncio
+
+import discord
 from discord.ext import commands
 
+from bot.processing.progress import ProgressMonitor
+from bot.processing.scheduler import TranscriptionScheduler
+from bot.processing.summarizer import SummaryRefresher
+from bot.utils.logger import setup_logging, start_span
+from bot.utils.loop_monitor import LoopLagMonitor
+from bot.utils.metrics import MetricsExporter
+from bot.utils.session_index import ensure_index
+from bot.utils.retention import MaintenanceTask
+
 class MeetingBot(commands.Bot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
         self.voice_client = None
         self.recording = None
-        self.recorder = None
\ No newline at end of file
+        self.recorder = None
+
+        # Transcription progress reported by worker processes
+        self.progress = ProgressMonitor()
+
+        # Admits transcription jobs by estimated memory cost
+        self.scheduler = TranscriptionScheduler(self.progress.queue)
+
+        # /summary refreshes, run one at a time outside the bot process
+        self.summaries = SummaryRefresher()
+
+        # Compresses transcribed sessions and applies retention in the background
+        self.maintenance = MaintenanceTask(self)
+
+        # Logs (with a stack) any callback that holds the event loop too long
+        self.loop_monitor = LoopLagMonitor()
+
+        # /metrics endpoint and optional file dump, served from daemon threads
+        self.metrics = MetricsExporter()
+
+    async def setup_hook(self):
+        setup_logging("bot")
+        # Indexes sessions recorded before the index existed; reads every session's files
+        await asyncio.to_thread(ensure_index)
+        self.metrics.start()
+        self.loop_monitor.start()
+        self.progress.start()
+        self.scheduler.start()
+        self.maintenance.start()
+
+    async def stop_recording(self, status_channel=None, reason="auto", profile=None):
+        """
+        Finalizes the active recording and queues it for transcription, with a
+        status message in `status_channel`. Does nothing once stopped.
+        """
+        recorder = self.recorder
+        if not self.recording or recorder is None:
+            return
+        self.recording = False
+
+        session_id = recorder.session_dir.name
+        # Until every track is flushed and the final metadata is written
+        stop_span = start_span("stop", session_id, reason=reason)
+
+        if self.voice_client and self.voice_client.is_listening():
+            self.voice_client.stop_listening()
+        else:
+            # Already disconnected; cleanup is idempotent if voice_recv runs it too
+            await asyncio.to_thread(recorder.cleanup)
+
+        # Tracks must be flushed and metadata final before transcribing
+        closed = await recorder.wait_closed()
+        stop_span.end(status="ok" if closed else "timeout")
+        if not closed:
+            # Transcribing now would read half-flushed tracks and a "recording" metadata.json
+            print(f"Recorder cleanup for {session_id} is still running, not transcribing it")
+            await self.post_status(
+                status_channel, session_id,
+                f"❌ `{session_id}` did not finish saving and was not transcribed. "
+                f"Queue it with `python -m bot.processing.backfill --status missing` once it is saved."
+            )
+            return
+
+        # Status message edited as the worker reports progress
+        status_message = await self.post_status(status_channel, session_id, f"⏳ `{session_id}` waiting for transcription")
+        self.progress.watch(session_id, status_message, status_channel)
+
+        guild = getattr(status_channel, "guild", None) or (self.voice_client.guild if self.voice_client else None)
+        await self.scheduler.submit(recorder.session_dir, guild.id if guild else None, profile)
+
+    async def post_status(self, channel, session_id, content):
+        if channel is None:
+            return None
+        try:
+            return await channel.send(content)
+        except discord.HTTPException as e:
+            print(f"Failed to post status for {session_id}: {e}")
+            return None
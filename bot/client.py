@@ -5,7 +5,10 @@ from bot import MeetingBot
 from bot.commands.voice_commands import setup_voice_commands
 from bot.commands.tts_commands import setup_tts_commands
 from bot.commands.session_commands import setup_session_commands
-from bot.processing.pipeline import spawn_processing
+from bot.commands.language_commands import setup_language_commands
+from bot.commands.profile_commands import setup_profile_commands
+from bot.commands.speaker_commands import setup_speaker_commands
+import bot.utils.config as config
 from bot.utils.config import BOT_TOKEN
 
 bot = MeetingBot(command_prefix="?", intents=discord.Intents.all())
@@ -17,6 +20,21 @@ async def on_ready():
     print(f"Logged in as {bot.user}")
     
 # ---------- Auto Leave When Alone ----------
+
+# One pending leave timer per voice channel, cancelled when a human rejoins
+empty_timers = {}
+
+
+def humans_in(channel):
+    return [m for m in channel.members if not m.bot]
+
+
+def cancel_empty_timer(channel_id):
+    timer = empty_timers.pop(channel_id, None)
+    if timer is not None:
+        timer.cancel()
+
+
 @bot.event
 async def on_voice_state_update(member, before, after):
     
@@ -28,7 +46,9 @@ async def on_voice_state_update(member, before, after):
     # ---- Bot kicked detection ----
     if member == bot.user and after.channel is None:
         print("Bot was disconnected.")
-        await stop_recording()
+        if before.channel is not None:
+            cancel_empty_timer(before.channel.id)
+        await bot.stop_recording(reason="disconnected")
         return
 
     # ---- Empty channel detection ----
@@ -36,64 +56,64 @@ async def on_voice_state_update(member, before, after):
     if channel is None:
         return
 
-    humans = [m for m in channel.members if not m.bot]
-
-    if len(humans) == 0:
-        await handle_empty_channel()
-
-
-async def stop_recording():
+    # Events from other channels cannot change who is in ours
+    if channel not in (before.channel, after.channel):
+        return
 
+    if humans_in(channel):
+        cancel_empty_timer(channel.id)
+    elif channel.id not in empty_timers:
+        # Debounced: later events while empty keep the running timer
+        empty_timers[channel.id] = asyncio.create_task(handle_empty_channel(channel))
 
-    bot.recording = False
 
-    if bot.voice_client and bot.voice_client.is_listening():
-        bot.voice_client.stop_listening()
-        
-        if bot.recorder:
-            spawn_processing(bot.recorder.session_dir)
-        
+async def handle_empty_channel(channel):
 
-async def handle_empty_channel():
+    print(f"Channel {channel} empty. Waiting {config.AUTO_LEAVE_SECONDS:.0f} seconds.")
 
-    print("Channel empty. Waiting 30 seconds.")
+    try:
+        await asyncio.sleep(config.AUTO_LEAVE_SECONDS)
+    except asyncio.CancelledError:
+        print(f"Someone rejoined {channel}. Staying.")
+        raise
+    finally:
+        # Past the wait nothing may cancel the stop: not a rejoin, not our own disconnect
+        if empty_timers.get(channel.id) is asyncio.current_task():
+            del empty_timers[channel.id]
 
-    await asyncio.sleep(30)
-
-    if bot.voice_client is None:
+    # Moved elsewhere, or someone came back without a cancelling event
+    if bot.voice_client is None or bot.voice_client.channel != channel or humans_in(channel):
         return
-    
-    
 
-    channel = bot.voice_client.channel
-    humans = [m for m in channel.members if not m.bot]
-
-    if len(humans) == 0:
-        print("Still empty. Leaving.")
-        if bot.recording:
-            stop_recording()
-            print("Stopped recording.")
-        await bot.voice_client.disconnect()
+    print("Still empty. Leaving.")
+    voice_client = bot.voice_client
+    if bot.recording:
+        # Voice channels have their own text chat for the status message
+        await bot.stop_recording(channel)
+        print("Stopped recording.")
+    await voice_client.disconnect()
+    if bot.voice_client is voice_client:
+        bot.voice_client = None
 
 
 async def run_bot():
     setup_voice_commands(bot)
     setup_tts_commands(bot)
     setup_session_commands(bot)
+    setup_language_commands(bot)
+    setup_profile_commands(bot)
+    setup_speaker_commands(bot)
     
     # Add cleanup handler
     @bot.event
     async def on_close():
         print("Bot shutting down...")
         
+        for channel_id in list(empty_timers):
+            cancel_empty_timer(channel_id)
+
         # Stop recording if active
-        if bot.recording and bot.voice_client and bot.voice_client.is_listening():
-            bot.voice_client.stop_listening()
-            
-            # Save recorder data
-            if bot.recorder:
-                bot.recorder.cleanup()
-                spawn_processing(bot.recorder.session_dir)
+        await bot.stop_recording(reason="shutdown")
         
         # Disconnect from voice
         if bot.voice_client:
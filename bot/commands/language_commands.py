@@ -0,0 +1,61 @@
+import asyncio
+from typing import Optional
+
+from discord import app_commands, Interaction, Member
+
+from bot import MeetingBot
+import bot.utils.config as config
+from bot.utils.language_store import pin_user_language, set_guild_language
+
+# Display names for MEETING_LANGUAGES
+LANGUAGE_NAMES = {
+    "en": "English",
+    "si": "Sinhala",
+    "ta": "Tamil"
+}
+
+def setup_language_commands(bot: MeetingBot):
+
+    # ---------- Language Command ----------
+    @bot.tree.command(name="language", description="Pin the transcription language for this server or a member")
+    @app_commands.describe(
+        language="Language to transcribe in, or auto to detect it",
+        user="Member to pin (leave empty for the whole server)"
+    )
+    @app_commands.choices(language=[
+        app_commands.Choice(name=LANGUAGE_NAMES.get(code, code), value=code)
+        for code in config.MEETING_LANGUAGES
+    ] + [app_commands.Choice(name="Auto detect", value="auto")])
+    async def language(
+        interaction: Interaction,
+        language: str,
+        user: Optional[Member] = None
+    ):
+        value = None if language == "auto" else language
+        can_manage = interaction.guild is not None and interaction.user.guild_permissions.manage_guild
+
+        if user is None:
+            if not can_manage:
+                await interaction.response.send_message(
+                    "You need the Manage Server permission to set the server language.",
+                    ephemeral=True
+                )
+                return
+
+            await asyncio.to_thread(set_guild_language, interaction.guild.id, value)
+            target = "this server"
+        else:
+            if user.id != interaction.user.id and not can_manage:
+                await interaction.response.send_message(
+                    "You can only pin your own language.",
+                    ephemeral=True
+                )
+                return
+
+            await asyncio.to_thread(pin_user_language, user.id, value)
+            target = user.display_name
+
+        await interaction.response.send_message(
+            f"Transcription language for {target}: {LANGUAGE_NAMES.get(language, language) if value else 'auto detect'}",
+            ephemeral=True
+        )
@@ -0,0 +1,59 @@
+from typing import Optional
+
+from discord import app_commands, Interaction
+
+from bot import MeetingBot
+import bot.utils.config as config
+from bot.utils.profiler import profile_dir, signal_workers, start_profiling
+
+
+def setup_profile_commands(bot: MeetingBot):
+
+    # ---------- Profile Command ----------
+    @bot.tree.command(name="profile", description="Profile CPU and memory of the bot and transcription workers (admin only)")
+    @app_commands.describe(
+        seconds="Length of the bot's profiling window",
+        target="Which processes to profile"
+    )
+    @app_commands.choices(target=[
+        app_commands.Choice(name="Bot and workers", value="all"),
+        app_commands.Choice(name="Bot only", value="bot"),
+        app_commands.Choice(name="Workers only", value="workers")
+    ])
+    @app_commands.default_permissions(administrator=True)
+    async def profile(
+        interaction: Interaction,
+        seconds: Optional[app_commands.Range[int, 1, 600]] = None,
+        target: str = "all"
+    ):
+        if interaction.guild is None or not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message(
+                "You need the Administrator permission to profile the bot.",
+                ephemeral=True
+            )
+            return
+
+        seconds = seconds or config.PROFILE_DEFAULT_SECONDS
+        lines = []
+
+        if target in ("all", "bot"):
+            session_dir = bot.recorder.session_dir if bot.recording and bot.recorder else None
+            out_dir = profile_dir(session_dir)
+            if start_profiling(out_dir, "bot", seconds, session_dir.name if session_dir else None):
+                lines.append(f"Bot: profiling for {min(seconds, config.PROFILE_MAX_SECONDS):g}s into `{out_dir}`")
+            else:
+                lines.append("Bot: a profile is already running")
+
+        if target in ("all", "workers"):
+            pids = [job.process.pid for job in bot.scheduler.running_jobs() if job.process is not None]
+            reached = signal_workers(pids)
+            if reached:
+                lines.append(
+                    f"Workers: profiling {len(reached)} worker(s) for "
+                    f"{config.PROFILE_SECONDS or config.PROFILE_DEFAULT_SECONDS:g}s or until they finish, "
+                    "into each session's `profiles` folder"
+                )
+            else:
+                lines.append("Workers: no transcription is running")
+
+        await interaction.response.send_message("\n".join(lines), ephemeral=True)
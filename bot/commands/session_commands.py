@@ -1,9 +1,196 @@
 from bot import MeetingBot
-from discord import Interaction
+import bot.utils.config as config
+from bot.processing.exporters import DEFAULT_FORMATS, export_session
+from bot.processing.pipeline import MANIFEST_FILE, Manifest
+from bot.processing.progress import format_duration
+from bot.processing.summarizer import SUMMARY_FILE
+from bot.processing.transcript_db import get_connection, iter_transcripts, ms_to_datetime
+from bot.utils.session_index import is_transcribed, search_sessions
+from bot.voice.activity import load_activity, talk_share
+from discord import app_commands, File, Interaction
 from pathlib import Path
+import asyncio
+import gzip
 import json
+import os
+import shutil
 from datetime import datetime
 
+# Discord's upload limit for servers without boosts
+DEFAULT_FILESIZE_LIMIT = 10 * 1024 * 1024
+
+
+# =========================================================
+# Transcript Helpers
+# =========================================================
+
+def resolve_session_dir(session_id):
+    """Returns the session folder for `session_id`, or None if it is not a transcribed session."""
+    sessions_dir = Path(config.SESSIONS_DIR).resolve()
+    session_dir = (sessions_dir / session_id).resolve()
+
+    # Reject anything that escapes the sessions folder
+    if session_dir.parent != sessions_dir:
+        return None
+    if not (session_dir / "transcriptions.db").exists():
+        return None
+    return session_dir
+
+
+def transcript_ready(session_dir):
+    """
+    Whether the pipeline has finished the session's transcript. The DB
+    exists from the first pipeline run, so it says nothing on its own.
+    """
+    # A re-pass keeps the flag: the merge replaces the rows in one transaction
+    # and exports are swapped in whole, so readers see the old or the new transcript
+    transcribed = is_transcribed(session_dir.name, session_dir.parent)
+    if transcribed is None:
+        # Not indexed: a finished merge stage means the transcripts table is complete
+        transcribed = "merge" in Manifest(session_dir / MANIFEST_FILE).stages
+    return transcribed
+
+
+def prepare_transcript_file(session_dir, fmt):
+    """
+    Returns a path to upload. Exports are streamed from the DB only if
+    missing, and large files are gzipped on disk in fixed-size blocks.
+    """
+    path = session_dir / f"transcript.{fmt}"
+    if not path.exists():
+        export_session(session_dir, [fmt])
+
+    if path.stat().st_size <= config.TRANSCRIPT_GZIP_THRESHOLD:
+        return path
+
+    # Stamped with its source's mtime, so a re-export swapped in meanwhile is noticed
+    gz_path = path.with_name(path.name + ".gz")
+    if not gz_path.exists() or gz_path.stat().st_mtime_ns != path.stat().st_mtime_ns:
+        tmp_path = gz_path.with_name(gz_path.name + ".tmp")
+        with open(path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+            source_mtime_ns = os.fstat(src.fileno()).st_mtime_ns
+        os.utime(tmp_path, ns=(source_mtime_ns, source_mtime_ns))
+        tmp_path.replace(gz_path)
+    return gz_path
+
+
+def read_transcript_pages(session_dir, max_pages, page_size=1900):
+    """
+    Reads at most `max_pages` message-sized pages from the session DB.
+    Returns (pages, truncated).
+    """
+    pages = []
+    page = ""
+
+    with get_connection(session_dir / "transcriptions.db") as conn:
+        for start_ms, end_ms, user_id, username, text in iter_transcripts(conn, session_dir.name):
+            line = f"`{ms_to_datetime(start_ms):%H:%M:%S}` **{username}:** {text}\n"[:page_size]
+
+            if len(page) + len(line) > page_size:
+                pages.append(page)
+                page = ""
+                if len(pages) == max_pages:
+                    return pages, True
+
+            page += line
+
+    if page:
+        pages.append(page)
+    return pages, False
+
+
+def build_session_lines(verbose=False, all=False):
+    """
+    Reads every session's metadata for /sessions. Runs in a worker thread.
+    Returns the listing lines, or an error message string.
+    """
+    sessions_dir = Path("sessions")
+
+    if not sessions_dir.exists():
+        return "No sessions directory found."
+
+    # Get all session directories
+    session_folders = sorted(
+        [d for d in sessions_dir.iterdir() if d.is_dir()],
+        key=lambda x: x.name,
+        reverse=True  # Most recent first
+    )
+
+    if not session_folders:
+        return "No sessions found."
+
+    # Build response
+    lines = [f"**Found {len(session_folders)} session(s)**\n"]
+
+    for session_dir in session_folders:
+        metadata_path = session_dir / "metadata.json"
+
+        # Check if metadata exists
+        if not metadata_path.exists():
+            if all:
+                lines.append(f"🔴 **[CORRUPTED]** `{session_dir.name}`")
+            continue
+
+        try:
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+
+            # Parse session start time
+            session_start = metadata.get("session_start", "Unknown")
+            try:
+                dt = datetime.fromisoformat(session_start)
+                formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
+            except:
+                formatted_time = session_start
+
+            # Basic info
+            channel_info = metadata.get("channel", {})
+            channel_name = channel_info.get("name", "Unknown")
+            user_count = len(metadata.get("users", {}))
+
+            if verbose:
+                # Detailed listing
+                lines.append(f"\n📁 **Session:** `{session_dir.name}`")
+                lines.append(f"   ⏰ **Time:** {formatted_time}")
+                lines.append(f"   🔊 **Channel:** {channel_name}")
+
+                # Category info
+                category_name = channel_info.get("category_name")
+                if category_name:
+                    lines.append(f"   📂 **Category:** {category_name}")
+
+                # Users, with talk time from the activity meter when it was recorded
+                users = metadata.get("users", {})
+                if users:
+                    talk = talk_share(load_activity(session_dir))
+                    lines.append(f"   👥 **Participants ({user_count}):**")
+                    for user_id, user_data in users.items():
+                        user_name = user_data.get("name", "Unknown")
+                        if user_id in talk:
+                            talk_ms, share = talk[user_id]
+                            lines.append(f"      • {user_name} - {format_duration(talk_ms / 1000)} talking ({share:.0%})")
+                        else:
+                            lines.append(f"      • {user_name}")
+
+                # Check for transcript
+                if transcript_ready(session_dir):
+                    lines.append(f"   ✅ **Transcript:** Available")
+                else:
+                    lines.append(f"   ⏳ **Transcript:** Processing/Not available")
+            else:
+                # Compact listing
+                lines.append(
+                    f"📁 `{session_dir.name}` - {formatted_time} - "
+                    f"#{channel_name} - {user_count} participant(s)"
+                )
+
+        except Exception as e:
+            if all:
+                lines.append(f"⚠️ **[ERROR]** `{session_dir.name}` - {str(e)}")
+
+    return lines
+
 
 def setup_session_commands(bot: MeetingBot):
     
@@ -16,94 +203,12 @@ def setup_session_commands(bot: MeetingBot):
     ):
         await interaction.response.defer(ephemeral=True)
         
-        sessions_dir = Path("sessions")
-        
-        if not sessions_dir.exists():
-            await interaction.followup.send(
-                "No sessions directory found.",
-                ephemeral=True
-            )
+        # Reading every metadata.json would stall the event loop
+        lines = await asyncio.to_thread(build_session_lines, verbose, all)
+        if isinstance(lines, str):
+            await interaction.followup.send(lines, ephemeral=True)
             return
-        
-        # Get all session directories
-        session_folders = sorted(
-            [d for d in sessions_dir.iterdir() if d.is_dir()],
-            key=lambda x: x.name,
-            reverse=True  # Most recent first
-        )
-        
-        if not session_folders:
-            await interaction.followup.send(
-                "No sessions found.",
-                ephemeral=True
-            )
-            return
-        
-        # Build response
-        lines = [f"**Found {len(session_folders)} session(s)**\n"]
-        
-        for session_dir in session_folders:
-            metadata_path = session_dir / "metadata.json"
-            
-            # Check if metadata exists
-            if not metadata_path.exists():
-                if all:
-                    lines.append(f"🔴 **[CORRUPTED]** `{session_dir.name}`")
-                continue
-            
-            try:
-                with open(metadata_path, "r", encoding="utf-8") as f:
-                    metadata = json.load(f)
-                
-                # Parse session start time
-                session_start = metadata.get("session_start", "Unknown")
-                try:
-                    dt = datetime.fromisoformat(session_start)
-                    formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-                except:
-                    formatted_time = session_start
-                
-                # Basic info
-                channel_info = metadata.get("channel", {})
-                channel_name = channel_info.get("name", "Unknown")
-                user_count = len(metadata.get("users", {}))
-                
-                if verbose:
-                    # Detailed listing
-                    lines.append(f"\n📁 **Session:** `{session_dir.name}`")
-                    lines.append(f"   ⏰ **Time:** {formatted_time}")
-                    lines.append(f"   🔊 **Channel:** {channel_name}")
-                    
-                    # Category info
-                    category_name = channel_info.get("category_name")
-                    if category_name:
-                        lines.append(f"   📂 **Category:** {category_name}")
-                    
-                    # Users
-                    users = metadata.get("users", {})
-                    if users:
-                        lines.append(f"   👥 **Participants ({user_count}):**")
-                        for user_id, user_data in users.items():
-                            user_name = user_data.get("name", "Unknown")
-                            lines.append(f"      • {user_name}")
-                    
-                    # Check for transcript
-                    transcript_path = session_dir / "transcript.txt"
-                    if transcript_path.exists():
-                        lines.append(f"   ✅ **Transcript:** Available")
-                    else:
-                        lines.append(f"   ⏳ **Transcript:** Processing/Not available")
-                else:
-                    # Compact listing
-                    lines.append(
-                        f"📁 `{session_dir.name}` - {formatted_time} - "
-                        f"#{channel_name} - {user_count} participant(s)"
-                    )
-                    
-            except Exception as e:
-                if all:
-                    lines.append(f"⚠️ **[ERROR]** `{session_dir.name}` - {str(e)}")
-        
+
         # Discord has a 2000 character limit per message
         response = "\n".join(lines)
         
@@ -130,3 +235,143 @@ def setup_session_commands(bot: MeetingBot):
                 await interaction.channel.send(chunk)
         else:
             await interaction.followup.send(response, ephemeral=True)
+
+
+    # ---------- Transcript Command ----------
+    @bot.tree.command(name="transcript", description="Fetch the transcript of a recording session")
+    @app_commands.describe(
+        session="Session ID (see /sessions)",
+        format="File format, or 'messages' to post it in chat"
+    )
+    @app_commands.choices(format=[
+        app_commands.Choice(name=fmt, value=fmt) for fmt in (*DEFAULT_FORMATS, "messages")
+    ])
+    async def transcript(
+        interaction: Interaction,
+        session: str,
+        format: str = "txt"
+    ):
+        await interaction.response.defer(ephemeral=True)
+
+        session_dir = resolve_session_dir(session)
+        if session_dir is None:
+            await interaction.followup.send(
+                f"No transcript found for session `{session}`.",
+                ephemeral=True
+            )
+            return
+
+        # A partial export would be kept and served as the finished transcript
+        if not await asyncio.to_thread(transcript_ready, session_dir):
+            await interaction.followup.send(
+                f"Session `{session}` is still being processed.",
+                ephemeral=True
+            )
+            return
+
+        if format == "messages":
+            pages, truncated = await asyncio.to_thread(
+                read_transcript_pages, session_dir, config.TRANSCRIPT_MAX_MESSAGES
+            )
+
+            if not pages:
+                await interaction.followup.send("Transcript is empty.", ephemeral=True)
+                return
+
+            for page in pages:
+                await interaction.followup.send(page, ephemeral=True)
+
+            if truncated:
+                await interaction.followup.send(
+                    f"Transcript continues. Use `/transcript session:{session} format:txt` for the full file.",
+                    ephemeral=True
+                )
+            return
+
+        path = await asyncio.to_thread(prepare_transcript_file, session_dir, format)
+
+        limit = interaction.guild.filesize_limit if interaction.guild else DEFAULT_FILESIZE_LIMIT
+        if path.stat().st_size > limit:
+            await interaction.followup.send(
+                f"Transcript is too large to upload ({path.stat().st_size // 1024} KB).",
+                ephemeral=True
+            )
+            return
+
+        # discord.File opens the path lazily and streams it during upload
+        await interaction.followup.send(
+            f"Transcript for `{session}`",
+            file=File(path, filename=f"{session}.{path.name.split('.', 1)[1]}"),
+            ephemeral=True
+        )
+
+    @transcript.autocomplete("session")
+    async def transcript_session_autocomplete(interaction: Interaction, current: str):
+        rows = await asyncio.to_thread(search_sessions, current)
+
+        return [
+            app_commands.Choice(
+                name=f"{session_id} #{channel_name or 'unknown'}{'' if transcribed else ' (processing)'}"[:100],
+                value=session_id
+            )
+            for session_id, session_start, channel_name, transcribed in rows
+        ]
+
+
+    # ---------- Summary Command ----------
+    @bot.tree.command(name="summary", description="Fetch the summary of a recording session")
+    @app_commands.describe(
+        session="Session ID (see /sessions)",
+        refresh="Summarize again (only changed parts of the transcript are redone)"
+    )
+    async def summary(
+        interaction: Interaction,
+        session: str,
+        refresh: bool = False
+    ):
+        await interaction.response.defer(ephemeral=True)
+
+        session_dir = resolve_session_dir(session)
+        if session_dir is None:
+            await interaction.followup.send(
+                f"No transcript found for session `{session}`.",
+                ephemeral=True
+            )
+            return
+
+        # A summary of a partial transcript would be cached as the final one
+        if not await asyncio.to_thread(transcript_ready, session_dir):
+            await interaction.followup.send(
+                f"Session `{session}` is still being processed.",
+                ephemeral=True
+            )
+            return
+
+        path = session_dir / SUMMARY_FILE
+        if refresh or not path.exists():
+            if config.SUMMARY_BACKEND == "off":
+                await interaction.followup.send("Summaries are disabled.", ephemeral=True)
+                return
+            try:
+                path = await bot.summaries.refresh(session_dir)
+            except Exception as e:
+                await interaction.followup.send(f"Failed to summarize `{session}`: {e}", ephemeral=True)
+                return
+
+        if path is None:
+            await interaction.followup.send("Transcript is empty.", ephemeral=True)
+            return
+
+        text = await asyncio.to_thread(path.read_text, encoding="utf8")
+        if len(text) <= 1900:
+            await interaction.followup.send(text, ephemeral=True)
+            return
+
+        await interaction.followup.send(
+            f"Summary for `{session}`",
+            file=File(path, filename=f"{session}.summary.md"),
+            ephemeral=True
+        )
+
+    # Same suggestions as /transcript
+    summary.autocomplete("session")(transcript_session_autocomplete)
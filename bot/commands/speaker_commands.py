@@ -0,0 +1,42 @@
+import asyncio
+
+from discord import app_commands, Interaction, Member
+
+from bot import MeetingBot
+from bot.utils.language_store import set_shared_account
+
+
+def setup_speaker_commands(bot: MeetingBot):
+
+    # ---------- Shared Account Command ----------
+    @bot.tree.command(name="shared", description="Mark a member's account as used by several people, so it is split into speakers")
+    @app_commands.describe(
+        user="Member whose account is shared (leave empty for yourself)",
+        shared="Whether several people talk through this account"
+    )
+    async def shared_account(
+        interaction: Interaction,
+        shared: bool,
+        user: Member = None
+    ):
+        user = user or interaction.user
+        can_manage = interaction.guild is not None and interaction.user.guild_permissions.manage_guild
+
+        if user.id != interaction.user.id and not can_manage:
+            await interaction.response.send_message(
+                "You can only mark your own account as shared.",
+                ephemeral=True
+            )
+            return
+
+        await asyncio.to_thread(set_shared_account, user.id, shared)
+
+        # The running session picks it up too
+        if bot.recording and bot.recorder:
+            bot.recorder.set_shared(user.id, shared)
+
+        if shared:
+            message = f"{user.display_name}'s audio will be split into sub-speakers (Speaker 1, Speaker 2, ...)."
+        else:
+            message = f"{user.display_name}'s audio will be attributed to them alone."
+        await interaction.response.send_message(message, ephemeral=True)
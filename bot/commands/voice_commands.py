@@ -1,8 +1,12 @@
+import asyncio
+
 from bot import MeetingBot
 import bot.utils.config as config
 from bot.voice.recorder import Recorder
-from bot.processing.pipeline import spawn_processing
-from discord import FFmpegPCMAudio, Interaction
+from bot.processing.captions import LiveCaptions
+from bot.processing.profiles import PROFILES
+from bot.utils.logger import span, start_span
+from discord import app_commands, FFmpegPCMAudio, Interaction, TextChannel
 from discord.ext import voice_recv
 
 def setup_voice_commands(bot: MeetingBot):
@@ -21,7 +25,10 @@ def setup_voice_commands(bot: MeetingBot):
         await interaction.response.defer(ephemeral=True)
 
         channel = interaction.user.voice.channel
-        bot.voice_client = await channel.connect(cls=voice_recv.VoiceRecvClient)
+
+        # No session exists yet; the channel ID links this to record_start
+        with span("join", None, channel_id=channel.id, guild_id=channel.guild.id):
+            bot.voice_client = await channel.connect(cls=voice_recv.VoiceRecvClient)
 
         await interaction.followup.send(
             "Joined voice channel",
@@ -31,7 +38,8 @@ def setup_voice_commands(bot: MeetingBot):
 
     # ---------- Start Recording ----------
     @bot.tree.command(name="record", description="Start recording meeting")
-    async def record(interaction: Interaction):
+    @app_commands.describe(captions="Post live captions to this text channel while recording")
+    async def record(interaction: Interaction, captions: TextChannel = None):
         
         if bot.voice_client is None:
             await interaction.response.send_message(
@@ -43,12 +51,45 @@ def setup_voice_commands(bot: MeetingBot):
         # Defer immediately
         await interaction.response.defer(ephemeral=True)
 
-        bot.recorder = Recorder(channel=bot.voice_client.channel)
-        bot.voice_client.listen(bot.recorder)
+        record_span = start_span("record_start", channel_id=bot.voice_client.channel.id)
+
+        live_captions = None
+        notes = []
+        if captions is not None:
+            if config.RECORD_OPUS:
+                # Opus passthrough keeps no PCM to caption
+                notes.append("Live captions need PCM recording and are off while RECORD_OPUS is set")
+            else:
+                live_captions = LiveCaptions(captions, bot.voice_client.guild.id)
+                try:
+                    await live_captions.start()
+                    notes.append(f"Live captions in {captions.mention}")
+                except Exception as e:
+                    live_captions = None
+                    notes.append(f"Live captions unavailable: {e}")
+
+        recorder = None
+        try:
+            recorder = await Recorder.create(channel=bot.voice_client.channel, captions=live_captions)
+            bot.voice_client.listen(recorder)
+        except Exception as e:
+            # The caption thread and board task would otherwise outlive the failed start
+            if recorder is not None:
+                await asyncio.to_thread(recorder.cleanup)
+            elif live_captions is not None:
+                await asyncio.to_thread(live_captions.close)
+            record_span.end(status="error", error=repr(e))
+            await interaction.followup.send(f"Failed to start recording: {e}", ephemeral=True)
+            return
+
+        bot.recorder = recorder
         bot.recording = True
+
+        record_span.session_id = bot.recorder.session_dir.name
+        record_span.end()
         
         await interaction.followup.send(
-            "Recording started",
+            "\n".join(["Recording started"] + notes),
             ephemeral=True
         )
         
@@ -64,15 +105,15 @@ def setup_voice_commands(bot: MeetingBot):
 
     # ---------- Stop Recording ----------
     @bot.tree.command(name="stop", description="Stop recording meeting")
-    async def stop(interaction: Interaction):
+    @app_commands.describe(profile="Decoding profile: fast gives a quick draft, accurate is slower")
+    @app_commands.choices(profile=[
+        app_commands.Choice(name=name, value=name) for name in PROFILES
+    ])
+    async def stop(interaction: Interaction, profile: str = None):
         # Defer immediately
         await interaction.response.defer(ephemeral=True)
         
-        bot.recording = False
-
-        if bot.voice_client and bot.voice_client.is_listening():
-            bot.voice_client.stop_listening()
-
+        if bot.recording and bot.recorder is not None:
             await interaction.followup.send(
                 "Recording stopped. Processing transcription...",
                 ephemeral=True
@@ -85,14 +126,9 @@ def setup_voice_commands(bot: MeetingBot):
             # Play audio using FFmpeg
             audio = FFmpegPCMAudio(f"{config.SPEECH_CACHE_DIR}/stop.mp3")
             bot.voice_client.play(audio)
-            
-            # Spawn processing (non-blocking)
-            if bot.recorder:
-                print("model:", config.WHISPER_MODEL)
-                print("device:", config.DEVICE)
-                print("compute:", config.COMPUTE_TYPE)
-                
-                spawn_processing(bot.recorder.session_dir, config.WHISPER_MODEL, config.DEVICE, config.COMPUTE_TYPE, config.HF_CACHE_DIR)
+
+            # Same path as auto-leave: flush, status message, queue for transcription
+            await bot.stop_recording(interaction.channel, reason="command", profile=profile)
         else:
             await interaction.followup.send(
                 "No active recording to stop",
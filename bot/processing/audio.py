@@ -0,0 +1,178 @@
+"""
+Zero-copy WAV loading for the transcriber.
+
+The recorder's WAVs are 48 kHz stereo int16 and mostly silence padding.
+Instead of letting PyAV decode a whole file into fresh arrays, the PCM
+is memory-mapped and converted to Whisper's 16 kHz mono float32 in
+fixed-size chunks: downmix, anti-alias low-pass, decimate. Only one
+chunk of intermediates exists at a time. Long tracks are written into a
+file-backed output array, so the kernel can page it out.
+"""
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from faster_whisper import decode_audio
+
+import bot.utils.config as config
+
+SAMPLING_RATE = 16000
+
+# Seconds of input converted per step
+CHUNK_SECONDS = 30
+
+# Windowed-sinc low-pass taps, cutoff just under the 8 kHz Nyquist of the output
+FILTER_TAPS = 63
+FILTER_CUTOFF_HZ = 7600
+
+
+def read_wav_layout(filepath):
+    """
+    Returns (data_offset, channels, sampwidth, framerate, n_frames) for PCM WAVs.
+    The frame count comes from the file size, so unfinished headers are fine.
+    """
+    with open(filepath, "rb") as f:
+        if f.read(4) != b"RIFF":
+            return None
+        f.read(4)
+        if f.read(4) != b"WAVE":
+            return None
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunk_id, chunk_size = header[:4], struct.unpack("<I", header[4:])[0]
+
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_size)
+                audio_format, channels, framerate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                fmt = (audio_format, channels, framerate, bits // 8)
+            elif chunk_id == b"data":
+                if fmt is None or fmt[0] != 1:
+                    return None
+                _, channels, framerate, sampwidth = fmt
+                data_offset = f.tell()
+                data_bytes = os.path.getsize(filepath) - data_offset
+                return data_offset, channels, sampwidth, framerate, data_bytes // (channels * sampwidth)
+            else:
+                f.seek(chunk_size + (chunk_size & 1), 1)
+
+
+def lowpass_taps(input_rate, cutoff_hz=FILTER_CUTOFF_HZ, taps=FILTER_TAPS):
+    n = np.arange(taps) - (taps - 1) / 2
+    h = np.sinc(2 * cutoff_hz / input_rate * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+def output_frames(n_frames, factor):
+    return (n_frames + factor - 1) // factor
+
+
+def convert_into(out, pcm, factor):
+    """
+    Downmixes and decimates memory-mapped int16 `pcm` (frames x channels)
+    into `out`, CHUNK_SECONDS of input at a time.
+    """
+    chunk_frames = CHUNK_SECONDS * SAMPLING_RATE * factor
+    written = 0
+
+    if factor == 1:
+        for start in range(0, len(pcm), chunk_frames):
+            mono = pcm[start:start + chunk_frames].mean(axis=1, dtype=np.float32) * (1 / 32768.0)
+            out[written:written + len(mono)] = mono
+            written += len(mono)
+        return written
+
+    taps = lowpass_taps(factor * SAMPLING_RATE)
+    half = (FILTER_TAPS - 1) // 2
+
+    # Half a filter of zero padding on each side keeps the filter centred (no delay)
+    carry = np.zeros(half, dtype=np.float32)
+    filtered_total = 0
+
+    def emit(buffer):
+        nonlocal written, filtered_total
+        filtered = np.convolve(buffer, taps, mode="valid")
+        # Keep every `factor`-th sample of the whole stream, not of this chunk
+        decimated = filtered[(-filtered_total) % factor::factor]
+        filtered_total += len(filtered)
+        out[written:written + len(decimated)] = decimated
+        written += len(decimated)
+
+    for start in range(0, len(pcm), chunk_frames):
+        # Downmix to mono float in [-1, 1)
+        mono = pcm[start:start + chunk_frames].mean(axis=1, dtype=np.float32) * (1 / 32768.0)
+
+        carry = np.concatenate((carry, mono))
+        if len(carry) >= FILTER_TAPS:
+            emit(carry)
+            carry = carry[-(FILTER_TAPS - 1):]
+
+    emit(np.concatenate((carry, np.zeros(half, dtype=np.float32))))
+    return written
+
+
+def load_wav_16k(filepath, spill_dir=None):
+    """
+    Returns 16 kHz mono float32 audio, or None if the file is not 16-bit PCM
+    at a multiple of 16 kHz (callers then fall back to faster-whisper's decoder).
+    With `spill_dir`, the result is a np.memmap backed by a temporary file there.
+    """
+    layout = read_wav_layout(filepath)
+    if layout is None:
+        return None
+
+    data_offset, channels, sampwidth, framerate, n_frames = layout
+    if sampwidth != 2 or framerate % SAMPLING_RATE:
+        return None
+
+    factor = framerate // SAMPLING_RATE
+
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    pcm = np.memmap(filepath, dtype="<i2", mode="r", offset=data_offset, shape=(n_frames, channels))
+    length = output_frames(n_frames, factor)
+
+    if spill_dir is not None:
+        fd, spill_path = tempfile.mkstemp(suffix=".f32", dir=spill_dir)
+        os.close(fd)
+        out = np.memmap(spill_path, dtype=np.float32, mode="w+", shape=(length,))
+        # The mapping keeps the data alive; the name is not needed
+        os.unlink(spill_path)
+    else:
+        out = np.empty(length, dtype=np.float32)
+
+    written = convert_into(out, pcm, factor)
+    del pcm
+
+    return out[:written]
+
+
+@contextmanager
+def open_track_audio(filepath):
+    """
+    Yields 16 kHz float32 audio for `filepath`. Tracks longer than
+    AUDIO_SPILL_SECONDS are spilled to a file-backed array next to the
+    recording. Other formats (Opus passthrough recordings) are decoded
+    by faster-whisper's PyAV decoder.
+    """
+    filepath = Path(filepath)
+    layout = read_wav_layout(filepath)
+
+    spill_dir = None
+    if layout is not None and layout[4] / max(layout[3], 1) > config.AUDIO_SPILL_SECONDS:
+        spill_dir = filepath.parent
+
+    audio = load_wav_16k(filepath, spill_dir)
+    if audio is None:
+        audio = decode_audio(str(filepath), sampling_rate=SAMPLING_RATE)
+    try:
+        yield audio
+    finally:
+        del audio
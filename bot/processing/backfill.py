@@ -0,0 +1,222 @@
+"""
+Re-transcribes recorded sessions in bulk, e.g. after changing models.
+
+Sessions are selected by folder glob, date range and status, and each
+one runs through the stage pipeline in a pool of worker processes. A
+worker loads the model once and keeps it for all of its sessions.
+
+Every stage is cached (see pipeline.py), so sessions that are already up
+to date for the chosen model and profile are skipped without loading a
+model, and running the same command again after an interruption resumes
+each session from the stage, or track, it stopped at.
+
+Sessions whose audio retention has deleted are never selected: their
+transcript is all that is left, and re-running would only lose it.
+
+Status:
+    missing   never transcribed
+    failed    the last pipeline run raised
+    any       every session (the default); up-to-date ones are skipped
+
+Usage:
+    python -m bot.processing.backfill [--glob PATTERN] [--since DATE] [--until DATE]
+        [--status missing|failed|any] [--model NAME] [--decoding-profile NAME]
+        [--device cpu|cuda] [--jobs N] [--force STAGE ...] [--dry-run]
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+
+import bot.utils.config as config
+from bot.processing.pipeline import MANIFEST_FILE, STAGE_NAMES, Manifest, PipelineContext, SessionPipeline, finish_pipeline
+from bot.processing.profiles import PROFILES
+from bot.processing.transcriber import load_model
+from bot.utils.file_utils import is_session_incomplete, safe_load_json, session_start_from_folder
+from bot.utils.logger import log_event, setup_logging, span, stop_logging
+
+STATUSES = ("missing", "failed", "any")
+
+
+# =========================================================
+# Selection
+# =========================================================
+
+def session_date(session_dir):
+    try:
+        return datetime.fromisoformat(session_start_from_folder(session_dir)).date()
+    except ValueError:
+        return None
+
+
+def audio_deleted(session_dir):
+    """Retention's reason for deleting the session's audio, or None."""
+    metadata = safe_load_json(Path(session_dir) / "metadata.json", default=None) or {}
+    return metadata.get("audio_deleted")
+
+
+def session_status(session_dir):
+    """One of failed, missing or transcribed."""
+    if Manifest(session_dir / MANIFEST_FILE).failure:
+        return "failed"
+    if not (session_dir / "transcript.txt").exists():
+        return "missing"
+    return "transcribed"
+
+
+def select_sessions(sessions_dir, pattern="*", since=None, until=None, status="any"):
+    """Finished sessions matching the filters, oldest first."""
+    selected = []
+    for session_dir in sorted(Path(sessions_dir).glob(pattern)):
+        if not (session_dir / "users").is_dir():
+            continue
+        # Still recording, or crashed and waiting for recovery
+        if is_session_incomplete(session_dir):
+            continue
+        # Nothing left to transcribe; the stored transcript is kept as it is
+        if audio_deleted(session_dir):
+            continue
+
+        day = session_date(session_dir)
+        if day is None or (since and day < since) or (until and day > until):
+            continue
+
+        if status != "any" and session_status(session_dir) != status:
+            continue
+
+        selected.append(session_dir)
+
+    return selected
+
+
+# =========================================================
+# Worker Processes
+# =========================================================
+
+# Set once per worker process by init_worker
+_settings = None
+_model = None
+
+
+def init_worker(whisper_model, device, compute_type, hf_cache_dir, sessions_dir=None):
+    global _settings
+    _settings = (whisper_model, device, compute_type, hf_cache_dir)
+
+    # Spawned workers re-import the config; the language store and session index live here
+    if sessions_dir is not None:
+        config.SESSIONS_DIR = str(sessions_dir)
+
+
+def worker_model():
+    # Loaded on the first stale session, then shared by every later one
+    global _model
+    if _model is None:
+        whisper_model, device, compute_type, hf_cache_dir = _settings
+        with span("model_load", model=whisper_model, device=device, compute_type=compute_type, backfill=True):
+            _model = load_model(whisper_model, device, compute_type, hf_cache_dir)
+    return _model
+
+
+def backfill_session(session_dir, profile, force=()):
+    """
+    Returns (state, stage) where state is "done", "current" or "skipped"
+    and stage is the first one redone.
+    """
+    setup_logging("backfill")
+    try:
+        if audio_deleted(session_dir):
+            return "skipped", None
+
+        ctx = PipelineContext(session_dir, *_settings, profile=profile, model_loader=worker_model)
+        stage = SessionPipeline(ctx).stale_stage(force)
+        if stage is None:
+            return "current", None
+
+        ctx.reporter.started(ctx.session.total_audio_s, [track.name for track in ctx.session.tracks])
+        finish_pipeline(ctx, force)
+        return "done", stage
+    finally:
+        # Pool workers exit without running atexit handlers
+        stop_logging()
+
+
+def run_backfill(session_dirs, whisper_model, device, compute_type, hf_cache_dir, profile, jobs=1, force=(), sessions_dir=None):
+    """Processes `session_dirs` on `jobs` workers. Returns {state: count}."""
+    counts = {"done": 0, "current": 0, "skipped": 0, "failed": 0}
+    started = time.monotonic()
+
+    # Spawned, so no worker inherits a CUDA context from this process
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(whisper_model, device, compute_type, hf_cache_dir, sessions_dir or config.SESSIONS_DIR)
+    ) as pool:
+        futures = {pool.submit(backfill_session, str(d), profile, tuple(force)): d for d in session_dirs}
+
+        try:
+            for n, future in enumerate(as_completed(futures), 1):
+                session_dir = futures[future]
+                try:
+                    state, stage = future.result()
+                    note = {"current": "up to date", "skipped": "audio deleted, skipped"}.get(state, f"processed from {stage}")
+                except Exception as e:
+                    state, stage = "failed", None
+                    note = f"failed: {e}"
+
+                counts[state] += 1
+                log_event("backfill", session_dir.name, state=state, stage=stage)
+                print(f"[{n}/{len(futures)}] {session_dir.name}: {note}")
+        except KeyboardInterrupt:
+            # Finished stages are kept, the next run resumes from them
+            print("Interrupted, waiting for running sessions to stop...")
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    elapsed = time.monotonic() - started
+    print(f"Backfill finished in {elapsed:.0f}s: {counts['done']} processed, {counts['current']} up to date, {counts['skipped']} skipped, {counts['failed']} failed")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-transcribe recorded sessions in bulk")
+    parser.add_argument("--sessions-dir", default=config.SESSIONS_DIR)
+    parser.add_argument("--glob", default="*", help="Session folder pattern, e.g. '2026-02-*'")
+    parser.add_argument("--since", type=date.fromisoformat, metavar="YYYY-MM-DD", help="First session date to include")
+    parser.add_argument("--until", type=date.fromisoformat, metavar="YYYY-MM-DD", help="Last session date to include")
+    parser.add_argument("--status", choices=STATUSES, default="any", help="Only sessions never transcribed, or whose last run failed")
+    parser.add_argument("--model", help="Whisper model (default: the best one for this host)")
+    parser.add_argument("--decoding-profile", choices=list(PROFILES), default=config.DECODING_PROFILE, help="Decoding profile")
+    parser.add_argument("--device", choices=("cpu", "cuda"), help="Default: cuda when a GPU is available")
+    parser.add_argument("--cache-dir", default=config.HF_CACHE_DIR, help="Huggingface cache directory")
+    parser.add_argument("--jobs", type=int, default=1, help="Sessions processed in parallel, each loads its own model")
+    parser.add_argument("--force", nargs="+", default=[], choices=STAGE_NAMES, metavar="STAGE", help=f"Re-run these stages: {', '.join(STAGE_NAMES)}")
+    parser.add_argument("--dry-run", action="store_true", help="List the selected sessions and exit")
+    args = parser.parse_args(argv)
+
+    session_dirs = select_sessions(args.sessions_dir, args.glob, args.since, args.until, args.status)
+    print(f"Selected {len(session_dirs)} session(s)")
+    if args.dry_run:
+        for session_dir in session_dirs:
+            print(f"  {session_dir.name} ({session_status(session_dir)})")
+        return
+    if not session_dirs:
+        return
+
+    from utils.hardware import get_system_info, select_best_model
+
+    sys_info = get_system_info()
+    best_model, _, compute_type = select_best_model(sys_info)
+    device = args.device or ("cuda" if sys_info["gpu_available"] else "cpu")
+    whisper_model = args.model or best_model
+    compute_type = compute_type if device == "cuda" else "int8"
+
+    print(f"Backfilling with {whisper_model} on {device} ({compute_type}), profile {args.decoding_profile}, {args.jobs} worker(s)")
+    setup_logging("backfill")
+    run_backfill(session_dirs, whisper_model, device, compute_type, args.cache_dir, args.decoding_profile, args.jobs, args.force, args.sessions_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Batched transcription across speakers and sessions.
+
+Every track is cut into the speech regions of the pipeline's VAD stage
+(at most 30 s each, like faster-whisper's own batched mode). Chunks from
+many tracks and sessions are packed back to back into one buffer, and
+the buffer is passed to BatchedInferencePipeline with explicit
+`clip_timestamps`. The GPU then sees full batches regardless of which
+speaker a chunk came from. Every segment is mapped back to its source track through the pack's offset
+table and streamed into that track's transcript artifact.
+
+The pipeline runs up to the transcribe stage for every session first, so
+only tracks without an up-to-date artifact are packed. The remaining
+stages then run per session as usual.
+"""
+import bisect
+import time
+from pathlib import Path
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline
+
+import bot.utils.config as config
+from bot.processing.audio import open_track_audio
+from bot.processing.language import first_speech, resolve_track_language
+from bot.processing.pipeline import PipelineContext, SessionPipeline, TranscribeStage, finish_pipeline, track_speech, track_transcript
+from bot.processing.profiles import DEFAULT_PROFILE, batched_options
+from bot.processing.progress import ProgressReporter
+from bot.processing.transcriber import load_model, segment_row
+from bot.utils.logger import record_span
+
+SAMPLING_RATE = 16000
+
+
+class ChunkPacker:
+    """Packs speech chunks from many tracks into one contiguous buffer."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.parts = []
+        self.pack_starts = []   # chunk start within the pack (s)
+        self.owners = []        # (session, track, chunk start within the track (s))
+        self.samples = 0
+
+    def add(self, session, track, audio, start, end):
+        # Copy so the full decoded track can be freed once it is chunked
+        chunk = audio[start:end].copy()
+
+        self.pack_starts.append(self.samples / SAMPLING_RATE)
+        self.owners.append((session, track, start / SAMPLING_RATE))
+        self.parts.append(chunk)
+        self.samples += len(chunk)
+
+    def seconds(self):
+        return self.samples / SAMPLING_RATE
+
+    def clip_timestamps(self):
+        ends = self.pack_starts[1:] + [self.seconds()]
+        return [{"start": start, "end": end} for start, end in zip(self.pack_starts, ends)]
+
+    def locate(self, pack_time_s):
+        """Returns (session, track, offset_s) so that track time = pack time + offset_s."""
+        index = max(bisect.bisect_right(self.pack_starts, pack_time_s) - 1, 0)
+        session, track, track_start_s = self.owners[index]
+        return session, track, track_start_s - self.pack_starts[index]
+
+
+class BatchTranscriber:
+
+    def __init__(self, model, profile=DEFAULT_PROFILE):
+        self.pipeline = BatchedInferencePipeline(model=model)
+        self.options = batched_options(profile)
+        self.model = model
+
+        # One packer per language: a pipeline call decodes a single language
+        self.packers = {}
+
+        # Open transcript artifacts and their sidecar metadata, by (session, user)
+        self.outputs = {}
+        # Sub-speakers of shared tracks, by (session, user)
+        self.diarizations = {}
+
+    def add_track(self, ctx, track, key):
+        session = ctx.session
+        out = track_transcript(ctx, track).open()
+        meta = {"key": key, "language": None, "language_source": "silent"}
+        self.outputs[(session.id, track.user_id)] = (out, meta)
+
+        speech_timestamps = track_speech(ctx, track)
+        if not speech_timestamps:
+            print(f"Skipping {track.name} from {session.id}: no speech")
+            return
+
+        with open_track_audio(track.audio_path) as audio:
+            meta["language"], meta["language_source"] = self.pack_track(session, track, audio, speech_timestamps)
+
+    def pack_track(self, session, track, audio, speech_timestamps):
+        # Detection (if any) reuses the chunks VAD already found
+        language, source = resolve_track_language(
+            self.model,
+            track.user_id,
+            session.guild_id,
+            lambda: first_speech(audio, speech_timestamps),
+            vad_filter=False
+        )
+        print(f"Packing {track.name} from {session.id} (language {language} from {source})...")
+
+        diarization = session.diarize(track, audio, speech_timestamps)
+        if diarization:
+            self.diarizations[(session.id, track.user_id)] = diarization
+
+        packer = self.packers.setdefault(language, ChunkPacker())
+        for speech in speech_timestamps:
+            packer.add(session, track, audio, speech["start"], speech["end"])
+
+            if packer.seconds() >= config.BATCH_PACK_SECONDS:
+                self.flush(language)
+
+        return language, source
+
+    def flush_all(self):
+        for language in list(self.packers):
+            self.flush(language)
+
+        # Every pack is decoded, so the artifacts are complete
+        for out, meta in self.outputs.values():
+            out.close(**meta)
+        self.outputs = {}
+
+    def flush(self, language):
+        packer = self.packers[language]
+        if not packer.parts:
+            return
+
+        flush_started = time.monotonic()
+        segments, info = self.pipeline.transcribe(
+            np.concatenate(packer.parts),
+            language=language,
+            vad_filter=False,
+            clip_timestamps=packer.clip_timestamps(),
+            batch_size=config.BATCH_SIZE,
+            word_timestamps=config.WORD_TIMESTAMPS,
+            **self.options
+        )
+
+        progress = {}
+        for segment in segments:
+            # Midpoint is robust to rounding at chunk boundaries
+            session, track, offset_s = packer.locate((segment.start + segment.end) / 2)
+            key = (session.id, track.user_id)
+
+            start_ms, end_ms, text, words = segment_row(segment, session.track_start_ms(track), offset_s)
+
+            diarization = self.diarizations.get(key)
+            speaker = diarization.speaker_for(segment.start + offset_s, segment.end + offset_s) if diarization else None
+
+            self.outputs[key][0].write(start_ms, end_ms, text, words, speaker)
+
+            progress[(session, track)] = segment.end + offset_s
+
+        for (session, track), done_s in progress.items():
+            session.reporter.speaker_progress(
+                track.name,
+                min(done_s, track.duration_s),
+                track.duration_s,
+                session.audio_before(track)
+            )
+
+        # Speakers share the pack, so each span carries the whole pack's time
+        flush_s = time.monotonic() - flush_started
+        for session, track in {(session, track) for session, track, _ in packer.owners}:
+            record_span(
+                "transcribe", session.id, flush_s,
+                speaker=track.name, user_id=track.user_id, language=language,
+                batched=True, pack_speech_s=packer.seconds()
+            )
+
+        packer.reset()
+
+
+def run_batched_transcription(session_dirs, whisper_model, device, compute_type, hf_cache_dir, progress_queue=None, profile=DEFAULT_PROFILE):
+    model = None
+
+    def shared_model():
+        nonlocal model
+        if model is None:
+            load_started = time.monotonic()
+            model = load_model(whisper_model, device, compute_type, hf_cache_dir)
+            load_s = time.monotonic() - load_started
+            for ctx in contexts:
+                ctx.reporter.model_loaded(load_s)
+                record_span("model_load", ctx.id, load_s, model=whisper_model, device=device, batch_sessions=len(contexts))
+            contexts[0].reporter.metric("meeting_model_load_seconds", load_s)
+        return model
+
+    # Every session is brought up to the transcribe stage first
+    contexts = []
+    for session_dir in session_dirs:
+        try:
+            ctx = PipelineContext(session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue, profile, shared_model)
+            ctx.reporter.started(ctx.session.total_audio_s, [track.name for track in ctx.session.tracks])
+            SessionPipeline(ctx).run(stop_before="transcribe")
+        except Exception as e:
+            # One broken session must not sink the rest of the batch
+            print(f"Skipping {session_dir}: {e}")
+            ProgressReporter(progress_queue, Path(session_dir).name).failed(e)
+            continue
+        contexts.append(ctx)
+
+    stage = TranscribeStage()
+    pending = [(ctx, track) for ctx in contexts for track in stage.pending_tracks(ctx)]
+
+    if pending:
+        batcher = BatchTranscriber(shared_model(), profile)
+        for ctx, track in pending:
+            batcher.add_track(ctx, track, stage.track_key(ctx, track))
+        batcher.flush_all()
+
+    # The transcribe stage now finds every track cached
+    for ctx in contexts:
+        try:
+            finish_pipeline(ctx)
+        except Exception as e:
+            print(f"Failed to process {ctx.id}: {e}")
+            ctx.reporter.failed(e)
@@ -0,0 +1,315 @@
+"""
+Live captions posted to a text channel while a session is recorded.
+
+Each UserTrack worker feeds its PCM frames, and the activity meter's
+speech flags, to a CaptionFeed. A feed collects one utterance at a
+time: from the first loud frame until LIVE_CAPTION_PAUSE_S of quiet, or
+at most LIVE_CAPTION_MAX_S. Every LIVE_CAPTION_STEP_S a captioner thread
+re-decodes each feed's growing utterance with a small CPU model
+(LIVE_CAPTION_MODEL), so the caption of a sentence refines while it is
+being spoken and is final once the speaker pauses.
+
+Captions go through a queue to a CaptionBoard task on the event loop,
+which keeps one message per channel up to date. Edits are coalesced and
+at most one is sent per LIVE_CAPTION_EDIT_INTERVAL, which stays inside
+Discord's limit of 5 edits per 5 s. A message that grows too long is
+left as is and captioning continues in a new one.
+
+Recorded audio and the transcripts made after /stop are not affected.
+"""
+import asyncio
+import queue
+import threading
+import time
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+import bot.utils.config as config
+from bot.processing.audio import lowpass_taps
+from bot.processing.language import detect_language
+from bot.utils.language_store import resolve_language
+from bot.utils.logger import log_event
+from bot.utils.metrics import CAPTION_LATENCY
+
+INPUT_RATE = 48000
+DECIMATION = 3
+FILTER = lowpass_taps(INPUT_RATE)
+
+# Discord's message limit, with room for the speaker names
+MESSAGE_CHARS = 1800
+
+# Loaded on the first captioned session and kept for later ones
+_model = None
+_model_lock = threading.Lock()
+
+
+def load_caption_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            print(f"Loading caption model: {config.LIVE_CAPTION_MODEL} on cpu...")
+            _model = WhisperModel(
+                config.LIVE_CAPTION_MODEL,
+                device="cpu",
+                compute_type="int8",
+                cpu_threads=config.LIVE_CAPTION_THREADS,
+                download_root=config.HF_CACHE_DIR
+            )
+        return _model
+
+
+def to_16k(mono_48k):
+    """Low-pass and decimate 48 kHz mono float32 to Whisper's 16 kHz."""
+    return np.convolve(mono_48k, FILTER, mode="same")[::DECIMATION].astype(np.float32)
+
+
+# =========================================================
+# Capture Side
+# =========================================================
+
+class CaptionFeed:
+    """One speaker's current utterance. Written by their track worker, read by the captioner."""
+
+    def __init__(self, user_id, name):
+        self.user_id = user_id
+        self.name = name
+        self.language = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.parts = []
+        self.samples = 0
+        self.started_at = None
+        self.last_voice = None
+        # When the newest audio arrived, for latency
+        self.updated_at = None
+        self.decoded_samples = 0
+
+    def feed(self, batch, active):
+        """`batch` as queued by UserTrack, `active` the meter's speech flag per frame."""
+        now = time.monotonic()
+        with self.lock:
+            if self.started_at is None and not active.any():
+                return
+
+            for (frame, _), voiced in zip(batch, active):
+                # Gaps between packets are left out, the pause timer covers them
+                if self.started_at is None:
+                    if not voiced:
+                        continue
+                    self.started_at = now
+
+                pcm = np.frombuffer(frame, dtype=np.int16).reshape(-1, 2)
+                self.parts.append(pcm.mean(axis=1, dtype=np.float32) * (1 / 32768.0))
+                self.samples += len(pcm)
+
+            if active.any():
+                self.last_voice = now
+            self.updated_at = now
+
+    def take(self, now, closing=False):
+        """Returns (audio_48k, final, updated_at) to decode, or None when nothing changed."""
+        with self.lock:
+            if self.started_at is None:
+                return None
+
+            final = (
+                closing
+                or now - self.last_voice >= config.LIVE_CAPTION_PAUSE_S
+                or self.samples >= config.LIVE_CAPTION_MAX_S * INPUT_RATE
+            )
+            if not final and self.samples - self.decoded_samples < config.LIVE_CAPTION_STEP_S * INPUT_RATE / 2:
+                return None
+
+            audio = np.concatenate(self.parts) if len(self.parts) > 1 else self.parts[0]
+            self.parts = [audio]
+            self.decoded_samples = self.samples
+            updated_at = self.updated_at
+
+            if final:
+                language = self.language
+                self.reset()
+                self.language = language
+
+        return audio, final, updated_at
+
+
+class LiveCaptions:
+    """Captions of one recording: the feeds, the decoding thread and the board."""
+
+    def __init__(self, channel, guild_id=None):
+        # Set by the Recorder once the session folder exists
+        self.session_id = None
+        self.guild_id = guild_id
+        self.feeds = {}
+        self.events = queue.SimpleQueue()
+        self.board = CaptionBoard(channel, self.events)
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    async def start(self):
+        # The model loads off the event loop, before the first caption is due
+        await asyncio.to_thread(load_caption_model)
+        self.thread.start()
+        self.board.start()
+
+    def feed_for(self, user):
+        """Called from add_user on the voice thread."""
+        feed = CaptionFeed(user.id, getattr(user, "display_name", user.name))
+        self.feeds[user.id] = feed
+        return feed
+
+    def close(self):
+        """Finishes pending captions and stops. Safe to call from any thread."""
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.board.close()
+
+    def decode(self, feed, audio):
+        model = load_caption_model()
+        audio = to_16k(audio)
+
+        if feed.language is None:
+            feed.language, _ = resolve_language(feed.user_id, self.guild_id)
+        if feed.language is None:
+            feed.language, _ = detect_language(model, audio, vad_filter=False)
+
+        segments, _ = model.transcribe(
+            audio,
+            language=feed.language,
+            beam_size=1,
+            temperature=0.0,
+            condition_on_previous_text=False,
+            without_timestamps=True,
+            vad_filter=False
+        )
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+    def step(self, closing=False):
+        now = time.monotonic()
+        for feed in list(self.feeds.values()):
+            item = feed.take(now, closing)
+            if item is None:
+                continue
+
+            audio, final, updated_at = item
+            decode_started = time.monotonic()
+            try:
+                text = self.decode(feed, audio)
+            except Exception as e:
+                print(f"Live caption failed for {feed.name}: {e}")
+                continue
+
+            self.events.put((feed.user_id, feed.name, text, final, updated_at))
+            if final and text:
+                log_event(
+                    "caption", self.session_id,
+                    user_id=feed.user_id, audio_s=round(len(audio) / INPUT_RATE, 2),
+                    decode_s=round(time.monotonic() - decode_started, 3)
+                )
+
+    def run(self):
+        while not self.stopped.wait(config.LIVE_CAPTION_STEP_S):
+            self.step()
+        # Whatever was said last is final
+        self.step(closing=True)
+
+
+# =========================================================
+# Bot Side
+# =========================================================
+
+class CaptionBoard:
+    """Keeps the caption message of a channel up to date, within Discord's edit rate."""
+
+    def __init__(self, channel, events):
+        self.channel = channel
+        self.events = events
+        self.message = None
+        # Final lines of the current message, and the utterances still being spoken
+        self.lines = []
+        self.partial = {}
+        self.dirty = False
+        self.latest_audio = None
+        self.last_edit = 0.0
+        self.closed = threading.Event()
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def close(self):
+        self.closed.set()
+
+    def handle(self, event):
+        user_id, name, text, final, updated_at = event
+        if final:
+            self.partial.pop(user_id, None)
+            if text:
+                self.lines.append(f"**{name}:** {text}")
+        elif text:
+            self.partial[user_id] = f"**{name}:** {text} …"
+        self.latest_audio = max(self.latest_audio or 0.0, updated_at or 0.0)
+        self.dirty = True
+
+    def render(self, lines=None):
+        lines = self.lines + list(self.partial.values()) if lines is None else lines
+        return "\n".join(["🎙️ Live captions"] + lines)
+
+    async def send(self, content):
+        if self.message is None:
+            self.message = await self.channel.send(content)
+        else:
+            await self.message.edit(content=content)
+
+    async def flush(self, force=False):
+        if not self.dirty:
+            return
+        if not force and time.monotonic() - self.last_edit < config.LIVE_CAPTION_EDIT_INTERVAL:
+            return
+
+        self.dirty = False
+        self.last_edit = time.monotonic()
+
+        try:
+            # Full message: keep its final lines, continue in a new one
+            if len(self.render()) > MESSAGE_CHARS and self.lines:
+                await self.send(self.render(self.lines))
+                self.message = None
+                self.lines = []
+
+            await self.send(self.render())
+
+            if self.latest_audio is not None:
+                CAPTION_LATENCY.observe(time.monotonic() - self.latest_audio)
+                self.latest_audio = None
+        except Exception as e:
+            print(f"Failed to update live captions: {e}")
+
+    async def run(self):
+        while not self.closed.is_set():
+            # Drain without blocking the event loop
+            try:
+                while True:
+                    self.handle(self.events.get_nowait())
+            except queue.Empty:
+                pass
+
+            await self.flush()
+            await asyncio.sleep(0.25)
+
+        # The captioner has stopped, so every caption is queued
+        try:
+            while True:
+                self.handle(self.events.get_nowait())
+        except queue.Empty:
+            pass
+        self.partial = {}
+        await self.flush(force=True)
@@ -0,0 +1,132 @@
+"""
+Cross-track crosstalk deduplication.
+
+Speakers without headphones leak everyone else into their own microphone,
+so the same phrase gets transcribed on two tracks at the same time. Before
+the merge, transcribed segments are indexed by start time into buckets of
+CROSSTALK_WINDOW_MS. Each segment is only compared with other speakers'
+segments in its own and neighbouring buckets, which keeps the pass near
+linear in the segment count.
+
+Of a matching pair, the segment Whisper was less sure of (lower mean word
+probability, then the shorter one) is taken as the echo. The merge drops
+or marks it, depending on CROSSTALK_DEDUPE.
+"""
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import bot.utils.config as config
+from bot.utils.logger import log_event
+
+WORD_RE = re.compile(r"\w+")
+
+# Prepended to echoes kept by CROSSTALK_DEDUPE=mark
+ECHO_MARK = "(echo) "
+
+
+class StagedSegment:
+
+    def __init__(self, user_id, seq, start_ms, end_ms, text, words):
+        self.user_id = user_id
+        self.seq = seq
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+        tokens = WORD_RE.findall(text.lower())
+        self.normalized = " ".join(tokens)
+        self.tokens = frozenset(tokens)
+
+        # Mean word probability, when word timestamps were stored
+        probabilities = [w[3] for w in words] if words else []
+        self.confidence = sum(probabilities) / len(probabilities) if probabilities else None
+
+    @property
+    def key(self):
+        return (self.user_id, self.seq)
+
+    def keep_score(self):
+        return (self.confidence or 0.0, len(self.normalized), -self.start_ms)
+
+
+def containment(a, b, threshold):
+    """Share of the shorter text found in the longer one, or 0 when it cannot reach `threshold`."""
+    shorter = min(len(a), len(b))
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+
+    # quick_ratio() bounds the matched characters from above, which skips most pairs cheaply
+    if matcher.quick_ratio() * (len(a) + len(b)) / 2 < threshold * shorter:
+        return 0.0
+
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+    return matched / shorter
+
+
+def find_echoes(segments, window_ms=None, threshold=None, min_chars=None):
+    """Returns {echo key: (source key, similarity)} for segments repeated on another track."""
+    window_ms = window_ms or config.CROSSTALK_WINDOW_MS
+    threshold = threshold or config.CROSSTALK_SIMILARITY
+    min_chars = min_chars or config.CROSSTALK_MIN_CHARS
+
+    # Short replies ("yeah", "okay") match by coincidence
+    candidates = [s for s in segments if len(s.normalized) >= min_chars]
+
+    buckets = defaultdict(list)
+    for segment in candidates:
+        buckets[segment.start_ms // window_ms].append(segment)
+
+    echoes = {}
+    for segment in sorted(candidates, key=lambda s: s.start_ms):
+        if segment.key in echoes:
+            continue
+
+        bucket = segment.start_ms // window_ms
+        for neighbour in (bucket - 1, bucket, bucket + 1):
+            for other in buckets.get(neighbour, ()):
+                if other.user_id == segment.user_id or other.key in echoes:
+                    continue
+                if abs(other.start_ms - segment.start_ms) > window_ms:
+                    continue
+                # An echo shares most of its words, and set overlap is far cheaper than a diff
+                if len(segment.tokens & other.tokens) < threshold * min(len(segment.tokens), len(other.tokens)) - 1:
+                    continue
+
+                similarity = containment(segment.normalized, other.normalized, threshold)
+                if similarity < threshold:
+                    continue
+
+                echo, source = sorted((segment, other), key=StagedSegment.keep_score)
+                echoes[echo.key] = (source.key, similarity)
+
+                if echo is segment:
+                    break
+            if segment.key in echoes:
+                break
+
+    return echoes
+
+
+def find_track_echoes(tracks, session_id=None):
+    """
+    `tracks` maps user IDs to their transcript rows (see TrackTranscript).
+    Returns [user_id, seq, source_user_id, source_seq, similarity] for every echo.
+    """
+    if len(tracks) < 2:
+        return []
+
+    segments = [
+        StagedSegment(user_id, row["seq"], row["start_ms"], row["end_ms"], row["text"], row["words"])
+        for user_id, rows in tracks.items()
+        for row in rows
+    ]
+
+    echoes = []
+    for (user_id, seq), (source, similarity) in find_echoes(segments).items():
+        echoes.append([user_id, seq, source[0], source[1], round(similarity, 3)])
+        log_event(
+            "crosstalk", session_id,
+            user_id=user_id, seq=seq, source_user_id=source[0], source_seq=source[1],
+            similarity=round(similarity, 3)
+        )
+
+    return sorted(echoes)
@@ -0,0 +1,357 @@
+"""
+CPU-only diarization for tracks recorded from a shared Discord account.
+
+One account can carry a whole room of people, so its track is split into
+sub-speakers before its segments are stored:
+
+1. VAD (faster-whisper's Silero model) finds the speech regions.
+2. Each region is cut into overlapping windows and every window gets an
+   embedding: MFCC mean/std statistics by default, or a speaker
+   embedding ONNX model when DIARIZATION_MODEL points at one.
+3. Windows are grouped by spherical k-means into micro-clusters, which are
+   merged by centroid agglomeration until no pair is more similar than
+   DIARIZATION_THRESHOLD.
+
+Embeddings are cached next to the session (diarization/<user_id>.npz), so
+re-runs only repeat the clustering.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+import bot.utils.config as config
+
+SAMPLING_RATE = 16000
+
+# 25 ms frames every 10 ms
+FRAME_LENGTH = 400
+FRAME_HOP = 160
+N_FFT = 512
+
+N_MFCC = 20
+N_MELS_MFCC = 40
+# Log mel filterbank fed to ONNX embedding models (WeSpeaker / 3D-Speaker style)
+N_MELS_FBANK = 80
+
+# Windows shorter than this are too short to say anything about the voice
+MIN_WINDOW_SECONDS = 0.5
+# Micro-clusters built by k-means before agglomeration
+MICRO_CLUSTERS = 96
+# Clusters holding fewer windows than this share are folded into their nearest neighbour
+MIN_CLUSTER_SHARE = 0.03
+
+# Bump when features or windows change so cached embeddings are recomputed
+CACHE_VERSION = 1
+
+
+# =========================================================
+# Features
+# =========================================================
+
+def mel_filterbank(n_mels, n_fft=N_FFT, sampling_rate=SAMPLING_RATE, low_hz=20, high_hz=7600):
+    def hz_to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    def mel_to_hz(mel):
+        return 700 * (10 ** (mel / 2595) - 1)
+
+    points = mel_to_hz(np.linspace(hz_to_mel(low_hz), hz_to_mel(high_hz), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1 / sampling_rate)
+
+    filters = np.zeros((n_mels, len(bins)), dtype=np.float32)
+    for m in range(n_mels):
+        left, centre, right = points[m:m + 3]
+        rising = (bins - left) / (centre - left)
+        falling = (right - bins) / (right - centre)
+        filters[m] = np.clip(np.minimum(rising, falling), 0, None)
+    return filters
+
+
+def dct_matrix(n_out, n_in):
+    n = np.arange(n_in)
+    k = np.arange(n_out)[:, None]
+    return (np.cos(np.pi * k * (2 * n + 1) / (2 * n_in)) * np.sqrt(2 / n_in)).astype(np.float32)
+
+
+class FeatureExtractor:
+    """Frame-level log mel (or MFCC) features of 16 kHz audio."""
+
+    def __init__(self, n_mels, n_mfcc=None):
+        self.filters = mel_filterbank(n_mels)
+        self.dct = dct_matrix(n_mfcc, n_mels) if n_mfcc else None
+        self.window = np.hamming(FRAME_LENGTH).astype(np.float32)
+
+    def __call__(self, audio):
+        if len(audio) < FRAME_LENGTH:
+            return np.zeros((0, len(self.dct) if self.dct is not None else len(self.filters)), dtype=np.float32)
+
+        emphasized = np.append(audio[:1], audio[1:] - 0.97 * audio[:-1]).astype(np.float32)
+        n_frames = 1 + (len(emphasized) - FRAME_LENGTH) // FRAME_HOP
+        frames = np.lib.stride_tricks.as_strided(
+            emphasized,
+            shape=(n_frames, FRAME_LENGTH),
+            strides=(emphasized.strides[0] * FRAME_HOP, emphasized.strides[0])
+        )
+
+        power = np.abs(np.fft.rfft(frames * self.window, N_FFT)) ** 2
+        log_mel = np.log(power @ self.filters.T + 1e-6)
+
+        if self.dct is None:
+            return log_mel.astype(np.float32)
+        return (log_mel @ self.dct.T).astype(np.float32)
+
+
+# =========================================================
+# Embeddings
+# =========================================================
+
+class MfccEmbedder:
+    """Mean and spread of track-normalized MFCCs over each window."""
+
+    name = "mfcc"
+
+    def __init__(self):
+        self.features = FeatureExtractor(N_MELS_MFCC, N_MFCC)
+
+    def embed(self, region_features, windows):
+        # Normalize against the whole track so the statistics describe the voice, not the mic
+        stacked = np.concatenate(region_features)[:, 1:]
+        mean = stacked.mean(axis=0)
+        std = stacked.std(axis=0) + 1e-6
+
+        embeddings = []
+        for region, start, end in windows:
+            chunk = (region_features[region][start:end, 1:] - mean) / std
+            embeddings.append(np.concatenate([chunk.mean(axis=0), chunk.std(axis=0) - 1]))
+        return np.array(embeddings, dtype=np.float32)
+
+
+class OnnxEmbedder:
+    """Runs a speaker embedding model taking [1, frames, 80] log mel features."""
+
+    def __init__(self, model_path):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = config.DIARIZATION_THREADS
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.name = f"onnx:{Path(model_path).name}"
+        self.features = FeatureExtractor(N_MELS_FBANK)
+
+    def embed(self, region_features, windows):
+        embeddings = []
+        for region, start, end in windows:
+            chunk = region_features[region][start:end]
+            chunk = (chunk - chunk.mean(axis=0))[None].astype(np.float32)
+            output = self.session.run(None, {self.input_name: chunk})[0]
+            embeddings.append(np.asarray(output, dtype=np.float32).reshape(-1))
+        return np.array(embeddings, dtype=np.float32)
+
+
+def load_embedder():
+    if config.DIARIZATION_MODEL:
+        return OnnxEmbedder(config.DIARIZATION_MODEL)
+    return MfccEmbedder()
+
+
+def speech_windows(speech_timestamps, n_region_frames):
+    """
+    Splits every speech region into overlapping windows.
+    Returns (region, start_frame, end_frame) triples and their track times in seconds.
+    """
+    window = int(config.DIARIZATION_WINDOW_SECONDS * 100)
+    hop = int(config.DIARIZATION_HOP_SECONDS * 100)
+    minimum = int(MIN_WINDOW_SECONDS * 100)
+
+    windows, times = [], []
+    for region, (speech, n_frames) in enumerate(zip(speech_timestamps, n_region_frames)):
+        if n_frames < minimum:
+            continue
+
+        starts = list(range(0, max(n_frames - window, 0) + 1, hop))
+        # Cover the tail of the region too
+        if starts[-1] + window < n_frames:
+            starts.append(max(n_frames - window, 0))
+
+        region_start_s = speech["start"] / SAMPLING_RATE
+        for start in starts:
+            end = min(start + window, n_frames)
+            windows.append((region, start, end))
+            times.append((region_start_s + start / 100, region_start_s + end / 100))
+
+    return windows, np.array(times, dtype=np.float32).reshape(-1, 2)
+
+
+def cache_key(recording_hash, embedder_name, speech_timestamps=None):
+    """
+    Keyed on the original recording's hash, which archiving to FLAC keeps,
+    and on the speech regions the embeddings are limited to.
+    """
+    regions = None if speech_timestamps is None else [[int(s["start"]), int(s["end"])] for s in speech_timestamps]
+    params = [
+        CACHE_VERSION, embedder_name, recording_hash, regions,
+        config.DIARIZATION_WINDOW_SECONDS, config.DIARIZATION_HOP_SECONDS
+    ]
+    return hashlib.sha1(json.dumps(params).encode()).hexdigest()
+
+
+def compute_embeddings(audio, embedder, speech_timestamps=None):
+    # The pipeline's VAD stage usually has the regions already
+    if speech_timestamps is None:
+        speech_timestamps = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=300, speech_pad_ms=100))
+
+    region_features = [embedder.features(audio[s["start"]:s["end"]]) for s in speech_timestamps]
+    windows, times = speech_windows(speech_timestamps, [len(f) for f in region_features])
+
+    if not windows:
+        return np.zeros((0, 2), dtype=np.float32), np.zeros((0, 0), dtype=np.float32)
+    return times, embedder.embed(region_features, windows)
+
+
+def load_embeddings(audio, recording_hash, cache_path, speech_timestamps=None):
+    """Returns (times, embeddings, cached), reusing cache_path when the track is unchanged."""
+    embedder = load_embedder()
+    key = cache_key(recording_hash, embedder.name, speech_timestamps)
+
+    if cache_path.exists():
+        try:
+            with np.load(cache_path) as cached:
+                if str(cached["key"]) == key:
+                    return cached["times"], cached["embeddings"], True
+        except Exception as e:
+            print(f"Ignoring unreadable diarization cache {cache_path}: {e}")
+
+    times, embeddings = compute_embeddings(audio, embedder, speech_timestamps)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # np.savez adds .npz to names without it, so write through a file object
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, key=key, times=times, embeddings=embeddings)
+    tmp_path.replace(cache_path)
+
+    return times, embeddings, False
+
+
+# =========================================================
+# Clustering
+# =========================================================
+
+def normalize_rows(x):
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-9)
+
+
+def spherical_kmeans(x, k, iterations=10):
+    """Cosine k-means seeded with evenly spaced windows (deterministic). Returns assignments."""
+    centroids = x[np.linspace(0, len(x) - 1, k).astype(int)]
+    for _ in range(iterations):
+        assignment = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, x)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums)
+    return np.argmax(x @ centroids.T, axis=1)
+
+
+def agglomerate(sums, counts, threshold, max_speakers):
+    """
+    Centroid-linkage merging of clusters given as vector sums.
+    Returns the surviving cluster index for every input cluster.
+    """
+    owner = np.arange(len(sums))
+    alive = list(range(len(sums)))
+    sums = sums.copy()
+    counts = counts.copy()
+
+    while len(alive) > 1:
+        centroids = normalize_rows(sums[alive])
+        similarity = centroids @ centroids.T
+        np.fill_diagonal(similarity, -np.inf)
+
+        # Tiny clusters merge no matter how dissimilar
+        small = counts[alive] < MIN_CLUSTER_SHARE * counts.sum()
+        i, j = np.unravel_index(np.argmax(similarity), similarity.shape)
+
+        if similarity[i, j] < threshold and len(alive) <= max_speakers:
+            if not small.any():
+                break
+            i = int(np.argmax(small))
+            j = int(np.argmax(np.where(np.arange(len(alive)) == i, -np.inf, similarity[i])))
+
+        keep, drop = alive[i], alive[j]
+        sums[keep] += sums[drop]
+        counts[keep] += counts[drop]
+        owner[owner == drop] = keep
+        alive.remove(drop)
+
+    return owner
+
+
+def cluster_embeddings(embeddings, threshold=None, max_speakers=None):
+    """Returns a speaker index per window, numbered from 0 in order of first appearance."""
+    threshold = config.DIARIZATION_THRESHOLD if threshold is None else threshold
+    max_speakers = max_speakers or config.DIARIZATION_MAX_SPEAKERS
+
+    if len(embeddings) == 0:
+        return np.zeros(0, dtype=int)
+
+    x = normalize_rows(embeddings - embeddings.mean(axis=0))
+    k = min(len(x), MICRO_CLUSTERS)
+    micro = spherical_kmeans(x, k)
+
+    sums = np.zeros((k, x.shape[1]), dtype=np.float64)
+    np.add.at(sums, micro, x)
+    counts = np.bincount(micro, minlength=k).astype(np.float64)
+
+    # Seeds that won no windows would otherwise become empty speakers
+    used = counts > 0
+    owner = np.full(k, -1)
+    owner[used] = np.flatnonzero(used)[agglomerate(sums[used], counts[used], threshold, max_speakers)]
+
+    raw = owner[micro]
+    _, first_seen = np.unique(raw, return_index=True)
+    remap = {cluster: index for index, cluster in enumerate(raw[np.sort(first_seen)])}
+    return np.array([remap[cluster] for cluster in raw], dtype=int)
+
+
+# =========================================================
+# Track Diarization
+# =========================================================
+
+class TrackDiarization:
+    """Sub-speaker windows of one track. Times are seconds from the track's first sample."""
+
+    def __init__(self, times, labels, cached=False):
+        self.times = times
+        self.labels = labels
+        self.cached = cached
+        self.speakers = int(labels.max()) + 1 if len(labels) else 0
+
+    def speaker_for(self, start_s, end_s):
+        """The label with the most speech overlapping [start_s, end_s], or None for a single speaker."""
+        if self.speakers < 2:
+            return None
+
+        overlap = np.minimum(self.times[:, 1], end_s) - np.maximum(self.times[:, 0], start_s)
+        if (overlap > 0).any():
+            votes = np.bincount(self.labels, weights=np.clip(overlap, 0, None), minlength=self.speakers)
+            index = int(np.argmax(votes))
+        else:
+            # VAD missed it, take the nearest window
+            centres = self.times.mean(axis=1)
+            index = int(self.labels[np.argmin(np.abs(centres - (start_s + end_s) / 2))])
+
+        return f"Speaker {index + 1}"
+
+
+def diarize_track(audio, recording_hash, cache_path, speech_timestamps=None):
+    times, embeddings, cached = load_embeddings(audio, recording_hash, cache_path, speech_timestamps)
+    return TrackDiarization(times, cluster_embeddings(embeddings), cached)
+
@@ -0,0 +1,231 @@
+"""
+Transcript exporters.
+
+Every exporter consumes the same (start_ms, end_ms, user_id, username, text)
+rows, so all formats are written from a single pass over the transcript.
+
+Re-export an existing session without re-running Whisper:
+    python -m bot.processing.exporters sessions/<session> [--formats srt,vtt]
+"""
+import argparse
+import json
+from datetime import datetime
+from pathlib import Path
+
+from bot.utils.logger import span
+from bot.processing.transcript_db import (
+    datetime_to_ms,
+    get_connection,
+    iter_transcripts,
+    ms_to_datetime
+)
+
+# Legacy rows have no end time; give subtitle cues a readable duration
+MIN_CUE_MS = 1000
+
+
+def format_clock(ms, separator="."):
+    ms = max(ms, 0)
+    hours, rem = divmod(ms, 3_600_000)
+    minutes, rem = divmod(rem, 60_000)
+    seconds, millis = divmod(rem, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{millis:03d}"
+
+
+# =========================================================
+# Exporters
+# =========================================================
+
+class Exporter:
+
+    extension = None
+
+    def __init__(self, session_path, origin_ms):
+        self.session_id = session_path.name
+        self.origin_ms = origin_ms
+        self.path = session_path / f"transcript.{self.extension}"
+        # Written aside and swapped in on close, so a re-export never exposes a partial file
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.file = open(self.tmp_path, "w", encoding="utf-8")
+        self.count = 0
+        self.write_header()
+
+    def write_header(self):
+        pass
+
+    def write(self, start_ms, end_ms, user_id, username, text):
+        self.count += 1
+        self.write_row(start_ms, end_ms, user_id, username, text)
+
+    def write_row(self, start_ms, end_ms, user_id, username, text):
+        raise NotImplementedError
+
+    def close(self, commit=True):
+        self.file.close()
+        if commit:
+            self.tmp_path.replace(self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+
+
+class TextExporter(Exporter):
+
+    extension = "txt"
+
+    def write_row(self, start_ms, end_ms, user_id, username, text):
+        pretty_time = ms_to_datetime(start_ms).strftime("%Y-%m-%d %H:%M:%S")
+        self.file.write(f"[{pretty_time}] {username}: {text}\n")
+
+
+class SrtExporter(Exporter):
+
+    extension = "srt"
+
+    def write_row(self, start_ms, end_ms, user_id, username, text):
+        start = start_ms - self.origin_ms
+        end = max(end_ms, start_ms + MIN_CUE_MS) - self.origin_ms
+        self.file.write(
+            f"{self.count}\n"
+            f"{format_clock(start, ',')} --> {format_clock(end, ',')}\n"
+            f"{username}: {text}\n\n"
+        )
+
+
+class VttExporter(Exporter):
+
+    extension = "vtt"
+
+    def write_header(self):
+        self.file.write("WEBVTT\n\n")
+
+    def write_row(self, start_ms, end_ms, user_id, username, text):
+        start = start_ms - self.origin_ms
+        end = max(end_ms, start_ms + MIN_CUE_MS) - self.origin_ms
+        self.file.write(
+            f"{format_clock(start)} --> {format_clock(end)}\n"
+            f"<v {username}>{text}\n\n"
+        )
+
+
+class JsonlExporter(Exporter):
+
+    extension = "jsonl"
+
+    def write_row(self, start_ms, end_ms, user_id, username, text):
+        record = {
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "offset_ms": start_ms - self.origin_ms,
+            "user_id": user_id,
+            "username": username,
+            "text": text
+        }
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class MarkdownExporter(Exporter):
+
+    extension = "md"
+
+    def write_header(self):
+        self.last_user = None
+        started = ms_to_datetime(self.origin_ms).strftime("%Y-%m-%d %H:%M:%S")
+        self.file.write(f"# Transcript `{self.session_id}`\n\n_Started {started}_\n")
+
+    def write_row(self, start_ms, end_ms, user_id, username, text):
+        # Group consecutive lines from the same speaker
+        if user_id != self.last_user:
+            self.file.write(f"\n**{username}** `{format_clock(start_ms - self.origin_ms)[:8]}`\n\n")
+            self.last_user = user_id
+        self.file.write(f"{text}\n")
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (TextExporter, SrtExporter, VttExporter, JsonlExporter, MarkdownExporter)
+}
+
+DEFAULT_FORMATS = tuple(EXPORTERS)
+
+
+# =========================================================
+# Fan-out
+# =========================================================
+
+class MultiExporter:
+    """Writes each row to every requested format."""
+
+    def __init__(self, session_path, origin_ms, formats=DEFAULT_FORMATS):
+        self.exporters = []
+        try:
+            for fmt in formats:
+                self.exporters.append(EXPORTERS[fmt](session_path, origin_ms))
+        except BaseException:
+            self.close(commit=False)
+            raise
+
+    def write(self, start_ms, end_ms, user_id, username, text):
+        for exporter in self.exporters:
+            exporter.write(start_ms, end_ms, user_id, username, text)
+
+    def close(self, commit=True):
+        for exporter in self.exporters:
+            exporter.close(commit)
+
+    @property
+    def paths(self):
+        return [exporter.path for exporter in self.exporters]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A failed export leaves the previous transcripts in place
+        self.close(commit=exc_type is None)
+
+
+def session_origin_ms(session_path):
+    with open(session_path / "metadata.json", "r", encoding="utf8") as f:
+        metadata = json.load(f)
+    return datetime_to_ms(datetime.fromisoformat(metadata["session_start"]))
+
+
+def export_session(session_path, formats=DEFAULT_FORMATS):
+    """Re-exports a finished session from its DB with one cursor."""
+    session_path = Path(session_path)
+    db_path = session_path / "transcriptions.db"
+
+    with span("export", session_path.name, formats=list(formats)), \
+            get_connection(db_path) as conn, \
+            MultiExporter(session_path, session_origin_ms(session_path), formats) as out:
+        for row in iter_transcripts(conn, session_path.name):
+            out.write(*row)
+
+    return out.paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-export session transcripts")
+    parser.add_argument("sessions", nargs="+", help="Session directories")
+    parser.add_argument(
+        "--formats",
+        default=",".join(DEFAULT_FORMATS),
+        help=f"Comma separated list of: {', '.join(EXPORTERS)}"
+    )
+    args = parser.parse_args(argv)
+
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in EXPORTERS]
+    if unknown:
+        parser.error(f"Unknown format(s): {', '.join(unknown)}")
+
+    for session in args.sessions:
+        try:
+            paths = export_session(session, formats)
+            print(f"Exported {session}: {', '.join(p.name for p in paths)}")
+        except Exception as e:
+            print(f"Failed to export {session}: {e}")
+
+
+if __name__ == "__main__":
+    main()
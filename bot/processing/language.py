@@ -0,0 +1,71 @@
+"""
+Per-speaker language resolution.
+
+A speaker's language is detected once, on their first speech, and cached
+by user ID in bot/utils/language_store.py. Later sessions pass it
+straight to `model.transcribe(language=...)`, which skips detection and
+stops Whisper from switching languages mid-track.
+"""
+import numpy as np
+
+import bot.utils.config as config
+from bot.utils.language_store import remember_user_language, resolve_language
+
+
+def detect_language(model, audio, vad_filter=True):
+    """
+    Returns (language, probability) for the first speech in `audio`,
+    restricted to MEETING_LANGUAGES when any of them scored.
+    """
+    try:
+        language, probability, all_probs = model.detect_language(audio=audio, vad_filter=vad_filter)
+    except ValueError:
+        # VAD found no speech at all
+        return None, 0.0
+
+    allowed = {lang: prob for lang, prob in all_probs if lang in config.MEETING_LANGUAGES}
+    if allowed:
+        language = max(allowed, key=allowed.get)
+        probability = allowed[language]
+
+    return language, probability
+
+
+def resolve_track_language(model, user_id, guild_id, audio, vad_filter=True):
+    """
+    Returns (language, source) where source is guild, pinned, cached or detected.
+    `audio` is a 16 kHz float array, or a callable producing one, and is
+    only touched when detection is needed.
+    """
+    language, source = resolve_language(user_id, guild_id)
+    if language:
+        return language, source
+
+    if callable(audio):
+        audio = audio()
+
+    language, probability = detect_language(model, audio, vad_filter)
+
+    # Only confident detections are remembered for future sessions
+    if language and probability >= config.LANGUAGE_CONFIDENCE:
+        remember_user_language(user_id, language, probability)
+
+    return language, "detected"
+
+
+def first_speech(audio, speech_timestamps, seconds=30, sampling_rate=16000):
+    """Joins the leading VAD speech chunks of `audio`, up to `seconds`, for detection."""
+    limit = seconds * sampling_rate
+    parts = []
+    total = 0
+
+    for speech in speech_timestamps:
+        part = audio[speech["start"]:speech["end"]]
+        parts.append(part)
+        total += len(part)
+        if total >= limit:
+            break
+
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(parts)[:limit]
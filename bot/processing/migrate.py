@@ -0,0 +1,117 @@
+"""
+Upgrades session transcription databases to the current schema.
+
+Usage:
+    python -m bot.processing.migrate [sessions_dir_or_session ...]
+"""
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from bot.processing.transcript_db import (
+    LEGACY_VERSION,
+    SCHEMA_VERSION,
+    create_schema,
+    datetime_to_ms,
+    get_connection,
+    get_schema_version,
+    has_table
+)
+
+
+def migrate_v0_to_v2(conn, session_id):
+    """
+    Legacy databases store an ISO TEXT `timestamp` and no end time.
+    End times are unknown, so they are set to the start time.
+    """
+    conn.execute("ALTER TABLE transcripts RENAME TO transcripts_legacy")
+
+    # Leftover staging rows from an interrupted run cannot be trusted
+    conn.execute("DROP TABLE IF EXISTS segments")
+    conn.execute("DROP INDEX IF EXISTS idx_timestamp")
+
+    create_schema(conn)
+
+    seqs = {}
+    cursor = conn.execute(
+        "SELECT timestamp, user_id, username, text FROM transcripts_legacy ORDER BY id"
+    )
+    for timestamp, user_id, username, text in cursor:
+        start_ms = datetime_to_ms(datetime.fromisoformat(timestamp))
+
+        seq = seqs.get(user_id, 0)
+        seqs[user_id] = seq + 1
+
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO transcripts (session_id, start_ms, user_id, seq, end_ms, username, text)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (session_id, start_ms, user_id, seq, start_ms, username, text)
+        )
+
+    conn.execute("DROP TABLE transcripts_legacy")
+
+
+def migrate_v2_to_v3(conn, session_id=None):
+    """Adds sub-speaker labels for diarized shared accounts."""
+    # Staging rows are transient, so the table is simply rebuilt
+    conn.execute("DROP TABLE IF EXISTS segments")
+    create_schema(conn)
+
+
+def migrate_db(db_path, session_id=None):
+    """Returns True if the database was changed."""
+    db_path = Path(db_path)
+    session_id = session_id or db_path.parent.name
+
+    with get_connection(db_path) as conn:
+        version = get_schema_version(conn)
+
+        if version == SCHEMA_VERSION:
+            return False
+
+        # Legacy databases never set a version; one stamped v1 has the same layout
+        if version in (0, LEGACY_VERSION):
+            if has_table(conn, "transcripts"):
+                migrate_v0_to_v2(conn, session_id)
+            else:
+                create_schema(conn)
+        elif version == 2:
+            migrate_v2_to_v3(conn, session_id)
+        else:
+            raise RuntimeError(f"Unknown transcript schema v{version} in {db_path}")
+
+        conn.commit()
+
+    # Reclaim the space left by the legacy table
+    with get_connection(db_path) as conn:
+        conn.execute("VACUUM")
+
+    return True
+
+
+def find_session_dbs(paths):
+    for path in paths:
+        path = Path(path)
+        if (path / "transcriptions.db").exists():
+            yield path / "transcriptions.db"
+        else:
+            yield from sorted(path.glob("*/transcriptions.db"))
+
+
+def main(argv=None):
+    paths = (argv if argv is not None else sys.argv[1:]) or ["sessions"]
+
+    for db_path in find_session_dbs(paths):
+        try:
+            if migrate_db(db_path):
+                print(f"Migrated {db_path} to schema v{SCHEMA_VERSION}")
+            else:
+                print(f"Up to date: {db_path}")
+        except Exception as e:
+            print(f"Failed to migrate {db_path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,774 @@
+"""
+Declarative processing pipeline for a recorded session.
+
+    ingest      metadata + audio        -> artifacts/ingest.json
+    vad         audio + activity.json   -> artifacts/vad/<user_id>.json
+    transcribe  audio + speech regions  -> artifacts/transcribe/<user_id>.jsonl
+    dedupe      transcribed segments    -> artifacts/dedupe.json
+    merge       segments - echoes       -> transcripts table
+    export      transcripts table       -> transcript.{txt,srt,vtt,jsonl,md}
+    index       metadata                -> sessions/index.db
+    summarize   transcripts table       -> summary.md
+
+Each stage names the stages it reads from, the config it depends on and
+the files it must leave behind. Its key hashes those together with the
+digests of its inputs, and a stage whose key matches pipeline.json (and
+whose outputs exist) is skipped. A digest is a content hash of a stage's
+artifacts, so a re-run that reproduces the same output stops there.
+VAD and transcription also cache per track, so a session with one
+changed track only decodes that track.
+
+Usage:
+    python -m bot.processing.pipeline <session_dir> [...] [--force STAGE ...]
+"""
+import argparse
+import bisect
+import hashlib
+import json
 import multiprocessing
-from bot.processing.transcriber import run_transcription
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+import bot.utils.config as config
+from bot.processing.audio import open_track_audio
+from bot.processing.dedupe import ECHO_MARK, find_track_echoes
+from bot.processing.exporters import DEFAULT_FORMATS, export_session
+from bot.processing.profiles import DEFAULT_PROFILE, PROFILES
+from bot.processing.progress import ProgressReporter
+from bot.processing.summarizer import SUMMARY_FILE, summarize_session
+from bot.processing.transcriber import TrackTranscript, TranscriptionSession, load_model, transcribe_track
+from bot.processing.transcript_db import get_connection, insert_segment, merge_transcripts, reset_staging
+from bot.utils.file_utils import file_digest
+from bot.utils.language_store import resolve_language
+from bot.utils.logger import log_event, setup_logging, span, stop_logging
+from bot.utils.profiler import install_worker_profiling, profile_dir, start_profiling, stop_profiling
+from bot.utils.session_index import upsert_session
+from bot.voice.activity import FRAME_MS, load_activity, padded_runs
+
+MANIFEST_FILE = "pipeline.json"
+ARTIFACTS_DIR = "artifacts"
+
+# Whisper's context window; speech regions never exceed it so batching can pack them
+MAX_CHUNK_SECONDS = 30
+
+SAMPLES_PER_MS = 16
+
+# Digest the summarize stage records for an empty transcript
+EMPTY_SUMMARY = "empty"
+
+
+def hash_value(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf8")).hexdigest()
+
+
+# =========================================================
+# Manifest / Context
+# =========================================================
+
+class Manifest:
+    """
+    pipeline.json: the key and digest each stage last finished with,
+    memoized file hashes, and the error of the last run if it failed.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.stages = {}
+        self.files = {}
+        self.failure = None
+
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf8"))
+                self.stages = data.get("stages", {})
+                self.files = data.get("files", {})
+                self.failure = data.get("failed")
+            except ValueError as e:
+                print(f"Ignoring unreadable pipeline manifest {self.path}: {e}")
+
+    def record(self, name, key, digest, duration_s):
+        self.stages[name] = {
+            "key": key,
+            "digest": digest,
+            "duration_s": round(duration_s, 3),
+            "finished_at": datetime.now().isoformat(timespec="seconds")
+        }
+        self.save()
+
+    def fail(self, name, error):
+        self.failure = {
+            "stage": name,
+            "error": str(error),
+            "failed_at": datetime.now().isoformat(timespec="seconds")
+        }
+        self.save()
+
+    def save(self):
+        data = {"stages": self.stages, "files": self.files}
+        if self.failure:
+            data["failed"] = self.failure
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2), encoding="utf8")
+        tmp_path.replace(self.path)
+
+
+class PipelineContext:
+    """What the stages of one session share: the session, its manifest and a lazily loaded model."""
+
+    def __init__(self, session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue=None, profile=DEFAULT_PROFILE, model_loader=None):
+        self.session = TranscriptionSession(session_dir, progress_queue)
+        self.path = self.session.path
+        self.id = self.session.id
+        self.reporter = self.session.reporter
+        self.manifest = Manifest(self.path / MANIFEST_FILE)
+        # Talk runs metered during capture, {} for older sessions
+        self.activity = load_activity(self.path)
+
+        self.whisper_model = whisper_model
+        self.device = device
+        self.compute_type = compute_type
+        self.hf_cache_dir = hf_cache_dir
+        self.profile = profile
+
+        # Batched workers share one model across sessions
+        self.model_loader = model_loader
+        self._model = None
+
+        self.export_paths = []
+
+    @property
+    def model(self):
+        # Sessions whose tracks are all cached never load a model
+        if self._model is None:
+            if self.model_loader is not None:
+                self._model = self.model_loader()
+            else:
+                load_started = time.monotonic()
+                with span("model_load", self.id, model=self.whisper_model, device=self.device, compute_type=self.compute_type):
+                    self._model = load_model(self.whisper_model, self.device, self.compute_type, self.hf_cache_dir)
+                load_s = time.monotonic() - load_started
+                self.reporter.model_loaded(load_s)
+                self.reporter.metric("meeting_model_load_seconds", load_s)
+        return self._model
+
+    def artifact(self, *parts):
+        return self.path / ARTIFACTS_DIR / Path(*parts)
+
+    def file_hash(self, path):
+        """Content hash of a file, recomputed only when its size or mtime changed."""
+        path = Path(path)
+        stat = path.stat()
+        name = str(path.relative_to(self.path))
+
+        cached = self.manifest.files.get(name)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = file_digest(path)
+        self.manifest.files[name] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def track_hash(self, track):
+        """
+        Hash of a track's recording. Archived tracks keep the hash of their
+        original WAV, so compressing a session does not invalidate its caches.
+        Kept on the track, where diarization reads it too.
+        """
+        if not track.audio_hash:
+            track.audio_hash = self.recording_hash(track)
+        return track.audio_hash
+
+    def recording_hash(self, track):
+        if track.original_file:
+            # Archived before metadata kept the hash; an earlier run memoized it
+            cached = self.manifest.files.get(str(Path("users", track.original_file)))
+            if cached:
+                return cached[2]
+        return self.file_hash(track.audio_path)
+
+    def files_hash(self, paths):
+        return hash_value([[str(Path(p).relative_to(self.path)), self.file_hash(p)] for p in paths])
+
+
+# =========================================================
+# Stages
+# =========================================================
+
+class Stage:
+    """One step of the pipeline. Subclasses declare what it reads and depends on."""
+
+    name = None
+    inputs = ()
+    # Bump when a stage's output format or logic changes
+    version = 1
+    # Failures are logged and the pipeline carries on without it
+    optional = False
+
+    def enabled(self, ctx):
+        return True
+
+    def params(self, ctx):
+        """Config and source hashes the output depends on."""
+        return {}
+
+    def outputs(self, ctx):
+        """Files that must exist for a cached result to count."""
+        return []
+
+    def run(self, ctx):
+        """Does the work. Returns a digest of the output, or None to use the key."""
+        raise NotImplementedError
+
+
+class IngestStage(Stage):
+    name = "ingest"
+
+    def params(self, ctx):
+        session = ctx.session
+        return {
+            "session_start": session.metadata["session_start"],
+            "tracks": [
+                [t.user_id, t.name, t.join_offset_ms, t.shared, ctx.track_hash(t)]
+                for t in session.tracks
+            ]
+        }
+
+    def outputs(self, ctx):
+        return [ctx.artifact("ingest.json")]
+
+    def run(self, ctx):
+        tracks = [
+            {
+                "user_id": t.user_id,
+                "name": t.name,
+                "file": t.audio_path.name,
+                "join_offset_ms": t.join_offset_ms,
+                "shared": t.shared,
+                "duration_s": t.duration_s,
+                "hash": ctx.track_hash(t)
+            }
+            for t in ctx.session.tracks
+        ]
+
+        path = ctx.artifact("ingest.json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"tracks": tracks}, indent=2), encoding="utf8")
+        return ctx.file_hash(path)
+
+
+class VadStage(Stage):
+    name = "vad"
+    inputs = ("ingest",)
+
+    def params(self, ctx):
+        return {
+            "min_silence_ms": config.VAD_MIN_SILENCE_MS,
+            "speech_pad_ms": config.VAD_SPEECH_PAD_MS,
+            "max_speech_s": MAX_CHUNK_SECONDS,
+            "activity_pad_ms": config.ACTIVITY_PAD_MS,
+            "activity_floor_dbfs": config.ACTIVITY_FLOOR_DBFS,
+        }
+
+    def outputs(self, ctx):
+        return [ctx.artifact("vad", f"{t.user_id}.json") for t in ctx.session.tracks]
+
+    def run(self, ctx):
+        options = VadOptions(
+            max_speech_duration_s=MAX_CHUNK_SECONDS,
+            min_silence_duration_ms=config.VAD_MIN_SILENCE_MS,
+            speech_pad_ms=config.VAD_SPEECH_PAD_MS
+        )
+        params = self.params(ctx)
+
+        for track in ctx.session.tracks:
+            path = ctx.artifact("vad", f"{track.user_id}.json")
+            runs = track_runs(ctx, track)
+            key = hash_value([params, ctx.track_hash(track), runs])
+
+            if load_json(path, {}).get("key") == key:
+                continue
+
+            with span("vad", ctx.id, speaker=track.name, user_id=track.user_id) as vad_span, \
+                    open_track_audio(track.audio_path) as audio:
+                speech = detect_speech(audio, options, runs)
+                vad_span.fields.update(regions=len(speech), metered=runs is not None)
+
+                if runs is not None:
+                    # Speech the level meter missed, e.g. a quiet speaker or a low-gain mic
+                    quiet_s = unmetered_seconds(speech, runs)
+                    vad_span.fields.update(unmetered_s=round(quiet_s, 1))
+                    if quiet_s >= 1:
+                        print(f"{track.name}: {quiet_s:.0f}s of speech below the activity threshold")
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({"key": key, "speech": speech}), encoding="utf8")
+
+        return ctx.files_hash(self.outputs(ctx))
+
+
+class TranscribeStage(Stage):
+    name = "transcribe"
+    inputs = ("ingest", "vad")
+
+    def params(self, ctx):
+        params = {
+            "model": ctx.whisper_model,
+            "profile": ctx.profile,
+            "word_timestamps": config.WORD_TIMESTAMPS,
+            "clips": [config.ACTIVITY_PAD_MS, config.ACTIVITY_CLIP_GAP_MS],
+        }
+        if any(t.shared for t in ctx.session.tracks):
+            params["diarization"] = [
+                config.DIARIZATION_MODEL, config.DIARIZATION_THRESHOLD, config.DIARIZATION_MAX_SPEAKERS
+            ]
+        return params
+
+    def outputs(self, ctx):
+        return [ctx.artifact("transcribe", f"{t.user_id}.jsonl") for t in ctx.session.tracks]
+
+    def track_key(self, ctx, track):
+        speech_key = load_json(ctx.artifact("vad", f"{track.user_id}.json"), {}).get("key")
+        return hash_value([self.version, self.params(ctx), ctx.track_hash(track), speech_key, track.shared])
+
+    def pending_tracks(self, ctx):
+        """Tracks whose transcript is missing or out of date."""
+        pending = []
+        for track in ctx.session.tracks:
+            meta = track_transcript(ctx, track).meta()
+            if meta is None or meta.get("key") != self.track_key(ctx, track):
+                pending.append(track)
+                continue
+
+            # A language pinned since the last run invalidates the track
+            language, source = resolve_language(track.user_id, ctx.session.guild_id)
+            if source in ("guild", "pinned") and language != meta.get("language"):
+                pending.append(track)
+        return pending
+
+    def run(self, ctx):
+        session = ctx.session
+        pending = self.pending_tracks(ctx)
+
+        for track in session.tracks:
+            if track not in pending:
+                print(f"Using cached transcript for {track.name}")
+                session.reporter.speaker_progress(track.name, track.duration_s, track.duration_s, session.audio_before(track), force=True)
+                continue
+
+            out = track_transcript(ctx, track).open()
+            speech = track_speech(ctx, track)
+            language, source = transcribe_track(ctx.model, session, track, out, ctx.profile, speech, track_clips(ctx, track))
+            out.close(key=self.track_key(ctx, track), language=language, language_source=source)
+
+        return ctx.files_hash(self.outputs(ctx))
+
+
+class DedupeStage(Stage):
+    name = "dedupe"
+    inputs = ("transcribe",)
+
+    def params(self, ctx):
+        return {
+            "window_ms": config.CROSSTALK_WINDOW_MS,
+            "similarity": config.CROSSTALK_SIMILARITY,
+            "min_chars": config.CROSSTALK_MIN_CHARS,
+        }
+
+    def outputs(self, ctx):
+        return [ctx.artifact("dedupe.json")]
+
+    def run(self, ctx):
+        tracks = {t.user_id: list(track_transcript(ctx, t).rows()) for t in ctx.session.tracks}
+        echoes = find_track_echoes(tracks, ctx.id)
+
+        path = ctx.artifact("dedupe.json")
+        path.write_text(json.dumps({"echoes": echoes}), encoding="utf8")
+        if echoes:
+            print(f"Crosstalk: {len(echoes)} echoed segment(s) found")
+        return ctx.file_hash(path)
+
+
+class MergeStage(Stage):
+    name = "merge"
+    inputs = ("transcribe", "dedupe")
+
+    def params(self, ctx):
+        return {"crosstalk": config.CROSSTALK_DEDUPE}
+
+    def run(self, ctx):
+        session = ctx.session
+        echoes = set()
+        if config.CROSSTALK_DEDUPE != "off":
+            echoes = {(user_id, seq) for user_id, seq, *_ in load_json(ctx.artifact("dedupe.json"), {}).get("echoes", [])}
 
-def spawn_processing(session_dir, whisper_model, device, compute_type, hf_cache_dir):
+        # Rebuilt from the track artifacts on every merge
+        reset_staging(session.db_path)
+        with get_connection(session.db_path) as conn:
+            for track in session.tracks:
+                for row in track_transcript(ctx, track).rows():
+                    text = row["text"]
+                    if (track.user_id, row["seq"]) in echoes:
+                        if config.CROSSTALK_DEDUPE == "drop":
+                            continue
+                        text = ECHO_MARK + text
+
+                    insert_segment(
+                        conn, track.user_id, row["seq"], row["start_ms"], row["end_ms"],
+                        track.name, text, row["words"], row["speaker"]
+                    )
+            conn.commit()
+
+        print(f"Merging speakers for {ctx.id}...")
+        merge_started = time.monotonic()
+        merge_transcripts(session.db_path, ctx.id)
+        ctx.reporter.metric("meeting_db_commit_seconds", time.monotonic() - merge_started, stage="merge")
+
+
+class ExportStage(Stage):
+    name = "export"
+    inputs = ("merge",)
+
+    def params(self, ctx):
+        return {"formats": list(DEFAULT_FORMATS)}
+
+    def outputs(self, ctx):
+        return [ctx.path / f"transcript.{fmt}" for fmt in DEFAULT_FORMATS]
+
+    def run(self, ctx):
+        ctx.export_paths = export_session(ctx.path)
+        return ctx.files_hash(ctx.export_paths)
+
+
+class IndexStage(Stage):
+    name = "index"
+    inputs = ("merge",)
+
+    def run(self, ctx):
+        upsert_session(ctx.path, ctx.session.metadata, transcribed=True)
+
+
+class SummarizeStage(Stage):
+    name = "summarize"
+    inputs = ("merge",)
+    optional = True
+
+    def enabled(self, ctx):
+        return config.SUMMARY_BACKEND != "off"
+
+    def params(self, ctx):
+        return {
+            "backend": config.SUMMARY_BACKEND,
+            "model": config.SUMMARY_MODEL,
+            "window_minutes": config.SUMMARY_WINDOW_MINUTES,
+            "fanin": config.SUMMARY_REDUCE_FANIN,
+        }
+
+    def outputs(self, ctx):
+        # A session where nobody spoke has no summary to expect
+        record = ctx.manifest.stages.get(self.name)
+        if record and record["digest"] == EMPTY_SUMMARY:
+            return []
+        return [ctx.path / SUMMARY_FILE]
+
+    def run(self, ctx):
+        path = summarize_session(ctx.path)
+        if path is None:
+            # Recorded like any result, so the stage stays up to date; an older summary no longer applies
+            (ctx.path / SUMMARY_FILE).unlink(missing_ok=True)
+            return EMPTY_SUMMARY
+        return ctx.file_hash(path)
+
+
+STAGES = (
+    IngestStage(),
+    VadStage(),
+    TranscribeStage(),
+    DedupeStage(),
+    MergeStage(),
+    ExportStage(),
+    IndexStage(),
+    SummarizeStage(),
+)
+
+STAGE_NAMES = [stage.name for stage in STAGES]
+
+
+def load_json(path, default=None):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf8"))
+    except (OSError, ValueError):
+        return default
+
+
+def track_transcript(ctx, track):
+    return TrackTranscript(ctx.artifact("transcribe", f"{track.user_id}.jsonl"))
+
+
+def track_speech(ctx, track):
+    """The VAD stage's speech regions of a track, in samples."""
+    return load_json(ctx.artifact("vad", f"{track.user_id}.json"), {}).get("speech")
+
+
+def track_runs(ctx, track):
+    """Talk runs (track ms) metered during capture, or None when the session has no activity.json."""
+    entry = ctx.activity.get(track.user_id)
+    return entry["runs"] if entry else None
+
+
+def track_clips(ctx, track):
+    """
+    Whisper clip_timestamps (s) around the VAD stage's speech, for metered
+    sessions, or None to decode the whole track with the profile's own VAD.
+    """
+    speech = track_speech(ctx, track)
+    if track_runs(ctx, track) is None or not speech:
+        return None
+
+    duration_ms = track.duration_s * 1000
+    regions = [[region["start"] // SAMPLES_PER_MS, region["end"] // SAMPLES_PER_MS] for region in speech]
+    clips = padded_runs(regions, config.ACTIVITY_PAD_MS, config.ACTIVITY_CLIP_GAP_MS)
+    return [min(ms, duration_ms) / 1000 for clip in clips for ms in clip if clip[0] < duration_ms]
+
+
+def audible_runs(audio, floor_dbfs, block_s=60):
+    """[start_ms, end_ms] runs of 16 kHz audio louder than `floor_dbfs`, measured a block at a time."""
+    frame = FRAME_MS * SAMPLES_PER_MS
+    floor_power = 10 ** (floor_dbfs / 10)
+    block = block_s * 1000 // FRAME_MS * frame
+
+    active = []
+    for offset in range(0, len(audio), block):
+        chunk = np.asarray(audio[offset:offset + block])
+        n = len(chunk) // frame
+        if not n:
+            break
+        power = np.mean(np.square(chunk[:n * frame].reshape(n, frame)), axis=1)
+        active.append(np.flatnonzero(power > floor_power) + offset // frame)
+
+    active = np.concatenate(active) if active else np.zeros(0, dtype=np.int64)
+    if not len(active):
+        return []
+
+    breaks = np.flatnonzero(np.diff(active) > 1) + 1
+    starts = active[np.concatenate(([0], breaks))]
+    ends = active[np.concatenate((breaks - 1, [len(active) - 1]))] + 1
+    return [[int(s) * FRAME_MS, int(e) * FRAME_MS] for s, e in zip(starts, ends)]
+
+
+def unmetered_seconds(speech, runs):
+    """Seconds of VAD speech (samples) starting outside the padded talk runs (ms)."""
+    padded = padded_runs(runs, config.ACTIVITY_PAD_MS)
+    starts = [start for start, _ in padded]
+    total = 0
+    for region in speech:
+        start_ms = region["start"] / SAMPLES_PER_MS
+        index = bisect.bisect_right(starts, start_ms) - 1
+        if index < 0 or start_ms > padded[index][1]:
+            total += region["end"] - region["start"]
+    return total / (SAMPLES_PER_MS * 1000)
+
+
+def detect_speech(audio, options, runs=None):
+    """
+    Speech regions in samples. With metered talk runs, only the runs and
+    whatever else was received (above ACTIVITY_FLOOR_DBFS) are searched;
+    the silence padded between packets never is.
+    """
+    if runs is None:
+        return get_speech_timestamps(audio, options)
+
+    # The meter's runs are a hint: quiet speech below its threshold is searched too
+    search = sorted(runs + audible_runs(audio, config.ACTIVITY_FLOOR_DBFS))
+
+    speech = []
+    for start_ms, end_ms in padded_runs(search, config.ACTIVITY_PAD_MS):
+        start, end = start_ms * SAMPLES_PER_MS, min(end_ms * SAMPLES_PER_MS, len(audio))
+        if start >= end:
+            break
+        speech.extend(
+            {"start": region["start"] + start, "end": region["end"] + start}
+            for region in get_speech_timestamps(audio[start:end], options)
+        )
+    return speech
+
+
+# =========================================================
+# Runner
+# =========================================================
+
+class SessionPipeline:
+
+    def __init__(self, ctx, stages=STAGES):
+        self.ctx = ctx
+        self.stages = stages
+
+    def stage_key(self, stage, digests):
+        return hash_value([stage.name, stage.version, stage.params(self.ctx), [digests.get(name) for name in stage.inputs]])
+
+    def cached_record(self, stage, key, force=()):
+        """The manifest record of `stage` if it is still valid for `key`, else None."""
+        record = self.ctx.manifest.stages.get(stage.name)
+        if stage.name in force or record is None or record["key"] != key:
+            return None
+        if not all(path.exists() for path in stage.outputs(self.ctx)):
+            return None
+        return record
+
+    def stale_stage(self, force=()):
+        """The first stage a run would redo, or None when the session is up to date."""
+        digests = {}
+        for stage in self.stages:
+            if not stage.enabled(self.ctx):
+                continue
+
+            record = self.cached_record(stage, self.stage_key(stage, digests), force)
+            if record is None:
+                return stage.name
+            digests[stage.name] = record["digest"]
+
+        return None
+
+    def run(self, force=(), stop_before=None):
+        """Runs every stale stage in order. `force` re-runs named stages even when cached."""
+        ctx = self.ctx
+        digests = {}
+
+        # Merging the remaining tracks would replace the stored transcript with a partial one
+        if ctx.session.missing_tracks:
+            reason = ctx.session.metadata.get("audio_deleted")
+            raise FileNotFoundError(
+                f"Audio missing for {', '.join(ctx.session.missing_tracks)} in {ctx.id}"
+                + (f" (deleted by retention: {reason})" if reason else "")
+                + ", not re-running the pipeline"
+            )
+
+        for stage in self.stages:
+            if stage.name == stop_before:
+                break
+            if not stage.enabled(ctx):
+                continue
+
+            key = self.stage_key(stage, digests)
+            record = self.cached_record(stage, key, force)
+
+            if record is not None:
+                digests[stage.name] = record["digest"]
+                log_event("pipeline_skip", ctx.id, step=stage.name)
+                continue
+
+            started = time.monotonic()
+            try:
+                with span("pipeline", ctx.id, step=stage.name):
+                    digest = stage.run(ctx) or key
+            except Exception as e:
+                if not stage.optional:
+                    ctx.manifest.fail(stage.name, e)
+                    raise
+                print(f"Stage {stage.name} failed for {ctx.id}: {e}")
+                continue
+
+            digests[stage.name] = digest
+            ctx.manifest.record(stage.name, key, digest, time.monotonic() - started)
+
+        if stop_before is None:
+            ctx.manifest.failure = None
+        # File hashes memoized during the run
+        ctx.manifest.save()
+
+
+def finish_pipeline(ctx, force=()):
+    """Runs the remaining stages of a started session and reports it finished."""
+    SessionPipeline(ctx).run(force)
+
+    paths = ctx.export_paths or [path for path in ExportStage().outputs(ctx) if path.exists()]
+    ctx.reporter.finished(paths, ctx.profile)
+    print(f"Transcription finished. Transcripts saved to {', '.join(str(p) for p in paths)}")
+
+
+def run_session_pipeline(session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue=None, profile=DEFAULT_PROFILE, force=()):
+    ctx = PipelineContext(session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue, profile)
+    ctx.reporter.started(ctx.session.total_audio_s, [track.name for track in ctx.session.tracks])
+    finish_pipeline(ctx, force)
+
+
+# =========================================================
+# Worker Processes
+# =========================================================
+
+def start_worker_profiling(session_dir):
+    """Profiles on SIGUSR1 (/profile), and from the start with --profile."""
+    install_worker_profiling(session_dir)
+    if config.PROFILE_SECONDS:
+        start_profiling(profile_dir(session_dir), "worker", config.PROFILE_SECONDS, Path(session_dir).name)
+
+def run_job(session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue=None, profile=DEFAULT_PROFILE):
+    setup_logging("worker")
+    start_worker_profiling(session_dir)
+    try:
+        run_session_pipeline(session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue, profile)
+    except Exception as e:
+        ProgressReporter(progress_queue, Path(session_dir).name).failed(e)
+        raise
+    finally:
+        # Worker processes exit without running atexit handlers
+        stop_profiling()
+        stop_logging()
+
+def run_batch_job(session_dirs, whisper_model, device, compute_type, hf_cache_dir, progress_queue=None, profile=DEFAULT_PROFILE):
+    # Imported here so CPU-only workers never touch the batched pipeline
+    from bot.processing.batched import run_batched_transcription
+
+    setup_logging("worker")
+    # A batch writes its profile into the first session's folder
+    start_worker_profiling(session_dirs[0])
+    try:
+        run_batched_transcription(session_dirs, whisper_model, device, compute_type, hf_cache_dir, progress_queue, profile)
+    except Exception as e:
+        for session_dir in session_dirs:
+            ProgressReporter(progress_queue, Path(session_dir).name).failed(e)
+        raise
+    finally:
+        stop_profiling()
+        stop_logging()
+
+def spawn_processing(session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue=None, profile=DEFAULT_PROFILE):
     p = multiprocessing.Process(
-        target=run_transcription,
-        args=(session_dir, whisper_model, device, compute_type, hf_cache_dir)
+        target=run_job,
+        args=(session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue, profile)
     )
     p.start()
+    return p
+
+def spawn_batch_processing(session_dirs, whisper_model, device, compute_type, hf_cache_dir, progress_queue=None, profile=DEFAULT_PROFILE):
+    p = multiprocessing.Process(
+        target=run_batch_job,
+        args=(list(session_dirs), whisper_model, device, compute_type, hf_cache_dir, progress_queue, profile)
+    )
+    p.start()
+    return p
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the processing pipeline on sessions, skipping up-to-date stages")
+    parser.add_argument("sessions", nargs="+", help="Session directories")
+    parser.add_argument("--force", nargs="+", default=[], choices=STAGE_NAMES, metavar="STAGE", help=f"Re-run these stages: {', '.join(STAGE_NAMES)}")
+    parser.add_argument("--decoding-profile", choices=list(PROFILES), default=config.DECODING_PROFILE, help="Decoding profile")
+    args = parser.parse_args(argv)
+
+    for session in args.sessions:
+        try:
+            run_session_pipeline(
+                session, config.WHISPER_MODEL, config.DEVICE, config.COMPUTE_TYPE,
+                config.HF_CACHE_DIR, profile=args.decoding_profile, force=set(args.force)
+            )
+        except Exception as e:
+            print(f"Failed to process {session}: {e}")
+
+
+if __name__ == "__main__":
+    main()
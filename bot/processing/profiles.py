@@ -0,0 +1,52 @@
+"""
+Named decoding profiles passed through to faster-whisper's transcribe().
+"""
+
+# Whisper's default temperature fallback schedule
+FALLBACK_TEMPERATURES = [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]
+
+PROFILES = {
+    # Greedy, no fallback, skips silence: a quick draft
+    "fast": {
+        "beam_size": 1,
+        "best_of": 1,
+        "temperature": 0.0,
+        "condition_on_previous_text": False,
+        "without_timestamps": False,
+        "vad_filter": True,
+    },
+    # The long-standing default (beam_size=5)
+    "balanced": {
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": FALLBACK_TEMPERATURES,
+        "condition_on_previous_text": True,
+        "without_timestamps": False,
+        "vad_filter": False,
+    },
+    # Wider beam and more patient search for the final transcript
+    "accurate": {
+        "beam_size": 8,
+        "best_of": 8,
+        "patience": 1.5,
+        "temperature": FALLBACK_TEMPERATURES,
+        "condition_on_previous_text": True,
+        "without_timestamps": False,
+        "vad_filter": False,
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown decoding profile '{name}', expected one of: {', '.join(PROFILES)}")
+    return dict(PROFILES[name])
+
+
+def batched_options(name):
+    """Profile options for BatchedInferencePipeline, which is fed pre-cut chunks."""
+    options = get_profile(name)
+    options.pop("vad_filter")
+    return options
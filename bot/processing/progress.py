@@ -0,0 +1,250 @@
+"""
+Progress reporting from transcription workers back to the bot.
+
+Workers push small dict events onto a multiprocessing queue through a
+ProgressReporter. The bot drains that queue with a ProgressMonitor and
+keeps one status message per session up to date.
+"""
+import asyncio
+import queue
+import time
+import multiprocessing
+
+from bot.utils.metrics import TRANSCRIPTION_RTF, record_remote
+
+# Minimum seconds between two progress events for the same speaker
+REPORT_INTERVAL = 2.0
+
+# Discord allows ~5 edits / 5 s per channel; stay well below that
+EDIT_INTERVAL = 5.0
+
+
+def format_duration(seconds):
+    seconds = int(max(seconds, 0))
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+# =========================================================
+# Worker Side
+# =========================================================
+
+class ProgressReporter:
+    """Sends progress events for one session. A None queue makes every call a no-op."""
+
+    def __init__(self, progress_queue, session_id):
+        self.queue = progress_queue
+        self.session_id = session_id
+
+        self.started_at = time.monotonic()
+        self.total_audio_s = 0.0
+        self.done_audio_s = 0.0
+        self.last_report = 0.0
+
+    def send(self, event, **data):
+        if self.queue is None:
+            return
+        try:
+            self.queue.put_nowait({"session_id": self.session_id, "event": event, **data})
+        except Exception:
+            # Progress is best effort and must never break a transcription
+            pass
+
+    def rtf(self):
+        """Real-time factor: processing seconds per second of audio."""
+        if self.done_audio_s <= 0:
+            return None
+        return (time.monotonic() - self.started_at) / self.done_audio_s
+
+    def eta(self):
+        rtf = self.rtf()
+        if rtf is None:
+            return None
+        return (self.total_audio_s - self.done_audio_s) * rtf
+
+    def started(self, total_audio_s, speakers):
+        self.started_at = time.monotonic()
+        self.total_audio_s = total_audio_s
+        self.send("started", total_audio_s=total_audio_s, speakers=speakers)
+
+    def model_loaded(self, load_s):
+        # RTF measures transcription only, not model load
+        self.started_at = time.monotonic()
+        self.send("loaded", load_s=load_s)
+
+    def speaker_progress(self, name, speaker_done_s, speaker_total_s, base_done_s, force=False):
+        """`base_done_s` is the audio already finished by earlier speakers."""
+        self.done_audio_s = base_done_s + speaker_done_s
+
+        now = time.monotonic()
+        if not force and now - self.last_report < REPORT_INTERVAL:
+            return
+        self.last_report = now
+
+        self.send(
+            "progress",
+            speaker=name,
+            speaker_done_s=speaker_done_s,
+            speaker_total_s=speaker_total_s,
+            done_audio_s=self.done_audio_s,
+            total_audio_s=self.total_audio_s,
+            rtf=self.rtf(),
+            eta_s=self.eta()
+        )
+
+    def finished(self, paths, profile=None):
+        self.send(
+            "finished",
+            profile=profile,
+            elapsed_s=time.monotonic() - self.started_at,
+            total_audio_s=self.total_audio_s,
+            rtf=self.rtf(),
+            paths=[str(p) for p in paths]
+        )
+
+    def failed(self, error):
+        self.send("failed", error=str(error))
+
+    def metric(self, name, value, **labels):
+        """Records `value` in the bot's metric `name` (see bot/utils/metrics.py)."""
+        self.send("metric", name=name, value=value, labels=labels)
+
+
+# =========================================================
+# Bot Side
+# =========================================================
+
+class SessionStatus:
+
+    def __init__(self, session_id, message=None, channel=None):
+        self.session_id = session_id
+        self.message = message
+        self.channel = channel
+
+        self.state = "queued"
+        self.queue_position = None
+        self.last = {}
+        self.dirty = False
+        self.last_edit = 0.0
+
+    def render(self):
+        if self.state == "queued":
+            position = f" (position {self.queue_position + 1})" if self.queue_position is not None else ""
+            return f"⏳ `{self.session_id}` waiting for transcription{position}"
+
+        if self.state == "failed":
+            return f"❌ `{self.session_id}` transcription failed: {self.last.get('error')}"
+
+        if self.state == "finished":
+            rtf = self.last.get("rtf")
+            return (
+                f"✅ `{self.session_id}` transcribed "
+                f"{format_duration(self.last.get('total_audio_s', 0))} of audio in "
+                f"{format_duration(self.last.get('elapsed_s', 0))}"
+                + (f" (RTF {rtf:.2f})" if rtf else "")
+                + (f" [{self.last['profile']}]" if self.last.get("profile") else "")
+            )
+
+        if "load_s" not in self.last:
+            return f"📦 `{self.session_id}` loading model"
+
+        lines = [f"📝 `{self.session_id}` transcribing"]
+        total = self.last.get("total_audio_s") or 0
+        done = self.last.get("done_audio_s") or 0
+        if total:
+            lines.append(f"Audio: {format_duration(done)} / {format_duration(total)} ({done / total:.0%})")
+        if self.last.get("speaker"):
+            lines.append(
+                f"Speaker: {self.last['speaker']} "
+                f"{format_duration(self.last['speaker_done_s'])} / {format_duration(self.last['speaker_total_s'])}"
+            )
+        if self.last.get("rtf"):
+            lines.append(f"RTF: {self.last['rtf']:.2f}")
+        if self.last.get("eta_s") is not None:
+            lines.append(f"ETA: {format_duration(self.last['eta_s'])}")
+        return "\n".join(lines)
+
+
+class ProgressMonitor:
+    """Drains worker events and edits one status message per session."""
+
+    def __init__(self):
+        self.queue = multiprocessing.Queue()
+        self.sessions = {}
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def watch(self, session_id, message=None, channel=None):
+        status = SessionStatus(session_id, message, channel)
+        self.sessions[session_id] = status
+        return status
+
+    def handle(self, event):
+        kind = event["event"]
+        if kind == "metric":
+            record_remote(event)
+            return
+        if kind == "finished" and event.get("rtf"):
+            TRANSCRIPTION_RTF.observe(event["rtf"], profile=event.get("profile") or "")
+
+        status = self.sessions.get(event["session_id"])
+        if status is None:
+            status = self.watch(event["session_id"])
+
+        if kind == "failed" and status.state == "failed":
+            # The scheduler also reports workers that exited with an error; keep the worker's reason
+            return
+
+        if kind == "queued":
+            # Sent by the scheduler on every admission round
+            if status.queue_position == event["position"]:
+                return
+            status.queue_position = event["position"]
+
+        status.state = "running" if kind in ("started", "loaded", "progress") else kind
+        status.last.update(event)
+        status.dirty = True
+
+    async def flush(self, status):
+        if not status.dirty:
+            return
+
+        final = status.state in ("finished", "failed")
+        if not final and time.monotonic() - status.last_edit < EDIT_INTERVAL:
+            return
+
+        status.dirty = False
+        status.last_edit = time.monotonic()
+
+        try:
+            if status.message is not None:
+                await status.message.edit(content=status.render())
+            if final and status.channel is not None:
+                await status.channel.send(status.render())
+        except Exception as e:
+            print(f"Failed to update transcription status for {status.session_id}: {e}")
+
+        if final:
+            self.sessions.pop(status.session_id, None)
+
+    async def run(self):
+        while True:
+            # Drain without blocking the event loop
+            try:
+                while True:
+                    self.handle(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            for status in list(self.sessions.values()):
+                await self.flush(status)
+
+            await asyncio.sleep(0.5)
@@ -0,0 +1,295 @@
+"""
+Transcription job scheduler.
+
+Jobs are admitted by their estimated model memory so concurrent meetings
+never oversubscribe the GPU. Pending jobs are ordered for per-guild
+fairness first and shortest audio second, and spill over to CPU workers
+when the GPU is full. Idle jobs (accurate re-passes of fast drafts) only
+start when nothing else is queued or running, and never on the fallback
+pool, whose model may be smaller than the draft's.
+"""
+import asyncio
+import itertools
+import time
+from pathlib import Path
+
+import bot.utils.config as config
+from bot.processing.pipeline import spawn_batch_processing, spawn_processing
+from bot.utils.file_utils import estimate_audio_seconds, list_user_audio_files
+from bot.utils.logger import start_span
+from bot.utils.metrics import JOB_LATENCY, JOB_QUEUE_WAIT, JOBS_PENDING
+
+# Approximate parameter counts (millions) of the Whisper checkpoints
+MODEL_PARAMS_M = {
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large-v1": 1550,
+    "large-v2": 1550,
+    "large-v3": 1550,
+    "large": 1550,
+    "distil-large-v3": 756,
+    "turbo": 809,
+    "large-v3-turbo": 809,
+}
+
+BYTES_PER_PARAM = {
+    "float32": 4,
+    "float16": 2,
+    "bfloat16": 2,
+    "int8_float32": 1,
+    "int8_float16": 1,
+    "int8_bfloat16": 1,
+    "int8": 1,
+}
+
+# Activations, beam search state and CUDA/CT2 runtime on top of the weights
+RUNTIME_OVERHEAD_GB = 0.75
+ACTIVATION_FACTOR = 1.5
+# Extra encoder/decoder state per item in a batched forward pass
+BATCH_ITEM_GB = 0.08
+
+# How often finished workers are reaped
+POLL_INTERVAL = 1.0
+
+
+def estimate_model_memory_gb(model, compute_type, batch_size=1):
+    # English-only variants (small.en, ...) are the same size
+    params_m = MODEL_PARAMS_M.get(model.removesuffix(".en"), MODEL_PARAMS_M["large-v3"])
+    weights_gb = params_m * 1e6 * BYTES_PER_PARAM.get(compute_type, 2) / 1024**3
+    return weights_gb * ACTIVATION_FACTOR + RUNTIME_OVERHEAD_GB + (batch_size - 1) * BATCH_ITEM_GB
+
+
+def estimate_session_audio_seconds(session_dir):
+    return sum(estimate_audio_seconds(path) for path in list_user_audio_files(session_dir))
+
+
+# =========================================================
+# Jobs / Devices
+# =========================================================
+
+class TranscriptionJob:
+
+    _ids = itertools.count()
+
+    def __init__(self, session_dir, audio_s, guild_id=None, profile=None, idle=False, repass=None):
+        self.id = next(self._ids)
+        self.session_dir = Path(session_dir)
+        self.session_id = self.session_dir.name
+        self.guild_id = guild_id
+        self.profile = profile or config.DECODING_PROFILE
+        self.idle = idle
+        # Queue an accurate re-pass once a fast draft finishes
+        self.repass = config.ACCURATE_REPASS if repass is None else repass
+        self.audio_s = audio_s
+        self.submitted_at = time.monotonic()
+        self.queue_span = start_span("queue_wait", self.session_id, profile=self.profile, idle=idle, audio_s=self.audio_s)
+
+        # Set on admission
+        self.pool = None
+        self.process = None
+
+
+class DevicePool:
+    """A memory budget and worker limit for one device."""
+
+    def __init__(self, name, device, model, compute_type, memory_gb, max_workers, batched=False, fallback=False):
+        self.name = name
+        self.device = device
+        self.model = model
+        self.compute_type = compute_type
+        self.memory_gb = memory_gb
+        self.max_workers = max_workers
+        # Takes overflow from the primary pool, possibly with a smaller model
+        self.fallback = fallback
+
+        # Batched workers take several sessions and share one model load
+        self.batched = batched
+        self.max_sessions = config.BATCH_MAX_SESSIONS if batched else 1
+
+        self.worker_cost_gb = estimate_model_memory_gb(
+            model, compute_type, config.BATCH_SIZE if batched else 1
+        )
+        self.running = []
+
+    def workers(self):
+        return {id(job.process): job.process for job in self.running}
+
+    def used_gb(self):
+        return len(self.workers()) * self.worker_cost_gb
+
+    def can_admit(self):
+        if len(self.workers()) >= self.max_workers:
+            return False
+        # A worker always fits an idle device, otherwise oversized models would starve
+        if not self.running:
+            return True
+        return self.used_gb() + self.worker_cost_gb <= self.memory_gb
+
+
+# =========================================================
+# Scheduler
+# =========================================================
+
+class TranscriptionScheduler:
+
+    def __init__(self, progress_queue=None):
+        self.progress_queue = progress_queue
+        self.pending = []
+        self.pools = []
+        self.task = None
+
+    def configure(self):
+        """Builds device pools from the runtime config resolved in __main__.py."""
+        self.pools = []
+
+        if config.DEVICE == "cuda":
+            self.pools.append(DevicePool(
+                "gpu",
+                "cuda",
+                config.WHISPER_MODEL,
+                config.COMPUTE_TYPE,
+                config.GPU_MEMORY_GB,
+                config.MAX_GPU_WORKERS,
+                batched=config.BATCHED_INFERENCE
+            ))
+
+        # CPU pool: primary on CPU hosts, fallback when the GPU is saturated
+        if config.DEVICE != "cuda" or config.CPU_FALLBACK_WORKERS > 0:
+            self.pools.append(DevicePool(
+                "cpu",
+                "cpu",
+                config.CPU_FALLBACK_MODEL or config.WHISPER_MODEL,
+                "int8",
+                config.CPU_MEMORY_GB,
+                config.CPU_FALLBACK_WORKERS if config.DEVICE == "cuda" else config.MAX_CPU_WORKERS,
+                fallback=config.DEVICE == "cuda"
+            ))
+
+    def start(self):
+        if not self.pools:
+            self.configure()
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    # -----------------------------------------------------
+
+    async def submit(self, session_dir, guild_id=None, profile=None, idle=False, repass=None):
+        # Reads every track's header, so it stays off the event loop
+        audio_s = await asyncio.to_thread(estimate_session_audio_seconds, session_dir)
+
+        job = TranscriptionJob(session_dir, audio_s, guild_id, profile, idle, repass)
+        self.pending.append(job)
+        print(f"Queued {job.profile} transcription for {job.session_id} ({job.audio_s:.0f}s of audio)")
+        self.pump()
+        return job
+
+    def busy_sessions(self):
+        """IDs of sessions queued or being transcribed."""
+        return {job.session_id for job in self.pending + self.running_jobs()}
+
+    def running_jobs(self):
+        return [job for pool in self.pools for job in pool.running]
+
+    def ordered_pending(self):
+        # Guilds with fewer jobs in flight go first, then shortest audio
+        active = {}
+        for job in self.running_jobs():
+            active[job.guild_id] = active.get(job.guild_id, 0) + 1
+
+        return sorted(
+            self.pending,
+            key=lambda job: (job.idle, active.get(job.guild_id, 0), job.audio_s, job.id)
+        )
+
+    def pump(self):
+        if not self.pools:
+            self.configure()
+
+        while self.pending:
+            ordered = self.ordered_pending()
+            head = ordered[0]
+
+            # Idle work waits until the host has nothing else to do
+            if head.idle and self.running_jobs():
+                break
+
+            # Accurate re-passes are only worth it with the primary model
+            pool = next((p for p in self.pools if p.can_admit() and not (head.idle and p.fallback)), None)
+            if pool is None:
+                break
+
+            # A worker runs a single decoding profile
+            jobs = [job for job in ordered if job.profile == head.profile and job.idle == head.idle]
+            self.admit(jobs[:pool.max_sessions], pool)
+
+        self.report_queue_positions()
+
+    def admit(self, jobs, pool):
+        profile = jobs[0].profile
+        args = (pool.model, pool.device, pool.compute_type, config.HF_CACHE_DIR, self.progress_queue, profile)
+
+        if pool.batched:
+            process = spawn_batch_processing([job.session_dir for job in jobs], *args)
+        else:
+            process = spawn_processing(jobs[0].session_dir, *args)
+
+        for job in jobs:
+            self.pending.remove(job)
+            JOB_QUEUE_WAIT.observe(time.monotonic() - job.submitted_at, profile=job.profile)
+            job.queue_span.end(pool=pool.name, batch=len(jobs))
+            job.pool = pool
+            job.process = process
+            pool.running.append(job)
+
+        print(
+            f"Started {profile} transcription for {', '.join(job.session_id for job in jobs)} on {pool.name} "
+            f"({pool.used_gb():.1f}/{pool.memory_gb:.1f} GB estimated)"
+        )
+
+    def reap(self):
+        """Collects finished workers. Returns the jobs whose draft should be re-done accurately."""
+        repasses = []
+        for pool in self.pools:
+            for job in list(pool.running):
+                if not job.process.is_alive():
+                    job.process.join()
+                    pool.running.remove(job)
+
+                    exitcode = job.process.exitcode
+                    JOB_LATENCY.observe(
+                        time.monotonic() - job.submitted_at,
+                        profile=job.profile,
+                        pool=pool.name,
+                        status="ok" if exitcode == 0 else "failed"
+                    )
+
+                    # Killed workers (OOM, CUDA crashes) never report their own failure
+                    if exitcode != 0 and self.progress_queue is not None:
+                        self.progress_queue.put({
+                            "session_id": job.session_id,
+                            "event": "failed",
+                            "error": f"worker exited with {exitcode}"
+                        })
+
+                    if exitcode == 0 and job.profile == "fast" and job.repass:
+                        repasses.append(job)
+        return repasses
+
+    def report_queue_positions(self):
+        JOBS_PENDING.set(len(self.pending))
+        if self.progress_queue is None:
+            return
+        for position, job in enumerate(self.ordered_pending()):
+            self.progress_queue.put({"session_id": job.session_id, "event": "queued", "position": position})
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+
+            had_running = len(self.running_jobs())
+            for job in self.reap():
+                await self.submit(job.session_dir, job.guild_id, "accurate", idle=True, repass=False)
+            if len(self.running_jobs()) != had_running:
+                self.pump()
@@ -0,0 +1,344 @@
+"""
+Meeting summaries with a map-reduce over transcript time windows.
+
+Transcript rows are streamed from the session DB and grouped into windows
+of SUMMARY_WINDOW_MINUTES. Every window is summarized on its own (map,
+in parallel), and the window summaries are combined in groups of
+SUMMARY_REDUCE_FANIN until one overview is left (reduce). The result is
+written to summary.md in the session folder.
+
+Each map and reduce step is cached by a hash of its input, so after
+transcript edits only the changed windows, and the reduce steps above
+them, are redone.
+
+Backends (SUMMARY_BACKEND):
+    extractive   Picks the most representative lines. No model, always available.
+    ctranslate2  A local seq2seq model (e.g. flan-t5 or bart converted with
+                 ct2-transformers-converter) on the CPU, from SUMMARY_MODEL.
+    off          Disables summaries.
+
+Usage:
+    python -m bot.processing.summarizer <session_dir> [...] [--backend NAME]
+
+The bot runs /summary refreshes in one worker process (SummaryRefresher),
+one at a time, so a model backend never loads next to the voice loop.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import multiprocessing
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import bot.utils.config as config
+from bot.processing.exporters import format_clock, session_origin_ms
+from bot.processing.transcript_db import get_connection, iter_transcripts
+from bot.utils.logger import setup_logging, span, stop_logging
+
+SUMMARY_FILE = "summary.md"
+CACHE_FILE = "summary_cache.json"
+
+# Bump when prompts or output formats change so cached steps are redone
+CACHE_VERSION = 1
+
+WORD_RE = re.compile(r"[^\W\d_]{3,}")
+STOPWORDS = frozenset("""
+the and for that this with you are was have but not what all were when your can said there use
+each which she how their will other about out many then them these some her would make like him
+into time has look two more write see number way could people than first been call who its now
+find long down day did get come made may part yeah okay yes just know think going really right
+well also gonna want one because they from there here been very much like actually sure
+""".split())
+
+
+# =========================================================
+# Backends
+# =========================================================
+
+class SummaryBackend:
+    """Summarizes one window of transcript lines, and combines summaries."""
+
+    name = "base"
+
+    def summarize_window(self, lines):
+        raise NotImplementedError
+
+    def combine(self, summaries):
+        raise NotImplementedError
+
+
+def content_words(line):
+    return [w for w in WORD_RE.findall(line.lower()) if w not in STOPWORDS]
+
+
+def top_lines(lines, count):
+    """The `count` lines carrying most of the text's frequent content words, in spoken order."""
+    tokenized = [content_words(line.split(": ", 1)[-1]) for line in lines]
+    frequency = Counter(word for words in tokenized for word in set(words))
+    scores = [
+        sum(frequency[word] for word in set(words)) / math.sqrt(len(words) + 1) if words else 0.0
+        for words in tokenized
+    ]
+
+    chosen, seen = [], set()
+    for i in sorted(range(len(lines)), key=lambda i: scores[i], reverse=True):
+        # Repeated phrasings add nothing to a summary
+        signature = frozenset(tokenized[i])
+        if not signature or signature in seen:
+            continue
+        seen.add(signature)
+        chosen.append(i)
+        if len(chosen) == count:
+            break
+
+    return [lines[i] for i in sorted(chosen)]
+
+
+class ExtractiveBackend(SummaryBackend):
+    """Frequency-based extractive summary, the stub backend."""
+
+    name = "extractive"
+
+    def summarize_window(self, lines):
+        return "\n".join(f"- {line}" for line in top_lines(lines, config.SUMMARY_WINDOW_LINES))
+
+    def combine(self, summaries):
+        lines = [line[2:] for summary in summaries for line in summary.splitlines() if line.startswith("- ")]
+        return "\n".join(f"- {line}" for line in top_lines(lines, config.SUMMARY_OVERVIEW_LINES))
+
+
+class CTranslate2Backend(SummaryBackend):
+    """A seq2seq model on CTranslate2, with its tokenizer.json, run on the CPU."""
+
+    def __init__(self, model_dir=None):
+        # Both ship with faster-whisper
+        import ctranslate2
+        import tokenizers
+
+        model_dir = Path(model_dir or config.SUMMARY_MODEL)
+        self.name = f"ctranslate2:{model_dir.name}"
+        self.translator = ctranslate2.Translator(
+            str(model_dir),
+            device="cpu",
+            inter_threads=config.SUMMARY_WORKERS,
+            intra_threads=config.SUMMARY_THREADS
+        )
+        self.tokenizer = tokenizers.Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+
+    def generate(self, prompt):
+        tokens = self.tokenizer.encode(prompt).tokens[:config.SUMMARY_MAX_INPUT_TOKENS]
+        result = self.translator.translate_batch(
+            [tokens],
+            beam_size=2,
+            max_decoding_length=config.SUMMARY_MAX_OUTPUT_TOKENS,
+            no_repeat_ngram_size=3
+        )
+        ids = [self.tokenizer.token_to_id(token) for token in result[0].hypotheses[0]]
+        return self.tokenizer.decode([i for i in ids if i is not None]).strip()
+
+    def summarize_window(self, lines):
+        return self.generate("Summarize this part of a meeting transcript:\n" + "\n".join(lines))
+
+    def combine(self, summaries):
+        return self.generate("Combine these meeting notes into one short summary:\n" + "\n\n".join(summaries))
+
+
+BACKENDS = {
+    "extractive": ExtractiveBackend,
+    "ctranslate2": CTranslate2Backend,
+}
+
+
+def load_backend(name=None):
+    name = name or config.SUMMARY_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown summary backend {name!r}, expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+# =========================================================
+# Windows / Cache
+# =========================================================
+
+def iter_windows(session_path, window_ms=None):
+    """Streams (window_start_ms, lines) from the session DB, one window at a time."""
+    window_ms = window_ms or int(config.SUMMARY_WINDOW_MINUTES * 60_000)
+    origin_ms = session_origin_ms(session_path)
+
+    current, lines = None, []
+    with get_connection(session_path / "transcriptions.db") as conn:
+        for start_ms, end_ms, user_id, username, text in iter_transcripts(conn, session_path.name):
+            window = (start_ms - origin_ms) // window_ms
+            if window != current and lines:
+                yield current * window_ms, lines
+                lines = []
+            current = window
+            lines.append(f"[{format_clock(start_ms - origin_ms)[:8]}] {username}: {text}")
+
+    if lines:
+        yield current * window_ms, lines
+
+
+def step_key(backend, kind, parts):
+    digest = hashlib.sha1(json.dumps([CACHE_VERSION, backend.name, kind, parts]).encode("utf8"))
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """Map and reduce results of one session, keyed by a hash of their input."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        self.used = set()
+
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf8"))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable summary cache {self.path}: {e}")
+
+    def get(self, key):
+        self.used.add(key)
+        return self.entries.get(key)
+
+    def put(self, key, value):
+        self.used.add(key)
+        self.entries[key] = value
+
+    def save(self):
+        # Only keep what this run used, so edited windows do not pile up
+        entries = {key: value for key, value in self.entries.items() if key in self.used}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf8")
+        tmp_path.replace(self.path)
+
+
+# =========================================================
+# Map-Reduce
+# =========================================================
+
+def reduce_summaries(backend, cache, summaries, pool):
+    """Combines summaries in groups of SUMMARY_REDUCE_FANIN until one is left."""
+    fanin = max(config.SUMMARY_REDUCE_FANIN, 2)
+
+    while len(summaries) > 1:
+        groups = [summaries[i:i + fanin] for i in range(0, len(summaries), fanin)]
+        keys = [step_key(backend, "reduce", group) for group in groups]
+
+        todo = [(key, group) for key, group in zip(keys, groups) if cache.get(key) is None]
+        for (key, _), result in zip(todo, pool.map(lambda item: backend.combine(item[1]), todo)):
+            cache.put(key, result)
+
+        summaries = [cache.get(key) for key in keys]
+
+    return summaries[0]
+
+
+def summarize_session(session_path, backend=None):
+    """Writes summary.md for a transcribed session. Returns its path, or None if there is nothing to summarize."""
+    session_path = Path(session_path)
+    backend = backend or load_backend()
+    cache = SummaryCache(session_path / CACHE_FILE)
+
+    with span("summarize", session_path.name, backend=backend.name) as summary_span, \
+            ThreadPoolExecutor(max_workers=config.SUMMARY_WORKERS) as pool:
+        windows = []
+        futures = {}
+
+        # Windows are submitted while the DB is still being read
+        for window_start_ms, lines in iter_windows(session_path):
+            key = step_key(backend, "window", lines)
+            windows.append((window_start_ms, key))
+            if cache.get(key) is None and key not in futures:
+                futures[key] = pool.submit(backend.summarize_window, lines)
+
+        for key, future in futures.items():
+            cache.put(key, future.result())
+
+        summary_span.fields.update(windows=len(windows), recomputed=len(futures))
+        if not windows:
+            return None
+
+        window_summaries = [cache.get(key) for _, key in windows]
+        overview = reduce_summaries(backend, cache, window_summaries, pool)
+
+    cache.save()
+
+    sections = ["# Meeting summary", "", overview, "", "## Timeline"]
+    for (window_start_ms, _), summary in zip(windows, window_summaries):
+        sections += ["", f"### {format_clock(window_start_ms)[:8]}", "", summary]
+
+    path = session_path / SUMMARY_FILE
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text("\n".join(sections) + "\n", encoding="utf8")
+    tmp_path.replace(path)
+
+    print(f"Summary written to {path} ({len(futures)} of {len(windows)} window(s) recomputed)")
+    return path
+
+
+# =========================================================
+# Bot Side
+# =========================================================
+
+# Loaded by the refresh worker's first job and kept for the later ones
+_backend = None
+
+
+def refresh_in_worker(session_path):
+    global _backend
+    setup_logging("summary")
+    try:
+        if _backend is None:
+            _backend = load_backend()
+        path = summarize_session(session_path, _backend)
+        return str(path) if path else None
+    finally:
+        # Pool workers exit without running atexit handlers
+        stop_logging()
+
+
+class SummaryRefresher:
+    """Summarizes sessions for /summary in a single worker process, one at a time."""
+
+    def __init__(self):
+        self.pool = None
+
+    async def refresh(self, session_path):
+        """Returns the summary path, or None if there is nothing to summarize."""
+        if self.pool is None:
+            # Spawned, so the worker shares no threads or locks with the bot
+            self.pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+        try:
+            path = await asyncio.wrap_future(self.pool.submit(refresh_in_worker, str(session_path)))
+        except BrokenProcessPool:
+            # The worker died (e.g. out of memory); the next refresh starts a new one
+            self.pool = None
+            raise
+        return Path(path) if path else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize session transcripts")
+    parser.add_argument("sessions", nargs="+", help="Session directories")
+    parser.add_argument("--backend", choices=list(BACKENDS), help="Summary backend (default: SUMMARY_BACKEND)")
+    args = parser.parse_args(argv)
+
+    backend = load_backend(args.backend)
+    for session in args.sessions:
+        try:
+            path = summarize_session(session, backend)
+            print(f"Summarized {session}: {path.name if path else 'empty transcript'}")
+        except Exception as e:
+            print(f"Failed to summarize {session}: {e}")
+
+
+if __name__ == "__main__":
+    main()
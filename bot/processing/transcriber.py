@@ -1,128 +1,249 @@
-import sqlite3
 import json
 import bot.utils.config as config
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
-from zoneinfo import ZoneInfo
 from faster_whisper import WhisperModel
 
-COLOMBO_TZ = ZoneInfo("Asia/Colombo")
+from bot.processing.transcript_db import datetime_to_ms, init_db
+from bot.processing.audio import open_track_audio
+from bot.processing.diarization import diarize_track
+from bot.processing.language import first_speech, resolve_track_language
+from bot.processing.profiles import DEFAULT_PROFILE, get_profile
+from bot.processing.progress import ProgressReporter
+from bot.utils.file_utils import estimate_audio_seconds, file_digest
+from bot.utils.language_store import is_shared_account
+from bot.utils.logger import span
 
-def get_connection(db_path):
-    return sqlite3.connect(db_path)
 
-def init_db(db_path):
-    with get_connection(db_path) as conn:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS transcripts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            username TEXT NOT NULL,
-            text TEXT NOT NULL
-        )
-        """)
-        conn.commit()
-
-def insert_transcript(db_path, timestamp, user_id, username, text):
-    with get_connection(db_path) as conn:
-        conn.execute(
-            """
-            INSERT INTO transcripts (timestamp, user_id, username, text)
-            VALUES (?, ?, ?, ?)
-            """,
-            (timestamp, str(user_id), username, text)
-        )
-        conn.commit()
-
-def run_transcription(session_dir, whisper_model=config.WHISPER_MODEL, device=config.DEVICE, compute_type=config.COMPUTE_TYPE, hf_cache_dir=config.HF_CACHE_DIR):
-    session_path = Path(session_dir) if not isinstance(session_dir, Path) else session_dir
-    db_path = session_path / "transcriptions.db"
-    metadata_path = session_path / "metadata.json"
-    
-    for _ in range(5):  # Retry mechanism for file access
-        if metadata_path.exists():
-            break
-        print(f"Waiting for metadata.json to be available at {metadata_path}...")
-        time.sleep(2)
-
-    # Initialize Database
-    init_db(db_path)
-
-    # Load Metadata
-    with open(metadata_path, "r", encoding="utf8") as f:
-        metadata = json.load(f)
-    
-    session_start = datetime.fromisoformat(metadata["session_start"])
+class SessionTrack:
+    """One user's audio file within a session."""
+
+    def __init__(self, user_id, name, join_offset_ms, audio_path, shared=False, original_file=None, audio_hash=None):
+        self.user_id = user_id
+        self.name = name
+        self.join_offset_ms = join_offset_ms
+        self.audio_path = audio_path
+        self.duration_s = estimate_audio_seconds(audio_path)
+        # Several people on one account, split into sub-speakers
+        self.shared = shared
+        # Set once retention archived the WAV: its name and content hash
+        # (the pipeline fills in the hash of tracks not yet archived)
+        self.original_file = original_file
+        self.audio_hash = audio_hash
+
+
+class TranscriptionSession:
+    """Loads a recorded session and owns its DB, tracks and progress reporter."""
+
+    def __init__(self, session_dir, progress_queue=None):
+        self.path = Path(session_dir) if not isinstance(session_dir, Path) else session_dir
+        self.id = self.path.name
+        self.db_path = self.path / "transcriptions.db"
+        self.reporter = ProgressReporter(progress_queue, self.id)
+
+        metadata_path = self.path / "metadata.json"
+
+        for _ in range(5):  # Retry mechanism for file access
+            if metadata_path.exists():
+                break
+            print(f"Waiting for metadata.json to be available at {metadata_path}...")
+            time.sleep(2)
+
+        # Initialize Database
+        init_db(self.db_path)
+
+        # Load Metadata
+        with open(metadata_path, "r", encoding="utf8") as f:
+            self.metadata = json.load(f)
+
+        self.start_ms = datetime_to_ms(datetime.fromisoformat(self.metadata["session_start"]))
+        self.guild_id = (self.metadata.get("guild") or {}).get("id")
+
+        # Resolve audio files up front so progress has a total to report against
+        self.tracks = []
+        # Names of listed users whose audio is gone, e.g. deleted by retention
+        self.missing_tracks = []
+        for user_id, user_info in self.metadata["users"].items():
+            name = user_info["name"]
+
+            # Look for the audio file (older sessions do not record its name)
+            audio_path = self.path / "users" / user_info.get("file", f"{user_id}.{name}.wav")
+
+            if not audio_path.exists():
+                print(f"Warning: Audio file not found for {name}: {audio_path}")
+                self.missing_tracks.append(name)
+                continue
+
+            # Sessions recorded before /shared existed fall back to the current flag
+            shared = user_info.get("shared")
+            if shared is None:
+                shared = is_shared_account(user_id)
+
+            self.tracks.append(SessionTrack(
+                user_id, name, user_info["join_offset_ms"], audio_path, shared,
+                user_info.get("original_file"), user_info.get("audio_hash")
+            ))
+
+        self.total_audio_s = sum(track.duration_s for track in self.tracks)
+
+    def track_start_ms(self, track):
+        # Absolute epoch-ms of the track's first sample
+        return self.start_ms + track.join_offset_ms
+
+    def diarize(self, track, audio, speech=None):
+        """Sub-speakers of a shared track, or None for a single-person track."""
+        if not track.shared:
+            return None
+
+        with span("diarize", self.id, speaker=track.name, user_id=track.user_id) as diarize_span:
+            recording_hash = track.audio_hash or file_digest(track.audio_path)
+            diarization = diarize_track(audio, recording_hash, self.path / "diarization" / f"{track.user_id}.npz", speech)
+            diarize_span.fields.update(speakers=diarization.speakers, windows=len(diarization.labels), cached=diarization.cached)
+
+        print(f"Diarized {track.name}: {diarization.speakers} speaker(s){' (cached embeddings)' if diarization.cached else ''}")
+        return diarization
+
+    def audio_before(self, track):
+        """Audio seconds of the tracks processed before `track`, for progress."""
+        return sum(t.duration_s for t in self.tracks[:self.tracks.index(track)])
+
+
+def segment_row(segment, track_start_ms, offset_s=0.0):
+    """
+    Converts a faster-whisper segment to (start_ms, end_ms, text, words).
+    `offset_s` is added to the segment's times before anchoring them to the track.
+    """
+    def to_ms(seconds):
+        return track_start_ms + int((seconds + offset_s) * 1000)
+
+    words = None
+    if segment.words:
+        words = [
+            (to_ms(w.start), to_ms(w.end), w.word, w.probability)
+            for w in segment.words
+        ]
 
+    return to_ms(segment.start), to_ms(segment.end), segment.text.strip(), words
+
+
+def load_model(whisper_model, device, compute_type, hf_cache_dir):
     # Load model with dynamic settings from config
     print(f"Loading Whisper model: {whisper_model} on {device}...")
-    model = WhisperModel(
+    return WhisperModel(
         whisper_model,
         device=device,
         compute_type=compute_type,
         download_root=hf_cache_dir
     )
 
-    # Process user audio files based on metadata
-    for user_id, user_info in metadata["users"].items():
-        name = user_info["name"]
-        join_offset_ms = user_info["join_offset_ms"]
-        
-        # Look for the wav file
-        audio_path = session_path / "users" / f"{user_id}.{name}.wav"
-        
-        if not audio_path.exists():
-            print(f"Warning: Audio file not found for {name}: {audio_path}")
-            continue
-
-        print(f"Transcribing {name}...")
-        segments, info = model.transcribe(str(audio_path), beam_size=5)
 
-        for segment in segments:
-            # Calculate absolute timestamp
-            absolute_time = (
-                session_start
-                + timedelta(milliseconds=join_offset_ms)
-                + timedelta(seconds=segment.start)
-            )
-            
-            # Ensure correct timezone and format
-            absolute_time = absolute_time.astimezone(COLOMBO_TZ)
-            timestamp_str = absolute_time.isoformat(timespec="milliseconds")
-
-            # Store in DB to save RAM
-            insert_transcript(
-                db_path,
-                timestamp_str,
-                user_id,
-                name,
-                segment.text.strip()
+class TrackTranscript:
+    """
+    One track's transcribed segments, streamed to a JSON-lines artifact so
+    they never pile up in RAM. A sidecar .json holds the cache key and the
+    language once the track is complete.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta_path = self.path.with_suffix(".json")
+        self.file = None
+        self.seq = 0
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # A half-written track is never marked complete, so it is redone
+        self.meta_path.unlink(missing_ok=True)
+        self.file = open(self.path, "w", encoding="utf8")
+        self.seq = 0
+        return self
+
+    def write(self, start_ms, end_ms, text, words=None, speaker=None):
+        row = {"seq": self.seq, "start_ms": start_ms, "end_ms": end_ms, "text": text, "words": words, "speaker": speaker}
+        self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.seq += 1
+
+    def close(self, **meta):
+        self.file.close()
+        self.file = None
+        tmp_path = self.meta_path.with_name(self.meta_path.name + ".tmp")
+        tmp_path.write_text(json.dumps({**meta, "segments": self.seq}), encoding="utf8")
+        tmp_path.replace(self.meta_path)
+
+    def meta(self):
+        """The sidecar of a completed track, or None."""
+        if not self.meta_path.exists() or not self.path.exists():
+            return None
+        try:
+            return json.loads(self.meta_path.read_text(encoding="utf8"))
+        except ValueError:
+            return None
+
+    def rows(self):
+        with open(self.path, "r", encoding="utf8") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def transcribe_track(model, session, track, out, profile=DEFAULT_PROFILE, speech=None, clips=None):
+    """
+    Transcribes one track into `out` (a TrackTranscript opened by the caller).
+    `speech` holds the VAD regions in samples; a track without any is not decoded.
+    `clips` (start, end, ... in seconds) limits decoding to the talk metered during capture.
+    Returns (language, language_source).
+    """
+    reporter = session.reporter
+    base_done_s = session.audio_before(track)
+
+    if speech is not None and not speech:
+        print(f"Skipping {track.name}: no speech")
+        reporter.speaker_progress(track.name, track.duration_s, track.duration_s, base_done_s, force=True)
+        return None, "silent"
+
+    # Memory-mapped and converted in chunks; segments are lazy, so keep it open
+    with span("transcribe", session.id, speaker=track.name, user_id=track.user_id, audio_s=track.duration_s, profile=profile) as speaker_span, \
+            open_track_audio(track.audio_path) as audio:
+        if speech:
+            # Detection (if any) reuses the chunks VAD already found, at most 30 s of them
+            language, source = resolve_track_language(
+                model, track.user_id, session.guild_id,
+                lambda: first_speech(audio, speech),
+                vad_filter=False
             )
+        else:
+            language, source = resolve_track_language(model, track.user_id, session.guild_id, audio)
+        diarization = session.diarize(track, audio, speech)
+
+        options = get_profile(profile)
+        if clips:
+            # Replaces the profile's own VAD pass, the clips already skip the silence
+            options["clip_timestamps"] = clips
+
+        print(f"Transcribing {track.name} ({profile}, language {language} from {source})...")
+        segments, info = model.transcribe(
+            audio,
+            language=language,
+            word_timestamps=config.WORD_TIMESTAMPS,
+            **options
+        )
+
+        track_start_ms = session.track_start_ms(track)
+        for segment in segments:
+            start_ms, end_ms, text, words = segment_row(segment, track_start_ms)
+            speaker = diarization.speaker_for(segment.start, segment.end) if diarization else None
+
+            reporter.speaker_progress(track.name, segment.end, info.duration, base_done_s)
+            out.write(start_ms, end_ms, text, words, speaker)
+
+        speaker_span.fields.update(language=language, language_source=source, segments=out.seq)
+
+    reporter.speaker_progress(track.name, info.duration, info.duration, base_done_s, force=True)
+    return language, source
+
+
+def run_transcription(session_dir, whisper_model=config.WHISPER_MODEL, device=config.DEVICE, compute_type=config.COMPUTE_TYPE, hf_cache_dir=config.HF_CACHE_DIR, progress_queue=None, profile=DEFAULT_PROFILE):
+    # The stage pipeline owns the flow, imported here because it builds on this module
+    from bot.processing.pipeline import run_session_pipeline
 
-    # Final Step: Re-order the table physically and Export
-    print("Finalizing database (sorting rows)...")
-    with get_connection(db_path) as conn:
-        # 1. Create a sorted temporary table
-        conn.execute("CREATE TABLE transcripts_new AS SELECT * FROM transcripts ORDER BY timestamp ASC")
-        
-        # 2. Replace old table with sorted one
-        conn.execute("DROP TABLE transcripts")
-        conn.execute("ALTER TABLE transcripts_new RENAME TO transcripts")
-        
-        # 3. Add an index for future fast lookups
-        conn.execute("CREATE INDEX idx_timestamp ON transcripts(timestamp)")
-        conn.commit()
-
-        # 4. Stream rows to file (low memory usage)
-        export_path = session_path / "transcript.txt"
-        cursor = conn.execute("SELECT timestamp, username, text FROM transcripts") # No ORDER BY needed now
-        
-        with open(export_path, "w", encoding="utf-8") as f:
-            for timestamp, username, text in cursor:
-                dt = datetime.fromisoformat(timestamp)
-                pretty_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"[{pretty_time}] {username}: {text}\n")
-            
-    print(f"Transcription finished. Full transcript saved to {export_path}")
+    run_session_pipeline(session_dir, whisper_model, device, compute_type, hf_cache_dir, progress_queue, profile)
@@ -0,0 +1,271 @@
+import sqlite3
+import heapq
+import json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+COLOMBO_TZ = ZoneInfo("Asia/Colombo")
+
+# Bump when the schema below changes and add a step to bot/processing/migrate.py
+#   v1  legacy: TEXT timestamps, no end times. Predates user_version, so it reads as 0
+#   v2  epoch-ms transcripts clustered on time, word timing
+#   v3  sub-speakers of shared accounts
+SCHEMA_VERSION = 3
+LEGACY_VERSION = 1
+
+
+# =========================================================
+# Connection / Schema
+# =========================================================
+
+def get_connection(db_path):
+    return sqlite3.connect(db_path)
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def create_schema(conn):
+    # Per-user staging area. Clustered on (user_id, seq) so each speaker's
+    # segments can be read back in time order without sorting.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS segments (
+        user_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        start_ms INTEGER NOT NULL,
+        end_ms INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        text TEXT NOT NULL,
+        words TEXT,
+        speaker TEXT,
+        PRIMARY KEY (user_id, seq)
+    ) WITHOUT ROWID
+    """)
+
+    # Final transcript, clustered on time so range queries and exports
+    # are a straight primary key scan with no lookups back into a heap.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS transcripts (
+        session_id TEXT NOT NULL,
+        start_ms INTEGER NOT NULL,
+        user_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        end_ms INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (session_id, start_ms, user_id, seq)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_transcripts_user
+    ON transcripts(session_id, user_id, start_ms, end_ms)
+    """)
+
+    # Word-level timing, only filled when the model produced it
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS words (
+        session_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        idx INTEGER NOT NULL,
+        start_ms INTEGER NOT NULL,
+        end_ms INTEGER NOT NULL,
+        word TEXT NOT NULL,
+        probability REAL,
+        PRIMARY KEY (session_id, user_id, seq, idx)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_words_time
+    ON words(session_id, start_ms)
+    """)
+
+    # Sub-speakers of shared accounts (bot/processing/diarization.py), keyed like `words`
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sub_speakers (
+        session_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        speaker TEXT NOT NULL,
+        PRIMARY KEY (session_id, user_id, seq)
+    ) WITHOUT ROWID
+    """)
+
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def init_db(db_path):
+    with get_connection(db_path) as conn:
+        version = get_schema_version(conn)
+
+        # Additive change, safe to apply on the fly
+        if version == 2:
+            from bot.processing.migrate import migrate_v2_to_v3
+            migrate_v2_to_v3(conn)
+            version = SCHEMA_VERSION
+
+        if version not in (0, SCHEMA_VERSION):
+            raise RuntimeError(
+                f"{db_path} uses transcript schema v{version}, expected v{SCHEMA_VERSION}. "
+                f"Run `python -m bot.processing.migrate` first."
+            )
+
+        if version == 0 and has_table(conn, "transcripts"):
+            raise RuntimeError(
+                f"{db_path} uses the legacy transcript schema. "
+                f"Run `python -m bot.processing.migrate` first."
+            )
+
+        create_schema(conn)
+        conn.commit()
+
+
+def has_table(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,)
+    ).fetchone()
+    return row is not None
+
+
+# =========================================================
+# Time Helpers
+# =========================================================
+
+def datetime_to_ms(dt):
+    return int(round(dt.timestamp() * 1000))
+
+
+def ms_to_datetime(ms, tz=COLOMBO_TZ):
+    return datetime.fromtimestamp(ms / 1000, tz=tz)
+
+
+# =========================================================
+# Staging
+# =========================================================
+
+def insert_segment(conn, user_id, seq, start_ms, end_ms, username, text, words=None, speaker=None):
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO segments (user_id, seq, start_ms, end_ms, username, text, words, speaker)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            str(user_id),
+            seq,
+            start_ms,
+            end_ms,
+            username,
+            text,
+            json.dumps(words) if words else None,
+            speaker
+        )
+    )
+
+
+def reset_staging(db_path):
+    # Drops rows left behind by an interrupted run
+    with get_connection(db_path) as conn:
+        conn.execute("DELETE FROM segments")
+        conn.commit()
+
+
+def iter_user_segments(conn, user_id):
+    cursor = conn.execute(
+        """
+        SELECT start_ms, user_id, seq, end_ms, username, text, words, speaker
+        FROM segments WHERE user_id = ? ORDER BY seq
+        """,
+        (str(user_id),)
+    )
+    yield from cursor
+
+
+# =========================================================
+# Finalization
+# =========================================================
+
+def merge_transcripts(db_path, session_id, out=None):
+    """
+    Streams a k-way merge of the per-user segment streams into the
+    clustered `transcripts` table, and the exporter `out` if given, in a single pass.
+
+    Each speaker's segments are already time ordered, so the merge only
+    keeps one pending row per speaker in memory: O(n log k).
+    """
+    with get_connection(db_path) as conn:
+        user_ids = [row[0] for row in conn.execute("SELECT DISTINCT user_id FROM segments")]
+
+        # Reading `segments` while inserting into `transcripts` on the same
+        # connection is safe: the cursors never touch the table being written
+        streams = [iter_user_segments(conn, uid) for uid in user_ids]
+
+        # Re-runs replace the previous merge result
+        conn.execute("DELETE FROM transcripts WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM words WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM sub_speakers WHERE session_id = ?", (session_id,))
+
+        for start_ms, user_id, seq, end_ms, username, text, words, speaker in heapq.merge(*streams, key=lambda row: row[0]):
+            # Shared accounts show their sub-speaker wherever the username is displayed
+            if speaker:
+                username = f"{username} ({speaker})"
+                conn.execute(
+                    "INSERT INTO sub_speakers (session_id, user_id, seq, speaker) VALUES (?, ?, ?, ?)",
+                    (session_id, user_id, seq, speaker)
+                )
+
+            conn.execute(
+                """
+                INSERT INTO transcripts (session_id, start_ms, user_id, seq, end_ms, username, text)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (session_id, start_ms, user_id, seq, end_ms, username, text)
+            )
+
+            if words:
+                conn.executemany(
+                    """
+                    INSERT INTO words (session_id, user_id, seq, idx, start_ms, end_ms, word, probability)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (session_id, user_id, seq, idx, w_start, w_end, word, prob)
+                        for idx, (w_start, w_end, word, prob) in enumerate(json.loads(words))
+                    ]
+                )
+
+            if out is not None:
+                out.write(start_ms, end_ms, user_id, username, text)
+
+        # Staging rows are no longer needed once merged
+        conn.execute("DELETE FROM segments")
+        conn.commit()
+
+
+# =========================================================
+# Queries
+# =========================================================
+
+def iter_transcripts(conn, session_id, start_ms=None, end_ms=None):
+    """
+    Yields (start_ms, end_ms, user_id, username, text) in time order.
+    Served entirely from the clustered primary key.
+    """
+    query = """
+        SELECT start_ms, end_ms, user_id, username, text
+        FROM transcripts
+        WHERE session_id = ?
+    """
+    params = [session_id]
+
+    if start_ms is not None:
+        query += " AND start_ms >= ?"
+        params.append(start_ms)
+    if end_ms is not None:
+        query += " AND start_ms < ?"
+        params.append(end_ms)
+
+    query += " ORDER BY start_ms, user_id, seq"
+
+    yield from conn.execute(query, params)
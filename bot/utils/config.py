@@ -6,6 +6,8 @@ load_dotenv()
 
 # Discord
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Seconds the bot waits in a voice channel with no humans before leaving
+AUTO_LEAVE_SECONDS = float(os.getenv("AUTO_LEAVE_SECONDS", "30"))
 
 # Speech/Audio
 START_RECORDING_SPEECH = "Recording started."
@@ -16,4 +18,150 @@ SPEECH_CACHE_DIR = "speech_cache"
 WHISPER_MODEL = "medium"
 DEVICE = "cuda"
 COMPUTE_TYPE = "float16"
-HF_CACHE_DIR = str(Path(__file__).parent.parent.parent / "hf_cache")
\ No newline at end of file
+HF_CACHE_DIR = str(Path(__file__).parent.parent.parent / "hf_cache")
+
+# Decoding profile (fast / balanced / accurate), see bot/processing/profiles.py
+DECODING_PROFILE = os.getenv("DECODING_PROFILE", "balanced")
+# Re-run fast drafts with the accurate profile when the host is idle
+ACCURATE_REPASS = os.getenv("ACCURATE_REPASS", "0") == "1"
+
+# Transcription scheduling (memory budgets are filled in from hardware detection)
+GPU_MEMORY_GB = 4
+CPU_MEMORY_GB = 8
+MAX_GPU_WORKERS = int(os.getenv("MAX_GPU_WORKERS", "4"))
+MAX_CPU_WORKERS = int(os.getenv("MAX_CPU_WORKERS", str(max((os.cpu_count() or 1) // 4, 1))))
+# Extra CPU workers used when the GPU is saturated (0 disables fallback)
+CPU_FALLBACK_WORKERS = int(os.getenv("CPU_FALLBACK_WORKERS", "1"))
+# Model for CPU fallback workers, defaults to WHISPER_MODEL
+CPU_FALLBACK_MODEL = os.getenv("CPU_FALLBACK_MODEL")
+
+# Batched GPU inference: pack VAD chunks from many speakers and sessions
+BATCHED_INFERENCE = os.getenv("BATCHED_INFERENCE", "1") == "1"
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "16"))
+# Seconds of speech collected before a pack is sent to the model
+BATCH_PACK_SECONDS = int(os.getenv("BATCH_PACK_SECONDS", "600"))
+# Queued sessions a single batched GPU worker may take at once
+BATCH_MAX_SESSIONS = int(os.getenv("BATCH_MAX_SESSIONS", "4"))
+
+# Speech detection (VAD) shared by transcription, batching and diarization
+VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "160"))
+VAD_SPEECH_PAD_MS = int(os.getenv("VAD_SPEECH_PAD_MS", "400"))
+
+# Speech-activity metering during capture (activity.json)
+# Frames louder than this count as talking
+ACTIVITY_THRESHOLD_DBFS = float(os.getenv("ACTIVITY_THRESHOLD_DBFS", "-45"))
+# Talk runs separated by shorter pauses are merged
+ACTIVITY_MERGE_MS = int(os.getenv("ACTIVITY_MERGE_MS", "300"))
+# Quieter audio is the silence padded between packets; anything louder is searched by VAD,
+# so speakers below ACTIVITY_THRESHOLD_DBFS are still transcribed
+ACTIVITY_FLOOR_DBFS = float(os.getenv("ACTIVITY_FLOOR_DBFS", "-70"))
+# Margin kept around metered talk when VAD and Whisper skip the silence in between
+ACTIVITY_PAD_MS = int(os.getenv("ACTIVITY_PAD_MS", "500"))
+# Whisper decodes speech regions closer than this as one clip, keeping context across short pauses
+ACTIVITY_CLIP_GAP_MS = int(os.getenv("ACTIVITY_CLIP_GAP_MS", "2000"))
+
+# Live captions (/record captions:#channel): a small CPU model on rolling utterance windows
+LIVE_CAPTION_MODEL = os.getenv("LIVE_CAPTION_MODEL", "tiny")
+LIVE_CAPTION_THREADS = int(os.getenv("LIVE_CAPTION_THREADS", "2"))
+# Seconds between re-decodes of the utterances in progress
+LIVE_CAPTION_STEP_S = float(os.getenv("LIVE_CAPTION_STEP_S", "0.5"))
+# Quiet seconds that end an utterance, and the longest one captioned as a whole
+LIVE_CAPTION_PAUSE_S = float(os.getenv("LIVE_CAPTION_PAUSE_S", "0.8"))
+LIVE_CAPTION_MAX_S = float(os.getenv("LIVE_CAPTION_MAX_S", "12"))
+# Minimum seconds between edits of the caption message (Discord allows 5 per 5 s)
+LIVE_CAPTION_EDIT_INTERVAL = float(os.getenv("LIVE_CAPTION_EDIT_INTERVAL", "1.1"))
+
+# Languages spoken in our meetings; detection picks the most likely of these
+MEETING_LANGUAGES = os.getenv("MEETING_LANGUAGES", "en,si,ta").split(",")
+# Minimum detection probability before a speaker's language is cached
+LANGUAGE_CONFIDENCE = float(os.getenv("LANGUAGE_CONFIDENCE", "0.6"))
+
+# Store per-word timing in the transcript DB (slower transcription)
+WORD_TIMESTAMPS = os.getenv("WORD_TIMESTAMPS", "0") == "1"
+
+# Tracks longer than this (s) are converted into a file-backed array instead of RAM
+AUDIO_SPILL_SECONDS = float(os.getenv("AUDIO_SPILL_SECONDS", "1800"))
+
+# Sessions
+SESSIONS_DIR = "sessions"
+
+# /transcript: gzip attachments larger than this many bytes
+TRANSCRIPT_GZIP_THRESHOLD = 1024 * 1024
+# /transcript: stop paginating after this many messages
+TRANSCRIPT_MAX_MESSAGES = 20
+
+# Record Discord's Opus packets into .opus files instead of decoded PCM WAVs
+RECORD_OPUS = os.getenv("RECORD_OPUS", "0") == "1"
+
+# Seconds between crash-safety checkpoints of WAV headers and metadata.json
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "10"))
+
+# Storage maintenance: archive codec for transcribed sessions ("flac" is lossless, "opus" is ~30x smaller)
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "flac")
+ARCHIVE_OPUS_BITRATE = int(os.getenv("ARCHIVE_OPUS_BITRATE", "32000"))
+# Delete audio (transcripts are kept) of transcribed sessions older than this many days, 0 keeps it forever
+RETENTION_AUDIO_DAYS = float(os.getenv("RETENTION_AUDIO_DAYS", "0"))
+# Delete the oldest transcribed sessions' audio while SESSIONS_DIR exceeds this many GB, 0 disables
+RETENTION_MAX_GB = float(os.getenv("RETENTION_MAX_GB", "0"))
+# Seconds between background maintenance passes
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "900"))
+
+# Event-loop lag (s) above which the stalled callback's stack is logged
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.25"))
+# Seconds between event-loop heartbeats
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+# Prometheus-style metrics on http://METRICS_HOST:METRICS_PORT/metrics (0 disables the endpoint)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+# Also dump the metrics to this file every METRICS_DUMP_INTERVAL seconds (empty disables)
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "15"))
+
+# Structured JSON-lines log with per-session stage spans (see bot/utils/logger.py)
+LOG_FILE = os.getenv("LOG_FILE", "logs/meeting-bot.jsonl")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Profiling (see bot/utils/profiler.py): profile each recording and transcription worker for this many seconds, 0 disables
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "0"))
+# Window used by /profile when no length is given, and the longest one allowed
+PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", "60"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))
+# Seconds between CPU stack samples, and stack depth kept by tracemalloc
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.01"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+
+# Diarization of shared accounts (see bot/processing/diarization.py)
+# Optional speaker embedding ONNX model, empty uses MFCC statistics
+DIARIZATION_MODEL = os.getenv("DIARIZATION_MODEL", "")
+# Sub-speakers merge while their embeddings are more similar than this (cosine)
+DIARIZATION_THRESHOLD = float(os.getenv("DIARIZATION_THRESHOLD", "0.3"))
+DIARIZATION_MAX_SPEAKERS = int(os.getenv("DIARIZATION_MAX_SPEAKERS", "6"))
+DIARIZATION_WINDOW_SECONDS = float(os.getenv("DIARIZATION_WINDOW_SECONDS", "1.5"))
+DIARIZATION_HOP_SECONDS = float(os.getenv("DIARIZATION_HOP_SECONDS", "0.75"))
+DIARIZATION_THREADS = int(os.getenv("DIARIZATION_THREADS", "2"))
+
+# Crosstalk between tracks (see bot/processing/dedupe.py): "drop" or "mark" echoed segments, "off" disables
+CROSSTALK_DEDUPE = os.getenv("CROSSTALK_DEDUPE", "drop")
+# Segments starting within this many ms of each other on different tracks are compared
+CROSSTALK_WINDOW_MS = int(os.getenv("CROSSTALK_WINDOW_MS", "3000"))
+# Share of the shorter text that must appear in the other one
+CROSSTALK_SIMILARITY = float(os.getenv("CROSSTALK_SIMILARITY", "0.8"))
+# Shorter segments are never treated as echoes
+CROSSTALK_MIN_CHARS = int(os.getenv("CROSSTALK_MIN_CHARS", "12"))
+
+# Meeting summaries (see bot/processing/summarizer.py): "extractive", "ctranslate2" or "off"
+SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "extractive")
+# CTranslate2 model directory (with tokenizer.json) for the ctranslate2 backend
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "")
+# Transcript minutes summarized together, and summaries combined per reduce step
+SUMMARY_WINDOW_MINUTES = float(os.getenv("SUMMARY_WINDOW_MINUTES", "5"))
+SUMMARY_REDUCE_FANIN = int(os.getenv("SUMMARY_REDUCE_FANIN", "8"))
+# Lines kept per window and in the overview by the extractive backend
+SUMMARY_WINDOW_LINES = int(os.getenv("SUMMARY_WINDOW_LINES", "3"))
+SUMMARY_OVERVIEW_LINES = int(os.getenv("SUMMARY_OVERVIEW_LINES", "8"))
+# Windows summarized in parallel, and CPU threads per model call
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+SUMMARY_THREADS = int(os.getenv("SUMMARY_THREADS", "2"))
+SUMMARY_MAX_INPUT_TOKENS = int(os.getenv("SUMMARY_MAX_INPUT_TOKENS", "1024"))
+SUMMARY_MAX_OUTPUT_TOKENS = int(os.getenv("SUMMARY_MAX_OUTPUT_TOKENS", "200"))
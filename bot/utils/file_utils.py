@@ -1,8 +1,11 @@
 from pathlib import Path
 from datetime import datetime
+import hashlib
 import re
 import json
 import os
+import struct
+import time
 from zoneinfo import ZoneInfo
 import edge_tts
 import asyncio
@@ -28,9 +31,34 @@ def create_session_folder(base="sessions"):
     return session_dir, users_dir
 
 
-def is_session_incomplete(session_dir):
+def is_session_incomplete(session_dir, stale_after=None):
+    """
+    A session is incomplete if it has no metadata, or its last checkpoint
+    still says "recording" and is older than `stale_after` seconds
+    (so the session currently being recorded is not flagged).
+    """
     meta = session_dir / "metadata.json"
-    return not meta.exists()
+    if not meta.exists():
+        return True
+
+    metadata = safe_load_json(meta, default=None)
+    if metadata is None:
+        return True
+
+    if metadata.get("status") != "recording":
+        return False
+
+    if stale_after is None:
+        return True
+    return time.time() - metadata.get("checkpoint_at", 0) > stale_after
+
+
+def session_start_from_folder(session_dir):
+    """Reverses create_session_folder's naming back to an ISO timestamp."""
+    date, _, clock = Path(session_dir).name.partition("T")
+    clock, _, tz = clock.partition("_")
+    hours, minutes, seconds = clock.split("-", 2)
+    return f"{date}T{hours}:{minutes}:{seconds}+{tz.replace('-', ':')}"
 
 
 # =========================================================
@@ -41,9 +69,9 @@ def sanitize_filename(name: str):
     return re.sub(r'[<>:"/\\|?*]', "_", name)
 
 
-def create_user_wav_path(users_dir, user):
+def create_user_audio_path(users_dir, user, extension="wav"):
     safe_name = sanitize_filename(user.name)
-    return users_dir / f"{user.id}.{safe_name}.wav"
+    return users_dir / f"{user.id}.{safe_name}.{extension}"
 
 
 # =========================================================
@@ -82,6 +110,51 @@ def save_metadata_checkpoint(session_dir, metadata):
 # WAV Helpers
 # =========================================================
 
+# Recorder writes 48 kHz, 16-bit stereo PCM
+WAV_BYTES_PER_SECOND = 48000 * 2 * 2
+WAV_HEADER_BYTES = 44
+
+
+def build_wav_header(data_bytes, channels=2, sampwidth=2, framerate=48000):
+    byte_rate = framerate * channels * sampwidth
+    return (
+        b"RIFF" + struct.pack("<I", 36 + data_bytes) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, framerate, byte_rate, channels * sampwidth, sampwidth * 8)
+        + b"data" + struct.pack("<I", data_bytes)
+    )
+
+
+def patch_wav_sizes(f, data_bytes):
+    """Rewrites the RIFF and data chunk sizes of an open 44-byte-header WAV."""
+    position = f.tell()
+    f.seek(4)
+    f.write(struct.pack("<I", 36 + data_bytes))
+    f.seek(40)
+    f.write(struct.pack("<I", data_bytes))
+    f.seek(position)
+
+
+def repair_wav_header(filepath, block_align=4):
+    """
+    Fixes the sizes of a WAV whose writer died before closing it.
+    Trailing bytes of a partial frame are dropped. Returns the data size.
+    """
+    size = Path(filepath).stat().st_size
+    data_bytes = max(size - WAV_HEADER_BYTES, 0)
+    data_bytes -= data_bytes % block_align
+
+    with open(filepath, "r+b") as f:
+        if size < WAV_HEADER_BYTES:
+            f.truncate(0)
+            f.write(build_wav_header(0))
+            return 0
+
+        f.truncate(WAV_HEADER_BYTES + data_bytes)
+        patch_wav_sizes(f, data_bytes)
+
+    return data_bytes
+
+
 def safe_close_wav(wav_file):
     try:
         wav_file.close()
@@ -89,6 +162,61 @@ def safe_close_wav(wav_file):
         pass
 
 
+def estimate_wav_seconds(audio_path):
+    # Uses the file size, so it also works on files with unfinished headers
+    return max(Path(audio_path).stat().st_size - WAV_HEADER_BYTES, 0) / WAV_BYTES_PER_SECOND
+
+
+# =========================================================
+# Ogg/Opus Helpers
+# =========================================================
+
+# Largest possible Ogg page, enough to find the last one from the end of the file
+OGG_MAX_PAGE_BYTES = 65307
+
+
+def estimate_ogg_seconds(audio_path):
+    """Duration from the granule position of the last complete page (48 kHz)."""
+    with open(audio_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(size - OGG_MAX_PAGE_BYTES, 0))
+        tail = f.read()
+
+    index = tail.rfind(b"OggS")
+    while index != -1:
+        if index + 14 <= len(tail):
+            granule = struct.unpack_from("<q", tail, index + 6)[0]
+            if granule > 0:
+                return granule / 48000
+        index = tail.rfind(b"OggS", 0, index)
+    return 0.0
+
+
+def estimate_flac_seconds(audio_path):
+    """Duration from the STREAMINFO block that starts every FLAC file."""
+    with open(audio_path, "rb") as f:
+        header = f.read(26)
+
+    if len(header) < 26 or header[:4] != b"fLaC":
+        return 0.0
+
+    # Sample rate (20 bits) ... total samples (36 bits), packed from byte 18
+    packed = int.from_bytes(header[18:26], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & 0xFFFFFFFFF
+    return total_samples / sample_rate if sample_rate else 0.0
+
+
+def estimate_audio_seconds(audio_path):
+    suffix = Path(audio_path).suffix
+    if suffix == ".opus":
+        return estimate_ogg_seconds(audio_path)
+    if suffix == ".flac":
+        return estimate_flac_seconds(audio_path)
+    return estimate_wav_seconds(audio_path)
+
+
 # =========================================================
 # Directory Helpers
 # =========================================================
@@ -97,6 +225,10 @@ def ensure_dir(path):
     Path(path).mkdir(parents=True, exist_ok=True)
 
 
+def dir_size_bytes(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
 # =========================================================
 # File Validation
 # =========================================================
@@ -105,9 +237,22 @@ def file_is_valid(filepath, min_size=100):
     return filepath.exists() and filepath.stat().st_size > min_size
 
 
+def file_digest(filepath):
+    """Content hash of a file, read in 1 MB blocks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Track formats: recorded PCM WAV or Opus passthrough, and archived FLAC
+AUDIO_EXTENSIONS = (".wav", ".opus", ".flac")
+
+
 def list_user_audio_files(session_dir):
-    users_dir = session_dir / "users"
-    return list(users_dir.glob("*.wav"))
+    users_dir = Path(session_dir) / "users"
+    return sorted(p for p in users_dir.glob("*.*") if p.suffix in AUDIO_EXTENSIONS)
 
 
 # =========================================================
@@ -0,0 +1,143 @@
+import sqlite3
+import time
+from pathlib import Path
+
+import bot.utils.config as config
+
+
+# =========================================================
+# Connection / Schema
+# =========================================================
+
+def get_store_connection(sessions_dir=None):
+    store_path = Path(sessions_dir or config.SESSIONS_DIR) / "languages.db"
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Shared by the bot and every transcription worker
+    conn = sqlite3.connect(store_path, timeout=10)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_languages (
+        user_id TEXT PRIMARY KEY,
+        language TEXT NOT NULL,
+        probability REAL,
+        pinned INTEGER NOT NULL DEFAULT 0,
+        updated_at INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS guild_languages (
+        guild_id TEXT PRIMARY KEY,
+        language TEXT NOT NULL
+    ) WITHOUT ROWID
+    """)
+    # Accounts used by several people at once, their tracks are diarized
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS shared_accounts (
+        user_id TEXT PRIMARY KEY,
+        updated_at INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+    return conn
+
+
+# =========================================================
+# Lookups
+# =========================================================
+
+def resolve_language(user_id, guild_id=None):
+    """
+    Returns (language, source) for a speaker, or (None, None) if it must be detected.
+    A guild override wins over a user's pinned or previously detected language.
+    """
+    with get_store_connection() as conn:
+        if guild_id is not None:
+            row = conn.execute(
+                "SELECT language FROM guild_languages WHERE guild_id = ?",
+                (str(guild_id),)
+            ).fetchone()
+            if row:
+                return row[0], "guild"
+
+        row = conn.execute(
+            "SELECT language, pinned FROM user_languages WHERE user_id = ?",
+            (str(user_id),)
+        ).fetchone()
+        if row:
+            return row[0], "pinned" if row[1] else "cached"
+
+    return None, None
+
+
+def is_shared_account(user_id):
+    with get_store_connection() as conn:
+        row = conn.execute("SELECT 1 FROM shared_accounts WHERE user_id = ?", (str(user_id),)).fetchone()
+        return row is not None
+
+
+def list_shared_accounts():
+    with get_store_connection() as conn:
+        return {row[0] for row in conn.execute("SELECT user_id FROM shared_accounts")}
+
+
+# =========================================================
+# Updates
+# =========================================================
+
+def remember_user_language(user_id, language, probability):
+    """Caches a detected language without overriding a pinned one."""
+    with get_store_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO user_languages (user_id, language, probability, pinned, updated_at)
+            VALUES (?, ?, ?, 0, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                language = excluded.language,
+                probability = excluded.probability,
+                updated_at = excluded.updated_at
+            WHERE pinned = 0
+            """,
+            (str(user_id), language, probability, int(time.time()))
+        )
+        conn.commit()
+
+
+def pin_user_language(user_id, language):
+    """Pins a user's language; None clears it so it is detected again."""
+    with get_store_connection() as conn:
+        if language is None:
+            conn.execute("DELETE FROM user_languages WHERE user_id = ?", (str(user_id),))
+        else:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO user_languages (user_id, language, probability, pinned, updated_at)
+                VALUES (?, ?, NULL, 1, ?)
+                """,
+                (str(user_id), language, int(time.time()))
+            )
+        conn.commit()
+
+
+def set_guild_language(guild_id, language):
+    """Forces every speaker in a guild to `language`; None removes the override."""
+    with get_store_connection() as conn:
+        if language is None:
+            conn.execute("DELETE FROM guild_languages WHERE guild_id = ?", (str(guild_id),))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO guild_languages (guild_id, language) VALUES (?, ?)",
+                (str(guild_id), language)
+            )
+        conn.commit()
+
+
+def set_shared_account(user_id, shared):
+    """Flags an account as used by several people, so its tracks are diarized."""
+    with get_store_connection() as conn:
+        if shared:
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_accounts (user_id, updated_at) VALUES (?, ?)",
+                (str(user_id), int(time.time()))
+            )
+        else:
+            conn.execute("DELETE FROM shared_accounts WHERE user_id = ?", (str(user_id),))
+        conn.commit()
@@ -0,0 +1,165 @@
+"""
+Structured JSON-lines logging with per-session spans.
+
+Records go onto an in-memory queue and a listener thread writes them to
+LOG_FILE, so logging never waits on the disk. Each process (the bot and
+every transcription worker) calls setup_logging() once and appends to
+the same file. Lines are tagged with the pid.
+
+A span is one timed stage of a session (join, record_start, capture,
+stop, queue_wait, pipeline, model_load, vad, diarize, transcribe, export,
+summarize). It is written once, when it ends, with its session_id and duration_ms:
+
+    with span("pipeline", session_id, step="merge"):
+        ...
+
+    capture = start_span("capture", session_id)
+    ...
+    capture.end(users=3)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import bot.utils.config as config
+
+LOGGER_NAME = "meeting_bot"
+
+logger = logging.getLogger(LOGGER_NAME)
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+
+_listener = None
+_listener_pid = None
+
+
+# =========================================================
+# Setup
+# =========================================================
+
+class JsonLinesFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "pid": record.process,
+            "process": getattr(record, "process_role", None),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RoleFilter(logging.Filter):
+
+    def __init__(self, role):
+        super().__init__()
+        self.role = role
+
+    def filter(self, record):
+        record.process_role = self.role
+        return True
+
+
+def setup_logging(role="bot", path=None):
+    """Starts the queue listener for this process. Safe to call again after a fork."""
+    global _listener, _listener_pid
+
+    # A forked worker inherits the handler but not the listener thread
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    path = Path(path or config.LOG_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    file_handler = logging.FileHandler(path, encoding="utf8")
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RoleFilter(role))
+
+    logger.handlers = [queue_handler]
+    logger.setLevel(config.LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _listener_pid = os.getpid()
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flushes queued records. Called at exit."""
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener = None
+
+
+# =========================================================
+# Events
+# =========================================================
+
+def log_event(event, session_id=None, level=logging.INFO, **fields):
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(level, event, extra={"fields": {"event": event, "session_id": session_id, **fields}})
+
+
+class Span:
+    """A timed stage of a session, logged when it ends."""
+
+    def __init__(self, stage, session_id=None, **fields):
+        self.stage = stage
+        self.session_id = session_id
+        self.fields = fields
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.ended = False
+
+    def end(self, status="ok", **fields):
+        if self.ended:
+            return
+        self.ended = True
+
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        log_event(
+            "span",
+            self.session_id,
+            stage=self.stage,
+            status=status,
+            start=datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="milliseconds"),
+            duration_ms=round(duration_ms, 3),
+            **{**self.fields, **fields}
+        )
+
+
+def start_span(stage, session_id=None, **fields):
+    return Span(stage, session_id, **fields)
+
+
+@contextmanager
+def span(stage, session_id=None, **fields):
+    current = Span(stage, session_id, **fields)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(status="error", error=repr(e))
+        raise
+    current.end()
+
+
+def record_span(stage, session_id, duration_s, **fields):
+    """Logs a span measured elsewhere (e.g. one model load shared by a batch)."""
+    current = Span(stage, session_id, **fields)
+    current.started_at -= duration_s
+    current.started -= duration_s
+    current.end()
@@ -0,0 +1,88 @@
+"""
+Event-loop lag monitor.
+
+A heartbeat task measures how late its own wake-ups are. A watchdog
+thread also notices a heartbeat that stops arriving, and prints the
+event loop thread's stack while it is still blocked. That points at
+the callback responsible, not just the fact that the loop stalled.
+Both are also logged as loop_lag events, next to the spans they delayed.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+import bot.utils.config as config
+from bot.utils.logger import log_event
+from bot.utils.metrics import LOOP_LAG, LOOP_LAG_HISTOGRAM
+
+
+class LoopLagMonitor:
+
+    def __init__(self, threshold=None, interval=None):
+        self.threshold = threshold or config.LOOP_LAG_THRESHOLD
+        self.interval = interval or config.LOOP_LAG_INTERVAL
+
+        self.last_beat = time.monotonic()
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+
+        self.loop_thread_id = None
+        self.task = None
+        self.watchdog = None
+
+    def start(self):
+        if self.task is not None:
+            return
+
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.task = asyncio.create_task(self.run())
+
+        self.watchdog = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+        self.watchdog.start()
+
+    async def run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+
+            now = time.monotonic()
+            self.last_lag = max(now - expected, 0.0)
+            self.max_lag = max(self.max_lag, self.last_lag)
+            self.last_beat = now
+
+            LOOP_LAG.set(self.last_lag)
+            LOOP_LAG_HISTOGRAM.observe(self.last_lag)
+
+            if self.last_lag > self.threshold:
+                self.stalls += 1
+                print(f"Event loop lag: {self.last_lag * 1000:.0f} ms (threshold {self.threshold * 1000:.0f} ms)")
+                log_event(
+                    "loop_lag", level=logging.WARNING,
+                    lag_ms=round(self.last_lag * 1000), threshold_ms=round(self.threshold * 1000)
+                )
+
+    def watch(self):
+        reported_beat = None
+
+        while True:
+            time.sleep(self.interval)
+
+            beat = self.last_beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for <= self.threshold or beat == reported_beat:
+                continue
+
+            # One stack per stall is enough to find the culprit
+            reported_beat = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+
+            stack = "".join(traceback.format_stack(frame))
+            print(f"Event loop blocked for {blocked_for * 1000:.0f} ms, currently at:\n{stack}")
+            log_event("loop_lag", level=logging.WARNING, blocked_ms=round(blocked_for * 1000), stack=stack)
@@ -0,0 +1,263 @@
+"""
+In-process metrics in the Prometheus text format.
+
+The bot serves them on a local HTTP endpoint (METRICS_PORT) and can dump
+them to a file (METRICS_FILE). Transcription workers run in other
+processes, so they send their measurements as "metric" events over the
+progress queue and ProgressMonitor records them here.
+"""
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import bot.utils.config as config
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+# =========================================================
+# Metric Types
+# =========================================================
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def remove(self, **labels):
+        with self.lock:
+            self.values.pop(self.key(labels), None)
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [(self.name, key, (), value) for key, value in items]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{format_labels(self.labelnames, key, extra)} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(key) or ([0] * len(self.buckets), 0.0)
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        with self.lock:
+            items = [(key, (list(counts), total)) for key, (counts, total) in self.values.items()]
+
+        samples = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key, (("le", format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", key, (), total))
+            samples.append((f"{self.name}_count", key, (), cumulative))
+        return samples
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def get(self, name):
+        return self.metrics.get(name)
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# =========================================================
+# Metrics
+# =========================================================
+
+# ----- Capture (bot process) -----
+VOICE_PACKETS = REGISTRY.counter(
+    "meeting_voice_packets_total", "Voice packets written per user", ("user_id", "user"))
+VOICE_PACKET_RATE = REGISTRY.gauge(
+    "meeting_voice_packets_per_second", "Voice packets written per second, per user", ("user_id", "user"))
+WRITER_QUEUE_DEPTH = REGISTRY.gauge(
+    "meeting_writer_queue_depth", "Frames waiting in a user's writer queue", ("user_id", "user"))
+BYTES_WRITTEN = REGISTRY.counter(
+    "meeting_audio_bytes_written_total", "Audio bytes written to disk per user", ("user_id", "user"))
+CAPTION_LATENCY = REGISTRY.histogram(
+    "meeting_caption_latency_seconds", "Time from the newest captioned audio to its Discord update",
+    buckets=(0.5, 1, 1.5, 2, 2.5, 3, 4, 5, 10))
+LOOP_LAG = REGISTRY.gauge(
+    "meeting_event_loop_lag_seconds", "Most recent event-loop heartbeat lag")
+LOOP_LAG_HISTOGRAM = REGISTRY.histogram(
+    "meeting_event_loop_lag_histogram_seconds", "Event-loop heartbeat lag",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+# ----- Scheduling (bot process) -----
+JOBS_PENDING = REGISTRY.gauge(
+    "meeting_jobs_pending", "Transcription jobs waiting for a worker")
+JOB_QUEUE_WAIT = REGISTRY.histogram(
+    "meeting_job_queue_wait_seconds", "Time from submission to a worker starting", ("profile",))
+JOB_LATENCY = REGISTRY.histogram(
+    "meeting_job_latency_seconds", "Time from submission to the worker exiting", ("profile", "pool", "status"))
+
+# ----- Transcription (reported by workers) -----
+MODEL_LOAD = REGISTRY.histogram(
+    "meeting_model_load_seconds", "Whisper model load time")
+TRANSCRIPTION_RTF = REGISTRY.histogram(
+    "meeting_transcription_rtf", "Processing seconds per second of audio", ("profile",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+DB_COMMIT = REGISTRY.histogram(
+    "meeting_db_commit_seconds", "Transcript DB commit time", ("stage",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+
+def record_remote(event):
+    """Applies a "metric" event sent by a worker's ProgressReporter."""
+    metric = REGISTRY.get(event.get("name"))
+    labels = event.get("labels") or {}
+
+    if isinstance(metric, Histogram):
+        metric.observe(event["value"], **labels)
+    elif isinstance(metric, Counter):
+        metric.inc(event["value"], **labels)
+    elif isinstance(metric, Gauge):
+        metric.set(event["value"], **labels)
+
+
+# =========================================================
+# Exposition
+# =========================================================
+
+def dump_metrics(path=None):
+    path = Path(path or config.METRICS_FILE)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(REGISTRY.render(), encoding="utf8")
+    tmp_path.replace(path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        body = REGISTRY.render().encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood stdout
+        pass
+
+
+class MetricsExporter:
+    """Serves /metrics and dumps to METRICS_FILE from daemon threads, never the event loop."""
+
+    def __init__(self, port=None, host=None, dump_path=None, dump_interval=None):
+        self.port = config.METRICS_PORT if port is None else port
+        self.host = host or config.METRICS_HOST
+        self.dump_path = dump_path or config.METRICS_FILE
+        self.dump_interval = dump_interval or config.METRICS_DUMP_INTERVAL
+        self.server = None
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+
+        if self.port:
+            self.server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"Metrics at http://{self.host}:{self.server.server_port}/metrics")
+
+        if self.dump_path:
+            threading.Thread(target=self.dump_worker, name="metrics-dump", daemon=True).start()
+
+    def dump_worker(self):
+        while True:
+            time.sleep(self.dump_interval)
+            try:
+                dump_metrics(self.dump_path)
+            except Exception as e:
+                print(f"Failed to dump metrics to {self.dump_path}: {e}")
@@ -0,0 +1,194 @@
+"""
+Bounded, in-process profiling for the bot and transcription workers.
+
+A sampling thread records every thread's stack at a fixed interval and
+writes them as folded stacks (flamegraph.pl / speedscope input). While it
+runs, tracemalloc traces allocations; a snapshot and a top-N summary are
+written when the window ends. Both go into the session's profiles/ folder.
+
+Workers install a SIGUSR1 handler, so /profile can reach jobs that are
+already running.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import bot.utils.config as config
+from bot.utils.logger import log_event
+
+# Allocations shown in the text summary
+TOP_ALLOCATIONS = 50
+
+_active = None
+_active_lock = threading.Lock()
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def folded_stack(thread_name, frame):
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+
+    def __init__(self, out_dir, role, seconds, session_id=None, memory=True):
+        self.out_dir = Path(out_dir)
+        self.role = role
+        self.seconds = min(seconds, config.PROFILE_MAX_SECONDS)
+        self.session_id = session_id
+        self.memory = memory
+
+        self.samples = Counter()
+        self.sample_count = 0
+        self.stopped = threading.Event()
+        self.owns_tracemalloc = False
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(config.PROFILE_TRACEMALLOC_FRAMES)
+            self.owns_tracemalloc = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            self.samples[folded_stack(names.get(thread_id, str(thread_id)), frame)] += 1
+        self.sample_count += 1
+
+    def run(self):
+        started = time.monotonic()
+        deadline = started + self.seconds
+
+        while time.monotonic() < deadline and not self.stopped.is_set():
+            self.sample()
+            time.sleep(config.PROFILE_SAMPLE_INTERVAL)
+
+        try:
+            paths = self.write(time.monotonic() - started)
+            log_event("profile_written", self.session_id, role=self.role, pid=os.getpid(), paths=[str(p) for p in paths])
+            print(f"Profile written: {', '.join(str(p) for p in paths)}")
+        except Exception as e:
+            print(f"Failed to write profile: {e}")
+        finally:
+            if self.owns_tracemalloc:
+                tracemalloc.stop()
+            release(self)
+
+    def write(self, elapsed_s):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.role}-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}"
+        paths = []
+
+        cpu_path = self.out_dir / f"{stem}.folded"
+        with open(cpu_path, "w", encoding="utf8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        paths.append(cpu_path)
+
+        if self.memory and tracemalloc.is_tracing():
+            # Leave out the profiler's own sample table
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            snapshot_path = self.out_dir / f"{stem}.tracemalloc"
+            snapshot.dump(str(snapshot_path))
+            paths.append(snapshot_path)
+
+            current, peak = tracemalloc.get_traced_memory()
+            summary_path = self.out_dir / f"{stem}.memory.txt"
+            with open(summary_path, "w", encoding="utf8") as f:
+                f.write(f"{self.role} pid {os.getpid()}, {elapsed_s:.1f}s window, {self.sample_count} CPU samples\n")
+                f.write(f"Traced memory: current {current / 1024**2:.1f} MB, peak {peak / 1024**2:.1f} MB\n\n")
+                for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                    f.write(f"{stat}\n")
+            paths.append(summary_path)
+
+        return paths
+
+
+# =========================================================
+# Entry Points
+# =========================================================
+
+def release(profiler):
+    global _active
+    with _active_lock:
+        if _active is profiler:
+            _active = None
+
+
+def start_profiling(out_dir, role, seconds, session_id=None):
+    """Starts a profile window unless one is already running in this process."""
+    global _active
+    with _active_lock:
+        if _active is not None:
+            return None
+        _active = SamplingProfiler(out_dir, role, seconds, session_id)
+
+    _active.start()
+    print(f"Profiling {role} (pid {os.getpid()}) for {_active.seconds:g}s into {out_dir}")
+    return _active
+
+
+def stop_profiling(timeout=30):
+    """Ends the running window early and waits for its files (workers call this before exiting)."""
+    profiler = _active
+    if profiler is None:
+        return
+    profiler.stop()
+    profiler.thread.join(timeout)
+
+
+def profile_dir(session_dir=None):
+    """A session's profiles/ folder, or a shared one when nothing is recording."""
+    if session_dir is not None:
+        return Path(session_dir) / "profiles"
+    return Path(config.SESSIONS_DIR) / "profiles"
+
+
+def install_worker_profiling(session_dir):
+    """Lets the bot start a profile of this worker with SIGUSR1."""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    session_dir = Path(session_dir)
+
+    def handle(signum, frame):
+        start_profiling(profile_dir(session_dir), "worker", config.PROFILE_SECONDS or config.PROFILE_DEFAULT_SECONDS, session_dir.name)
+
+    signal.signal(signal.SIGUSR1, handle)
+
+
+def signal_workers(pids):
+    """Asks running transcription workers to profile themselves. Returns the PIDs reached."""
+    reached = []
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGUSR1)
+            reached.append(pid)
+        except (OSError, AttributeError):
+            pass
+    return reached
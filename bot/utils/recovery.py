@@ -0,0 +1,102 @@
+"""
+Rebuilds sessions left behind by a crash mid-recording.
+
+Usage:
+    python -m bot.utils.recovery [sessions_dir] [--transcribe]
+"""
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import bot.utils.config as config
+from bot.utils.file_utils import (
+    estimate_audio_seconds,
+    is_session_incomplete,
+    list_user_audio_files,
+    repair_wav_header,
+    safe_load_json,
+    save_metadata_checkpoint,
+    session_start_from_folder
+)
+from bot.utils.session_index import upsert_session
+
+
+def find_incomplete_sessions(sessions_dir):
+    # Anything checkpointed recently may still be recording
+    stale_after = config.CHECKPOINT_INTERVAL * 3
+
+    for session_dir in sorted(Path(sessions_dir).iterdir()):
+        if session_dir.is_dir() and (session_dir / "users").exists():
+            if is_session_incomplete(session_dir, stale_after):
+                yield session_dir
+
+
+def guess_join_offset_ms(audio_path, session_start):
+    """
+    The file was last written around the crash, and a track runs from the
+    user's join until then, so the join is roughly mtime - duration.
+    """
+    last_write = datetime.fromtimestamp(audio_path.stat().st_mtime, tz=session_start.tzinfo)
+    joined = last_write - timedelta(seconds=estimate_audio_seconds(audio_path))
+    return max(int((joined - session_start).total_seconds() * 1000), 0)
+
+
+def recover_session(session_dir):
+    session_dir = Path(session_dir)
+    users_dir = session_dir / "users"
+
+    metadata = safe_load_json(session_dir / "metadata.json", default=None) or {
+        "session_start": session_start_from_folder(session_dir),
+        "channel": {},
+        "users": {}
+    }
+    session_start = datetime.fromisoformat(metadata["session_start"])
+
+    known_files = {info.get("file") for info in metadata["users"].values()}
+
+    for audio_path in list_user_audio_files(session_dir):
+        # Ogg pages are self-delimiting, decoders skip a torn last page
+        if audio_path.suffix == ".wav":
+            repair_wav_header(audio_path)
+        size_mb = audio_path.stat().st_size / (1024 * 1024)
+        print(f"  {audio_path.name}: {size_mb:.1f} MB of audio")
+
+        if audio_path.name in known_files:
+            continue
+
+        # Joined after the last checkpoint (or no checkpoint at all)
+        user_id, _, rest = audio_path.name.partition(".")
+        user = metadata["users"].setdefault(user_id, {"name": rest.removesuffix(audio_path.suffix)})
+        user["file"] = audio_path.name
+        user.setdefault("join_offset_ms", guess_join_offset_ms(audio_path, session_start))
+
+    metadata["status"] = "recovered"
+    save_metadata_checkpoint(session_dir, metadata)
+    upsert_session(session_dir, metadata, transcribed=False)
+
+    return metadata
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recover sessions interrupted by a crash")
+    parser.add_argument("sessions_dir", nargs="?", default=config.SESSIONS_DIR)
+    parser.add_argument("--transcribe", action="store_true", help="Transcribe each recovered session")
+    args = parser.parse_args(argv)
+
+    for session_dir in find_incomplete_sessions(args.sessions_dir):
+        print(f"Recovering {session_dir.name}...")
+        try:
+            metadata = recover_session(session_dir)
+        except Exception as e:
+            print(f"Failed to recover {session_dir.name}: {e}")
+            continue
+
+        print(f"Recovered {session_dir.name} with {len(metadata['users'])} user(s)")
+
+        if args.transcribe:
+            from bot.processing.transcriber import run_transcription
+            run_transcription(session_dir)
+
+
+if __name__ == "__main__":
+    main()
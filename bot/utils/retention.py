@@ -0,0 +1,332 @@
+"""
+Storage maintenance for session folders.
+
+Once a session is transcribed its WAVs are compressed (FLAC by default,
+bit-exact; or Opus), and retention policies delete old audio by age and
+by the total size of SESSIONS_DIR. Transcripts are never deleted.
+Archived tracks can be transcribed as they are, or restored to WAV; they
+keep the hash of the original WAV, so the pipeline's caches stay valid.
+
+Usage:
+    python -m bot.utils.retention [sessions_dir] [--dry-run]
+    python -m bot.utils.retention --restore SESSION_DIR
+"""
+import argparse
+import asyncio
+import wave
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import av
+
+import bot.utils.config as config
+from bot.utils.file_utils import (
+    dir_size_bytes,
+    estimate_audio_seconds,
+    file_digest,
+    list_user_audio_files,
+    safe_load_json,
+    save_metadata_checkpoint
+)
+from bot.utils.session_index import ensure_index, list_sessions, upsert_session
+
+
+# codec -> (container, encoder, extension)
+ARCHIVE_FORMATS = {
+    "flac": ("flac", "flac", ".flac"),
+    "opus": ("ogg", "libopus", ".opus"),
+}
+
+# Archived duration may differ from the WAV by encoder padding
+DURATION_TOLERANCE_S = 0.1
+
+
+# =========================================================
+# Compression
+# =========================================================
+
+def encode_track(src, dst, codec):
+    container, encoder, _ = ARCHIVE_FORMATS[codec]
+
+    with av.open(str(src)) as inp, av.open(str(dst), "w", format=container) as out:
+        in_stream = inp.streams.audio[0]
+        stream = out.add_stream(encoder, rate=in_stream.rate)
+        stream.layout = in_stream.layout.name
+
+        if codec == "flac":
+            stream.format = "s16"
+        else:
+            stream.bit_rate = config.ARCHIVE_OPUS_BITRATE
+
+        for frame in inp.decode(in_stream):
+            frame.pts = None
+            for packet in stream.encode(frame):
+                out.mux(packet)
+
+        for packet in stream.encode(None):
+            out.mux(packet)
+
+
+def decode_track_to_wav(src, dst):
+    """Decodes an archived track back to the recorder's 48 kHz stereo s16 WAV."""
+    resampler = av.AudioResampler(format="s16", layout="stereo", rate=48000)
+
+    with av.open(str(src)) as inp, wave.open(str(dst), "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(48000)
+
+        for frame in inp.decode(audio=0):
+            for converted in resampler.resample(frame):
+                out.writeframes(converted.to_ndarray().tobytes())
+
+        for converted in resampler.resample(None):
+            out.writeframes(converted.to_ndarray().tobytes())
+
+
+def compress_session(session_dir, metadata, codec=None):
+    """
+    Replaces each WAV with an archived copy, after checking its duration.
+    Returns the bytes saved. `metadata` is updated in place.
+    """
+    codec = codec or config.ARCHIVE_CODEC
+    extension = ARCHIVE_FORMATS[codec][2]
+    saved = 0
+
+    for user_id, user in metadata.get("users", {}).items():
+        wav_path = session_dir / "users" / user.get("file", f"{user_id}.{user.get('name')}.wav")
+        if wav_path.suffix != ".wav" or not wav_path.exists():
+            continue
+
+        archive_path = wav_path.with_suffix(extension)
+        tmp_path = wav_path.with_suffix(extension + ".tmp")
+
+        try:
+            encode_track(wav_path, tmp_path, codec)
+        except Exception as e:
+            print(f"Failed to compress {wav_path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            continue
+
+        # Only drop the WAV once the archive demonstrably holds the same audio
+        expected = estimate_audio_seconds(wav_path)
+        archived = estimate_audio_seconds(tmp_path.rename(archive_path))
+        if abs(archived - expected) > DURATION_TOLERANCE_S:
+            print(f"Archive of {wav_path.name} is {archived:.1f}s, expected {expected:.1f}s; keeping the WAV")
+            archive_path.unlink()
+            continue
+
+        # The pipeline keys its caches on the recording, not on the archive
+        audio_hash = file_digest(wav_path)
+
+        saved += wav_path.stat().st_size - archive_path.stat().st_size
+        wav_path.unlink()
+
+        user["file"] = archive_path.name
+        user["original_file"] = wav_path.name
+        user["audio_hash"] = audio_hash
+        metadata["audio_archive"] = codec
+
+    return saved
+
+
+def restore_session(session_dir):
+    """Decodes archived tracks back to WAV (bit-exact for FLAC archives)."""
+    session_dir = Path(session_dir)
+    metadata = safe_load_json(session_dir / "metadata.json", default=None)
+    if metadata is None:
+        raise FileNotFoundError(f"No metadata.json in {session_dir}")
+
+    for user in metadata.get("users", {}).values():
+        original = user.get("original_file")
+        archive_path = session_dir / "users" / user.get("file", "")
+        if not original or not archive_path.exists():
+            continue
+
+        wav_path = session_dir / "users" / original
+        tmp_path = wav_path.with_suffix(".wav.tmp")
+        decode_track_to_wav(archive_path, tmp_path)
+        tmp_path.rename(wav_path)
+        archive_path.unlink()
+
+        user["file"] = original
+        del user["original_file"]
+
+    metadata.pop("audio_archive", None)
+    metadata["storage"] = size_summary(session_dir, metadata)
+    save_metadata_checkpoint(session_dir, metadata)
+    return metadata
+
+
+# =========================================================
+# Size Summary
+# =========================================================
+
+def size_summary(session_dir, metadata):
+    audio_bytes = sum(p.stat().st_size for p in list_user_audio_files(session_dir))
+    total_bytes = dir_size_bytes(session_dir)
+
+    return {
+        "audio_bytes": audio_bytes,
+        "other_bytes": total_bytes - audio_bytes,
+        "total_bytes": total_bytes,
+        "audio_format": metadata.get("audio_archive") or "wav",
+        "audio_deleted": bool(metadata.get("audio_deleted")),
+        "updated_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+    }
+
+
+# =========================================================
+# Retention
+# =========================================================
+
+def delete_session_audio(session_dir, metadata, reason):
+    freed = 0
+    for audio_path in list_user_audio_files(session_dir):
+        freed += audio_path.stat().st_size
+        audio_path.unlink()
+
+    metadata["audio_deleted"] = reason
+    return freed
+
+
+def session_age(metadata, now):
+    try:
+        return now - datetime.fromisoformat(metadata["session_start"])
+    except (KeyError, ValueError):
+        return timedelta(0)
+
+
+def run_maintenance(sessions_dir=None, busy=None, dry_run=False):
+    """
+    One maintenance pass over transcribed sessions, oldest first.
+    `busy` returns the IDs of sessions being recorded or transcribed; they
+    are not touched. A pass can run for a long time, so it is asked again
+    right before each session's audio is changed.
+    """
+    sessions_dir = Path(sessions_dir or config.SESSIONS_DIR)
+    if not sessions_dir.exists():
+        return
+
+    def in_use(session_dir):
+        if busy is None or session_dir.name not in busy():
+            return False
+        print(f"Retention: skipping {session_dir.name}, it is in use")
+        return True
+
+    ensure_index(sessions_dir)
+    now = datetime.now().astimezone()
+    max_age = timedelta(days=config.RETENTION_AUDIO_DAYS) if config.RETENTION_AUDIO_DAYS else None
+    max_bytes = config.RETENTION_MAX_GB * 1024**3 if config.RETENTION_MAX_GB else None
+
+    candidates = []
+    for session_id in list_sessions(transcribed=True, sessions_dir=sessions_dir):
+        session_dir = sessions_dir / session_id
+        if not session_dir.is_dir():
+            continue
+
+        metadata = safe_load_json(session_dir / "metadata.json", default=None)
+        if metadata is None or metadata.get("status") == "recording":
+            continue
+        candidates.append((session_dir, metadata))
+
+    # Tier 1: compress, Tier 2: audio past its age limit
+    for session_dir, metadata in candidates:
+        if in_use(session_dir):
+            continue
+        changed = "storage" not in metadata
+
+        if not metadata.get("audio_deleted"):
+            if max_age and session_age(metadata, now) > max_age:
+                print(f"Retention: deleting audio of {session_dir.name} (older than {config.RETENTION_AUDIO_DAYS:g} days)")
+                if not dry_run:
+                    delete_session_audio(session_dir, metadata, "age")
+                changed = True
+            elif any(p.suffix == ".wav" for p in list_user_audio_files(session_dir)):
+                print(f"Retention: compressing {session_dir.name} to {config.ARCHIVE_CODEC}")
+                if not dry_run:
+                    saved = compress_session(session_dir, metadata)
+                    print(f"Retention: saved {saved / 1024**2:.1f} MB in {session_dir.name}")
+                changed = True
+
+        if changed and not dry_run:
+            metadata["storage"] = size_summary(session_dir, metadata)
+            save_metadata_checkpoint(session_dir, metadata)
+            upsert_session(session_dir, metadata, transcribed=True)
+
+    # Tier 3: oldest audio goes first while the folder is over budget
+    if max_bytes:
+        total = dir_size_bytes(sessions_dir)
+        for session_dir, metadata in candidates:
+            if total <= max_bytes:
+                break
+            if metadata.get("audio_deleted") or in_use(session_dir):
+                continue
+
+            print(f"Retention: deleting audio of {session_dir.name} ({total / 1024**3:.1f} GB > {config.RETENTION_MAX_GB:g} GB)")
+            if dry_run:
+                total -= sum(p.stat().st_size for p in list_user_audio_files(session_dir))
+                continue
+
+            total -= delete_session_audio(session_dir, metadata, "size")
+            metadata["storage"] = size_summary(session_dir, metadata)
+            save_metadata_checkpoint(session_dir, metadata)
+
+
+# =========================================================
+# Background Task
+# =========================================================
+
+class MaintenanceTask:
+    """Runs maintenance passes on a worker thread, off the bot's event loop."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def busy_sessions(self):
+        busy = set(self.bot.scheduler.busy_sessions())
+        if self.bot.recorder is not None:
+            busy.add(self.bot.recorder.session_dir.name)
+        return busy
+
+    async def current_busy_sessions(self):
+        return self.busy_sessions()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        def busy():
+            # Asked from the maintenance thread, answered on the loop that owns the scheduler
+            return asyncio.run_coroutine_threadsafe(self.current_busy_sessions(), loop).result(timeout=10)
+
+        while True:
+            try:
+                await asyncio.to_thread(run_maintenance, config.SESSIONS_DIR, busy)
+            except Exception as e:
+                print(f"Storage maintenance failed: {e}")
+
+            await asyncio.sleep(config.MAINTENANCE_INTERVAL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compress transcribed sessions and apply retention policies")
+    parser.add_argument("sessions_dir", nargs="?", default=config.SESSIONS_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be done")
+    parser.add_argument("--restore", metavar="SESSION_DIR", help="Decode a session's archived audio back to WAV")
+    args = parser.parse_args(argv)
+
+    if args.restore:
+        restore_session(args.restore)
+        print(f"Restored WAVs in {args.restore}")
+        return
+
+    run_maintenance(args.sessions_dir, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import sqlite3
+from pathlib import Path
+
+import bot.utils.config as config
+from bot.utils.file_utils import safe_load_json
+
+
+# =========================================================
+# Connection / Schema
+# =========================================================
+
+def get_index_path(sessions_dir=None):
+    return Path(sessions_dir or config.SESSIONS_DIR) / "index.db"
+
+
+def get_index_connection(sessions_dir=None):
+    index_path = get_index_path(sessions_dir)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # The bot and transcription workers share this file
+    conn = sqlite3.connect(index_path, timeout=10)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        session_start TEXT,
+        channel_name TEXT,
+        user_count INTEGER NOT NULL DEFAULT 0,
+        transcribed INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_channel ON sessions(channel_name)")
+    return conn
+
+
+# =========================================================
+# Updates
+# =========================================================
+
+def upsert_session(session_dir, metadata=None, transcribed=None):
+    session_dir = Path(session_dir)
+
+    if metadata is None:
+        metadata = safe_load_json(session_dir / "metadata.json", default={})
+
+    if transcribed is None:
+        transcribed = (session_dir / "transcript.txt").exists()
+
+    with get_index_connection(session_dir.parent) as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO sessions (session_id, session_start, channel_name, user_count, transcribed)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                session_dir.name,
+                metadata.get("session_start"),
+                (metadata.get("channel") or {}).get("name"),
+                len(metadata.get("users", {})),
+                int(transcribed)
+            )
+        )
+        conn.commit()
+
+
+def rebuild_index(sessions_dir=None):
+    sessions_dir = Path(sessions_dir or config.SESSIONS_DIR)
+    if not sessions_dir.exists():
+        return
+
+    for session_dir in sessions_dir.iterdir():
+        if session_dir.is_dir():
+            upsert_session(session_dir)
+
+
+# =========================================================
+# Queries
+# =========================================================
+
+def search_sessions(prefix="", limit=25, sessions_dir=None):
+    """
+    Returns (session_id, session_start, channel_name, transcribed) rows,
+    newest first. Prefix matches on the session ID or channel name,
+    both of which are indexed (GLOB is case sensitive, so it can use them).
+    """
+    pattern = prefix.replace("[", "[[]").replace("*", "[*]").replace("?", "[?]") + "*"
+
+    with get_index_connection(sessions_dir) as conn:
+        rows = conn.execute(
+            """
+            SELECT session_id, session_start, channel_name, transcribed FROM sessions
+            WHERE session_id GLOB :pattern
+            UNION
+            SELECT session_id, session_start, channel_name, transcribed FROM sessions
+            WHERE channel_name GLOB :pattern
+            ORDER BY session_id DESC
+            LIMIT :limit
+            """,
+            {"pattern": pattern, "limit": limit}
+        ).fetchall()
+
+    return rows
+
+
+def list_sessions(transcribed=None, sessions_dir=None):
+    """Returns session IDs oldest first, optionally filtered by transcription status."""
+    with get_index_connection(sessions_dir) as conn:
+        if transcribed is None:
+            rows = conn.execute("SELECT session_id FROM sessions ORDER BY session_id").fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT session_id FROM sessions WHERE transcribed = ? ORDER BY session_id",
+                (int(transcribed),)
+            ).fetchall()
+
+    return [row[0] for row in rows]
+
+
+def is_transcribed(session_id, sessions_dir=None):
+    """The session's transcribed flag, or None if it is not in the index."""
+    with get_index_connection(sessions_dir) as conn:
+        row = conn.execute("SELECT transcribed FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+
+    return None if row is None else bool(row[0])
+
+
+def ensure_index(sessions_dir=None):
+    """Builds the index on first use for sessions recorded before it existed."""
+    if not get_index_path(sessions_dir).exists():
+        rebuild_index(sessions_dir)
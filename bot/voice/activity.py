@@ -0,0 +1,166 @@
+"""
+Audio levels and a speech-activity timeline per user, measured during capture.
+
+The track worker hands every batch of queued 20 ms frames to an
+ActivityMeter. RMS levels of the whole batch are computed in one numpy
+pass, and a frame counts as speech when it is louder than
+ACTIVITY_THRESHOLD_DBFS. Active frames are run-length encoded into
+[start_ms, end_ms] runs (track-relative), merging runs separated by less
+than ACTIVITY_MERGE_MS, so an hour of talk stays a few hundred runs.
+
+In Opus passthrough mode there is no PCM to measure; a packet counts as
+speech unless it is Discord's silence frame, and no levels are recorded.
+
+The recorder saves every meter to activity.json in the session folder:
+
+    {"frame_ms": 20, "users": {user_id: {"join_offset_ms", "runs", "talk_ms", ...}}}
+"""
+import threading
+
+import numpy as np
+
+import bot.utils.config as config
+from bot.utils.file_utils import atomic_write_json, safe_load_json
+from bot.voice.ogg_writer import OPUS_SILENCE
+
+ACTIVITY_FILE = "activity.json"
+FRAME_MS = 20
+
+# Full scale of 16-bit PCM, for dBFS
+FULL_SCALE = 32768.0
+
+
+def frame_levels_dbfs(frames):
+    """RMS level in dBFS of each PCM frame (interleaved int16), in one pass when they share a size."""
+    if len({len(frame) for frame in frames}) == 1:
+        samples = np.frombuffer(b"".join(frames), dtype=np.int16).reshape(len(frames), -1)
+        power = np.mean(np.square(samples, dtype=np.float32), axis=1)
+    else:
+        power = np.array([
+            np.mean(np.square(np.frombuffer(frame, dtype=np.int16), dtype=np.float32)) if len(frame) >= 2 else 0.0
+            for frame in frames
+        ], dtype=np.float32)
+
+    return 10 * np.log10(np.maximum(power, 1e-10) / FULL_SCALE ** 2)
+
+
+class ActivityMeter:
+    """Run-length encoded speech activity of one track. Fed by the track worker only."""
+
+    def __init__(self, join_offset_ms=0, opus=False):
+        self.join_offset_ms = join_offset_ms
+        self.opus = opus
+        self.threshold_dbfs = config.ACTIVITY_THRESHOLD_DBFS
+        self.merge_frames = max(int(config.ACTIVITY_MERGE_MS / FRAME_MS), 1)
+
+        # Frames seen so far, silence gaps included; the track's clock
+        self.frames = 0
+        self.active_frames = 0
+        # [start_frame, end_frame) runs; the last one may still grow
+        self.runs = []
+        self.level_sum = 0.0
+        self.peak_dbfs = None
+
+        # Snapshots are taken from the checkpoint thread
+        self.lock = threading.Lock()
+
+    def add_batch(self, batch):
+        """
+        `batch` is a list of (frame, silent_frames_before_it) as queued by UserTrack.
+        Returns the speech flag of every frame.
+        """
+        if not batch:
+            return np.zeros(0, dtype=bool)
+
+        frames = [frame for frame, _ in batch]
+        if self.opus:
+            levels = None
+            active = np.array([frame != OPUS_SILENCE for frame in frames])
+        else:
+            levels = frame_levels_dbfs(frames)
+            active = levels > self.threshold_dbfs
+
+        # Position of every frame on the track, after the silence before it
+        steps = np.array([silent + 1 for _, silent in batch], dtype=np.int64)
+        positions = self.frames + np.cumsum(steps) - 1
+
+        with self.lock:
+            self.frames = int(positions[-1]) + 1
+            active_positions = positions[active]
+            if not len(active_positions):
+                return active
+
+            self.active_frames += len(active_positions)
+            if levels is not None:
+                active_levels = levels[active]
+                self.level_sum += float(active_levels.sum())
+                peak = float(active_levels.max())
+                self.peak_dbfs = peak if self.peak_dbfs is None else max(self.peak_dbfs, peak)
+
+            # Split where the gap to the previous active frame is too long to bridge
+            breaks = np.flatnonzero(np.diff(active_positions) > self.merge_frames) + 1
+            starts = active_positions[np.concatenate(([0], breaks))]
+            ends = active_positions[np.concatenate((breaks - 1, [len(active_positions) - 1]))] + 1
+
+            first = 0
+            if self.runs and starts[0] - (self.runs[-1][1] - 1) <= self.merge_frames:
+                self.runs[-1][1] = int(ends[0])
+                first = 1
+            self.runs.extend([int(s), int(e)] for s, e in zip(starts[first:], ends[first:]))
+
+        return active
+
+    def snapshot(self):
+        with self.lock:
+            runs = [[s * FRAME_MS, e * FRAME_MS] for s, e in self.runs]
+            talk_ms = sum(e - s for s, e in runs)
+            entry = {
+                "join_offset_ms": self.join_offset_ms,
+                "duration_ms": self.frames * FRAME_MS,
+                "talk_ms": talk_ms,
+                "voiced_ms": self.active_frames * FRAME_MS,
+                "runs": runs
+            }
+            if self.active_frames and self.peak_dbfs is not None:
+                entry["mean_dbfs"] = round(self.level_sum / self.active_frames, 1)
+                entry["peak_dbfs"] = round(self.peak_dbfs, 1)
+        return entry
+
+
+# =========================================================
+# Session File
+# =========================================================
+
+def save_activity(session_dir, meters):
+    """`meters` maps user IDs to ActivityMeters."""
+    atomic_write_json(session_dir / ACTIVITY_FILE, {
+        "frame_ms": FRAME_MS,
+        "users": {str(user_id): meter.snapshot() for user_id, meter in meters.items()}
+    })
+
+
+def load_activity(session_dir):
+    """The users section of activity.json, or {} for sessions recorded without it."""
+    data = safe_load_json(session_dir / ACTIVITY_FILE, default=None) or {}
+    return data.get("users", {})
+
+
+def talk_share(activity):
+    """{user_id: (talk_ms, share of the session's total talk)}."""
+    total = sum(entry.get("talk_ms", 0) for entry in activity.values())
+    return {
+        user_id: (entry.get("talk_ms", 0), entry.get("talk_ms", 0) / total if total else 0.0)
+        for user_id, entry in activity.items()
+    }
+
+
+def padded_runs(runs, pad_ms, gap_ms=0):
+    """Talk runs widened by `pad_ms` each side, merging those less than `gap_ms` apart."""
+    merged = []
+    for start_ms, end_ms in runs:
+        start_ms, end_ms = max(start_ms - pad_ms, 0), end_ms + pad_ms
+        if merged and start_ms - merged[-1][1] <= gap_ms:
+            merged[-1][1] = max(merged[-1][1], end_ms)
+        else:
+            merged.append([start_ms, end_ms])
+    return merged
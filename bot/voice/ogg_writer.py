@@ -0,0 +1,142 @@
+import os
+import struct
+import time
+
+# A 20 ms Opus frame of silence (what Discord sends when a user stops talking)
+OPUS_SILENCE = b"\xf8\xff\xfe"
+
+# Granule positions are always counted at 48 kHz in Ogg/Opus
+OPUS_RATE = 48000
+
+# Flush a page after this many packets (~1 s of 20 ms frames)
+PACKETS_PER_PAGE = 50
+
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data):
+    # Ogg uses the non-reflected CRC-32 polynomial, which zlib does not provide
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+
+def opus_packet_samples(packet):
+    """Samples (at 48 kHz) in an Opus packet, from its TOC byte (RFC 6716 3.1)."""
+    if not packet:
+        return 0
+
+    config = packet[0] >> 3
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config % 4]     # SILK: 10/20/40/60 ms
+    elif config < 16:
+        frame = (480, 960)[config % 2]                 # Hybrid: 10/20 ms
+    else:
+        frame = (120, 240, 480, 960)[config % 4]       # CELT: 2.5/5/10/20 ms
+
+    code = packet[0] & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+
+    return frame * frames
+
+
+class OggOpusWriter:
+    """
+    Stores Opus packets as received from Discord in an Ogg/Opus file.
+
+    Nothing is decoded or re-encoded. Ogg pages are self-delimiting, so a
+    crash loses at most the pages not yet flushed at the last checkpoint.
+    Same interface as CheckpointedWavWriter; writeframes() takes one packet.
+    """
+
+    def __init__(self, filepath, channels=2, interval=10.0):
+        self.file = open(filepath, "wb")
+        self.serial = int.from_bytes(os.urandom(4), "little")
+        self.page_seq = 0
+        self.granule = 0
+
+        self.packets = []
+        self.lacing = 0
+        self.interval = interval
+        self.last_checkpoint = time.monotonic()
+        self.dirty = False
+
+        # Pre-skip 0 keeps the first sample at the user's join offset
+        head = b"OpusHead" + struct.pack("<BBHIhB", 1, channels, 0, OPUS_RATE, 0, 0)
+        vendor = b"meeting-bot"
+        tags = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)
+
+        self.write_page([head], granule=0, flags=0x02)
+        self.write_page([tags], granule=0)
+
+    def write_page(self, packets, granule, flags=0x00):
+        lacing = bytearray()
+        for packet in packets:
+            lacing.extend(b"\xff" * (len(packet) // 255))
+            lacing.append(len(packet) % 255)
+
+        header = struct.pack(
+            "<4sBBqIIIB",
+            b"OggS", 0, flags, granule, self.serial, self.page_seq, 0, len(lacing)
+        )
+        page = bytearray(header + lacing + b"".join(packets))
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+
+        self.file.write(page)
+        self.page_seq += 1
+
+    def flush_page(self, last=False):
+        if self.packets or last:
+            self.write_page(self.packets, self.granule, flags=0x04 if last else 0x00)
+            self.packets = []
+            self.lacing = 0
+
+    def writeframes(self, packet):
+        # A page holds at most 255 lacing values
+        if self.lacing + len(packet) // 255 + 1 > 255:
+            self.flush_page()
+
+        self.packets.append(packet)
+        self.lacing += len(packet) // 255 + 1
+        self.granule += opus_packet_samples(packet)
+        self.dirty = True
+
+        if len(self.packets) >= PACKETS_PER_PAGE:
+            self.flush_page()
+
+    def maybe_checkpoint(self):
+        if self.dirty and time.monotonic() - self.last_checkpoint >= self.interval:
+            self.checkpoint()
+
+    def checkpoint(self, fsync=False):
+        self.flush_page()
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+
+        self.last_checkpoint = time.monotonic()
+        self.dirty = False
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush_page(last=True)
+        self.file.flush()
+        self.file.close()
@@ -1,22 +1,32 @@
 from typing import Dict
 
+import asyncio
+import json
+import threading
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from discord.ext import voice_recv
 
+import bot.utils.config as config
 from bot.voice.user_track import UserTrack
 
 from bot.utils.file_utils import (
     create_session_folder,
-    create_user_wav_path,
+    create_user_audio_path,
     safe_close_wav,
     save_metadata_checkpoint
 )
+from bot.utils.language_store import list_shared_accounts
+from bot.utils.logger import log_event, start_span
+from bot.utils.profiler import profile_dir, start_profiling
+from bot.utils.session_index import upsert_session
+from bot.voice.activity import save_activity
 
 
 class Recorder(voice_recv.AudioSink):
 
-    def __init__(self, channel=None):
+    def __init__(self, channel=None, captions=None):
         super().__init__()
 
         # ----- Session -----
@@ -28,22 +38,71 @@ class Recorder(voice_recv.AudioSink):
         # ----- Track Storage -----
         self.tracks : Dict[int, UserTrack] = {}
 
+        # Store Discord's Opus packets as-is instead of decoding to PCM
+        self.opus = config.RECORD_OPUS
+
+        # Accounts flagged with /shared; read here because add_user runs on the voice thread
+        self.shared_users = list_shared_accounts()
+
+        # LiveCaptions, fed by every track (PCM recordings only)
+        self.captions = captions
+        if captions is not None:
+            captions.session_id = self.session_dir.name
+
         # ----- Metadata -----
         self.metadata = {
             "session_start": timestamp,
+            "guild": {
+                "id": str(channel.guild.id) if channel else None,
+                "name": channel.guild.name if channel else None
+            },
             "channel": {
                 "id": str(channel.id) if channel else None,
                 "name": channel.name if channel else None,
                 "category_id": str(channel.category.id) if channel and channel.category else None,
                 "category_name": channel.category.name if channel and channel.category else None
             },
-            "users": {}
+            "users": {},
+            # "recording" until cleanup; stale "recording" checkpoints mark crashed sessions
+            "status": "recording"
         }
+        self.metadata_lock = threading.Lock()
+
+        # From the first moment packets can arrive until cleanup
+        self.capture_span = start_span(
+            "capture",
+            self.session_dir.name,
+            channel_id=self.metadata["channel"]["id"],
+            opus=self.opus
+        )
+
+        # --profile: sample the bot while this session is being captured
+        if config.PROFILE_SECONDS:
+            start_profiling(profile_dir(self.session_dir), "bot", config.PROFILE_SECONDS, self.session_dir.name)
+
+        # ----- Periodic Checkpoints -----
+        self.stopped = threading.Event()
+        # Set once cleanup has flushed every track and the final metadata
+        self.closed = threading.Event()
+        self.checkpoint_thread = threading.Thread(target=self.checkpoint_worker, daemon=True)
+        self.checkpoint_thread.start()
+
+    @classmethod
+    async def create(cls, channel=None, captions=None):
+        """Builds a recorder off the event loop (creating the session folder hits the disk)."""
+        return await asyncio.to_thread(cls, channel, captions)
+
+    async def wait_closed(self, timeout=60):
+        """
+        voice_recv runs cleanup() on its own thread after stop_listening();
+        waits for it without blocking the event loop.
+        """
+        return await asyncio.to_thread(self.closed.wait, timeout)
 
     # -----------------------------------------------------
 
     def wants_opus(self):
-        return False
+        return self.opus
 
     # -----------------------------------------------------
 
@@ -58,17 +117,36 @@ class Recorder(voice_recv.AudioSink):
 
     def add_user(self, user):
 
-        filepath = create_user_wav_path(self.users_dir, user)
+        filepath = create_user_audio_path(self.users_dir, user, "opus" if self.opus else "wav")
+        offset = self.current_offset_ms()
 
-        track = UserTrack(filepath)
+        track = UserTrack(filepath, opus=self.opus, labels={"user_id": user.id, "user": user.name}, join_offset_ms=offset)
+        if self.captions is not None:
+            track.captions = self.captions.feed_for(user)
         self.tracks[user.id] = track
 
-        offset = self.current_offset_ms()
-
-        self.metadata["users"][str(user.id)] = {
-            "name": user.name,
-            "join_offset_ms": offset
-        }
+        with self.metadata_lock:
+            self.metadata["users"][str(user.id)] = {
+                "name": user.name,
+                "file": filepath.name,
+                "join_offset_ms": offset,
+                "shared": str(user.id) in self.shared_users
+            }
+
+        # Queued for the log thread, the voice thread does not wait on it
+        log_event("track_added", self.session_dir.name, user_id=user.id, user=user.name, join_offset_ms=offset)
+
+    def set_shared(self, user_id, shared):
+        """Applies a /shared change to this session as well."""
+        user_id = str(user_id)
+        with self.metadata_lock:
+            if shared:
+                self.shared_users.add(user_id)
+            else:
+                self.shared_users.discard(user_id)
+
+            if user_id in self.metadata["users"]:
+                self.metadata["users"][user_id]["shared"] = shared
 
     # -----------------------------------------------------
     # Main Audio Router
@@ -76,17 +154,42 @@ class Recorder(voice_recv.AudioSink):
 
     def write(self, user, data):
 
-        if not data.pcm:
+        frame = data.opus if self.opus else data.pcm
+
+        # Lost packets are filled with silence by the track
+        if not frame:
             return
 
         # Add track dynamically
         if user.id not in self.tracks:
             self.add_user(user)
 
-        packet_size = len(data.pcm)
-        silence = bytes(packet_size)
-        
-        self.tracks[user.id].enqueue(data.pcm)
+        self.tracks[user.id].enqueue(frame)
+
+    # -----------------------------------------------------
+    # Checkpoints
+    # -----------------------------------------------------
+
+    def checkpoint(self):
+
+        with self.metadata_lock:
+            self.metadata["checkpoint_at"] = time.time()
+            self.metadata["checkpoint_offset_ms"] = self.current_offset_ms()
+            # Snapshot under the lock, write outside it
+            snapshot = json.loads(json.dumps(self.metadata))
+
+        save_metadata_checkpoint(self.session_dir, snapshot)
+
+        # add_user runs on the voice thread, so iterate over a copy
+        save_activity(self.session_dir, {user_id: track.activity for user_id, track in list(self.tracks.items())})
+
+    def checkpoint_worker(self):
+
+        while not self.stopped.wait(config.CHECKPOINT_INTERVAL):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print(f"Metadata checkpoint failed: {e}")
 
     # -----------------------------------------------------
     # Cleanup
@@ -94,8 +197,26 @@ class Recorder(voice_recv.AudioSink):
 
     def cleanup(self):
 
-        # Stop all user tracks
-        for track in self.tracks.values():
-            track.stop()
-
-        save_metadata_checkpoint(self.session_dir, self.metadata)
+        # Also called from AudioSink.__del__, only finalize once
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+
+        try:
+            self.checkpoint_thread.join()
+
+            # Stop all user tracks
+            for track in self.tracks.values():
+                track.stop()
+
+            # Tracks are drained, so the last captions can be posted
+            if self.captions is not None:
+                self.captions.close()
+
+            with self.metadata_lock:
+                self.metadata["status"] = "complete"
+            self.checkpoint()
+            upsert_session(self.session_dir, self.metadata, transcribed=False)
+        finally:
+            self.capture_span.end(users=len(self.tracks))
+            self.closed.set()
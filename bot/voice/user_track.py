@@ -1,48 +1,143 @@
 import threading
 import queue
 from time import time
-import wave
 
+import bot.utils.config as config
 from bot.utils.file_utils import safe_close_wav
+from bot.utils.metrics import BYTES_WRITTEN, VOICE_PACKET_RATE, VOICE_PACKETS, WRITER_QUEUE_DEPTH
+from bot.voice.activity import ActivityMeter
+from bot.voice.ogg_writer import OPUS_SILENCE, OggOpusWriter
+from bot.voice.wav_writer import CheckpointedWavWriter
+
+# Frames the worker takes off the queue at once (~1 s)
+MAX_BATCH_FRAMES = 50
 
 class UserTrack:
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, opus=False, labels=None, join_offset_ms=0):
+        self.filepath = filepath
         self.queue = queue.Queue()
         self.running = True
+        self.opus = opus
+
+        # Levels and talk runs, measured per batch by the worker
+        self.activity = ActivityMeter(join_offset_ms, opus)
+        # CaptionFeed when live captions are on
+        self.captions = None
+
+        # Metric labels (user_id, user); counted by the worker, not the voice thread
+        self.labels = labels or {}
+        self.rate_started = time()
+        self.rate_packets = 0
+        self.rate_bytes = 0
+
+        # Opened by the worker, so the voice thread never touches the disk
+        self.wav = None
 
-        self.wav = wave.open(str(filepath), "wb")
-        self.wav.setnchannels(2)
-        self.wav.setsampwidth(2)
-        self.wav.setframerate(48000)
-        
         self.last_packet_time = time()
 
         self.thread = threading.Thread(target=self.worker, daemon=True)
         self.thread.start()
 
-    def enqueue(self, pcm):
+    def open_writer(self):
+        # Flushed (and WAV header sizes made valid) every CHECKPOINT_INTERVAL seconds
+        if self.opus:
+            return OggOpusWriter(self.filepath, channels=2, interval=config.CHECKPOINT_INTERVAL)
+        return CheckpointedWavWriter(
+            self.filepath,
+            channels=2,
+            sampwidth=2,
+            framerate=48000,
+            interval=config.CHECKPOINT_INTERVAL
+        )
+
+    def enqueue(self, frame):
+        # `frame` is 20 ms of PCM, or one Opus packet in opus mode
         now = time()
         gap = now - self.last_packet_time
         missing_frames = int(gap / 0.02)
-        
-        if missing_frames > 1:
-            silence = bytes(len(pcm))
-            for _ in range(missing_frames - 1):
-                self.queue.put(silence)
-        
-        self.queue.put(pcm)
+
+        # The worker expands the gap, so a long silence is still one put()
+        self.queue.put((frame, max(missing_frames - 1, 0)))
         self.last_packet_time = now
 
-    def worker(self):
-        while self.running:
+    def write_silence(self, frames, frame_bytes):
+        if self.opus:
+            for _ in range(frames):
+                self.wav.writeframes(OPUS_SILENCE)
+            self.rate_bytes += len(OPUS_SILENCE) * frames
+            return
+
+        self.rate_bytes += frame_bytes * frames
+
+        # At most a second of zeros per write
+        while frames > 0:
+            count = min(frames, 50)
+            self.wav.writeframes(bytes(frame_bytes * count))
+            frames -= count
+
+    def update_metrics(self):
+        WRITER_QUEUE_DEPTH.set(self.queue.qsize(), **self.labels)
+
+        # Counters are published once a second rather than per packet
+        elapsed = time() - self.rate_started
+        if elapsed >= 1.0:
+            VOICE_PACKET_RATE.set(self.rate_packets / elapsed, **self.labels)
+            self.publish_counts()
+            self.rate_started = time()
+
+    def publish_counts(self):
+        VOICE_PACKETS.inc(self.rate_packets, **self.labels)
+        BYTES_WRITTEN.inc(self.rate_bytes, **self.labels)
+        self.rate_packets = 0
+        self.rate_bytes = 0
+
+    def next_batch(self):
+        """Waits up to a second for a frame, then takes whatever else is already queued."""
+        try:
+            batch = [self.queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < MAX_BATCH_FRAMES:
             try:
-                pcm = self.queue.get(timeout=1)
-                self.wav.writeframes(pcm)
+                batch.append(self.queue.get_nowait())
             except queue.Empty:
-                continue
+                break
+        return batch
+
+    def worker(self):
+        self.wav = self.open_writer()
+
+        # Drain what is already queued before stopping
+        while self.running or not self.queue.empty():
+            batch = self.next_batch()
+
+            for frame, silent_frames in batch:
+                if silent_frames:
+                    self.write_silence(silent_frames, len(frame))
+                self.wav.writeframes(frame)
+
+                self.rate_packets += 1
+                self.rate_bytes += len(frame)
+
+            try:
+                active = self.activity.add_batch(batch)
+                if self.captions is not None and batch:
+                    self.captions.feed(batch, active)
+            except Exception as e:
+                # Metering and captions must never cost audio
+                print(f"Activity metering failed for {self.filepath.name}: {e}")
+
+            self.update_metrics()
+            self.wav.maybe_checkpoint()
+
+        self.publish_counts()
+        VOICE_PACKET_RATE.remove(**self.labels)
+        WRITER_QUEUE_DEPTH.remove(**self.labels)
 
     def stop(self):
         self.running = False
         self.thread.join()
-        safe_close_wav(self.wav)
+        if self.wav is not None:
+            safe_close_wav(self.wav)
@@ -0,0 +1,47 @@
+import os
+import time
+
+from bot.utils.file_utils import build_wav_header, patch_wav_sizes
+
+
+class CheckpointedWavWriter:
+    """
+    Appends PCM to a WAV file through a buffered handle.
+
+    wave.Wave_write seeks back and patches the header on every write;
+    here the header sizes are only rewritten at checkpoints, so a crash
+    loses at most one checkpoint interval and the hot path is a plain append.
+    """
+
+    def __init__(self, filepath, channels=2, sampwidth=2, framerate=48000, interval=10.0):
+        self.file = open(filepath, "wb")
+        self.file.write(build_wav_header(0, channels, sampwidth, framerate))
+
+        self.data_bytes = 0
+        self.interval = interval
+        self.last_checkpoint = time.monotonic()
+        self.dirty = False
+
+    def writeframes(self, pcm):
+        self.file.write(pcm)
+        self.data_bytes += len(pcm)
+        self.dirty = True
+
+    def maybe_checkpoint(self):
+        if self.dirty and time.monotonic() - self.last_checkpoint >= self.interval:
+            self.checkpoint()
+
+    def checkpoint(self, fsync=False):
+        patch_wav_sizes(self.file, self.data_bytes)
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+
+        self.last_checkpoint = time.monotonic()
+        self.dirty = False
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.checkpoint()
+        self.file.close()
@@ -1,7 +0,0 @@
-from bot.processing.transcriber import run_transcription
-
-from dotenv import load_dotenv
-
-load_dotenv()
-
-run_transcription("sessions/2026-02-07T01-22-47.777_05-30")
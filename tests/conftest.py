@@ -0,0 +1,104 @@
+import json
+import sys
+import types
+import wave
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bot.utils.config as config
+
+SESSION_ID = "2026-10-19T10-00-00.000_05-30"
+SESSION_START = "2026-10-19T10:00:00.000+05:30"
+
+
+def write_wav(path, seconds=2.0, seed=0):
+    """48 kHz stereo int16, like the recorder's tracks."""
+    rng = np.random.default_rng(seed)
+    mono = (rng.standard_normal(int(seconds * 48000)) * 3000).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(48000)
+        f.writeframes(np.repeat(mono, 2).tobytes())
+
+
+def make_session(sessions_dir, names=("alice", "bob"), seconds=2.0, session_id=SESSION_ID):
+    session_dir = Path(sessions_dir) / session_id
+    (session_dir / "users").mkdir(parents=True)
+
+    users = {}
+    for n, name in enumerate(names, 1):
+        file = f"{n}.{name}.wav"
+        write_wav(session_dir / "users" / file, seconds, seed=n)
+        users[str(n)] = {"name": name, "file": file, "join_offset_ms": 0, "shared": False}
+
+    (session_dir / "metadata.json").write_text(json.dumps({
+        "session_start": SESSION_START,
+        "status": "complete",
+        "guild": {"id": "1"},
+        "users": users
+    }), encoding="utf8")
+    return session_dir
+
+
+class FakeSegment:
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.words = None
+
+
+SENTENCES = [
+    "the budget review moves to thursday",
+    "please send me the slides afterwards",
+    "our deployment failed twice last night",
+    "lunch is provided in the main hall",
+]
+
+
+class FakeModel:
+    """Stands in for WhisperModel: one segment per call, counted in `calls`."""
+
+    def __init__(self):
+        self.calls = 0
+        # (samples, vad_filter) of every language detection
+        self.detections = []
+
+    def detect_language(self, audio=None, vad_filter=True, **kwargs):
+        self.detections.append((len(audio), vad_filter))
+        return "en", 1.0, [("en", 1.0)]
+
+    def transcribe(self, audio, **kwargs):
+        self.calls += 1
+        duration = len(audio) / 16000
+        segments = [FakeSegment(0.0, duration, SENTENCES[(self.calls - 1) % len(SENTENCES)])]
+        return iter(segments), types.SimpleNamespace(duration=duration)
+
+
+@pytest.fixture(autouse=True)
+def sessions_dir(tmp_path, monkeypatch):
+    path = tmp_path / "sessions"
+    path.mkdir()
+    monkeypatch.setattr(config, "SESSIONS_DIR", str(path))
+    monkeypatch.setattr(config, "LOG_FILE", str(tmp_path / "logs" / "meeting-bot.jsonl"))
+    monkeypatch.setattr(config, "SUMMARY_BACKEND", "off")
+    return path
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Patches model loading and VAD so the pipeline runs without any weights."""
+    import bot.processing.pipeline as pipeline
+
+    model = FakeModel()
+    monkeypatch.setattr(pipeline, "load_model", lambda *args: model)
+    monkeypatch.setattr(
+        pipeline, "get_speech_timestamps",
+        lambda audio, options: [{"start": 0, "end": len(audio)}] if len(audio) else []
+    )
+    return model
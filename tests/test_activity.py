@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+
+import bot.processing.pipeline as pipeline
+from bot.processing.pipeline import audible_runs, detect_speech, unmetered_seconds
+from bot.voice.activity import ActivityMeter, padded_runs
+from conftest import make_session
+from test_pipeline import run
+
+
+def tone(seconds, dbfs):
+    samples = np.arange(int(seconds * 16000))
+    amplitude = np.sqrt(2) * 10 ** (dbfs / 20)
+    return (amplitude * np.sin(2 * np.pi * 440 * samples / 16000)).astype(np.float32)
+
+
+def pcm_frame(level):
+    return (np.full(1920, level, dtype=np.int16)).tobytes()
+
+
+# ---------- Capture ----------
+
+def test_meter_merges_short_pauses():
+    meter = ActivityMeter()
+    loud, quiet = pcm_frame(8000), pcm_frame(0)
+    # 10 loud frames, a 100 ms pause, 5 loud, a 1 s gap of missing packets, 5 loud
+    batch = [(loud, 0)] * 10 + [(quiet, 0)] * 5 + [(loud, 0)] * 5 + [(loud, 50)] + [(loud, 0)] * 4
+    meter.add_batch(batch)
+
+    snapshot = meter.snapshot()
+    assert snapshot["runs"] == [[0, 400], [1400, 1500]]
+    assert snapshot["voiced_ms"] == 400
+    assert snapshot["duration_ms"] == 1500
+
+
+def test_padded_runs():
+    assert padded_runs([[100, 200], [900, 1000]], 300) == [[0, 500], [600, 1300]]
+    assert padded_runs([[100, 200], [900, 1000]], 300, gap_ms=200) == [[0, 1300]]
+
+
+# ---------- VAD hint ----------
+
+def test_audible_runs_ignore_padded_silence():
+    audio = np.concatenate([np.zeros(16000, np.float32), tone(1, -60), np.zeros(16000, np.float32)])
+    assert audible_runs(audio, -70, block_s=1) == [[1000, 2000]]
+    assert audible_runs(np.zeros(32000, np.float32), -70) == []
+
+
+def test_quiet_speech_is_searched(monkeypatch):
+    searched = []
+
+    def speech_timestamps(audio, options):
+        searched.append(len(audio))
+        return [{"start": 0, "end": len(audio)}]
+
+    monkeypatch.setattr(pipeline, "get_speech_timestamps", speech_timestamps)
+
+    # The meter saw nothing: the speaker was below its threshold
+    audio = np.concatenate([np.zeros(5 * 16000, np.float32), tone(2, -55), np.zeros(5 * 16000, np.float32)])
+    speech = detect_speech(audio, None, runs=[])
+
+    assert speech == [{"start": 4500 * 16, "end": 7500 * 16}]
+    assert searched == [3000 * 16]
+    assert unmetered_seconds(speech, []) == 3.0
+
+
+def test_unmetered_track_is_transcribed(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir)
+    (session_dir / "activity.json").write_text(json.dumps({"frame_ms": 20, "users": {
+        "1": {"join_offset_ms": 0, "runs": [[0, 2000]]},
+        "2": {"join_offset_ms": 0, "runs": []},
+    }}), encoding="utf8")
+
+    run(session_dir)
+    assert fake_model.calls == 2
@@ -0,0 +1,65 @@
+import wave
+
+import numpy as np
+import pytest
+
+import bot.processing.audio as audio
+from bot.processing.audio import convert_into, load_wav_16k, output_frames, read_wav_layout
+
+
+def stereo_tone(seconds, hz, rate=48000, level=0.5):
+    t = np.arange(int(seconds * rate)) / rate
+    mono = np.round(level * 32767 * np.sin(2 * np.pi * hz * t)).astype(np.int16)
+    return np.stack([mono, mono], axis=1)
+
+
+def convert(pcm, factor):
+    out = np.zeros(output_frames(len(pcm), factor), np.float32)
+    written = convert_into(out, pcm, factor)
+    assert written == len(out)
+    return out
+
+
+def test_downmix_without_resampling():
+    pcm = np.array([[16384, 0], [-16384, -16384], [0, 32767]], np.int16)
+    assert convert(pcm, 1).tolist() == pytest.approx([0.25, -0.5, 0.5], abs=1e-4)
+
+
+def test_resampling_keeps_tones_in_place():
+    pcm = stereo_tone(2, 440)
+    out = convert(pcm, 3)
+
+    assert len(out) == 32000
+    expected = 0.5 * np.sin(2 * np.pi * 440 * np.arange(32000) / 16000)
+    # No filter delay, and the passband is untouched away from the edges
+    assert np.abs(out[100:-100] - expected[100:-100]).max() < 0.01
+
+
+def test_resampling_removes_aliases():
+    # 10 kHz is above the 8 kHz output Nyquist and would fold to 6 kHz
+    out = convert(stereo_tone(1, 10000), 3)
+    assert np.sqrt(np.mean(out[100:-100] ** 2)) < 0.01
+
+
+def test_chunked_matches_single_pass(monkeypatch):
+    pcm = stereo_tone(3.5, 1000) + stereo_tone(3.5, 3000, level=0.2)
+    whole = convert(pcm, 3)
+
+    # Filtered chunks end part-way through a decimation step
+    monkeypatch.setattr(audio, "CHUNK_SECONDS", 1)
+    chunked = convert(pcm, 3)
+
+    np.testing.assert_allclose(chunked, whole, atol=1e-6)
+
+
+def test_load_wav_16k(tmp_path):
+    path = tmp_path / "track.wav"
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(48000)
+        f.writeframes(stereo_tone(1, 440).tobytes())
+
+    assert read_wav_layout(path)[1:] == (2, 2, 48000, 48000)
+    loaded = load_wav_16k(path, spill_dir=tmp_path)
+    assert loaded.dtype == np.float32 and len(loaded) == 16000
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+import bot.client as client
+import bot.utils.config as config
+
+
+class Channel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.members = []
+        self.guild = types.SimpleNamespace(id=7)
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append(content)
+        return content
+
+
+class Recorder:
+    def __init__(self):
+        self.session_dir = Path("2026-10-19T10-00-00.000_05-30")
+        self.closed = threading.Event()
+
+    def cleanup(self):
+        self.closed.set()
+
+    async def wait_closed(self, timeout=60):
+        return await asyncio.to_thread(self.closed.wait, timeout)
+
+
+class VoiceClient:
+    def __init__(self, channel, recorder, close_delay):
+        self.channel = channel
+        self.guild = channel.guild
+        self.recorder = recorder
+        self.close_delay = close_delay
+        self.listening = True
+        self.disconnects = 0
+
+    def is_listening(self):
+        return self.listening
+
+    def stop_listening(self):
+        # voice_recv finishes the sink's cleanup later, on its own thread
+        self.listening = False
+        threading.Timer(self.close_delay, self.recorder.cleanup).start()
+
+    async def disconnect(self):
+        self.disconnects += 1
+        # Discord reports the bot's own departure as a voice state update
+        await client.on_voice_state_update(client.bot.user, state(self.channel), state(None))
+
+
+def state(channel):
+    return types.SimpleNamespace(channel=channel)
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    monkeypatch.setattr(config, "AUTO_LEAVE_SECONDS", 0.05)
+    submitted = []
+
+    async def submit(*args):
+        submitted.append(args)
+
+    monkeypatch.setattr(client.bot.scheduler, "submit", submit)
+    monkeypatch.setattr(client.bot.progress, "watch", lambda *args: None)
+
+    channel = Channel(1)
+    recorder = Recorder()
+    voice_client = VoiceClient(channel, recorder, close_delay=0.2)
+    monkeypatch.setattr(client.bot, "voice_client", voice_client)
+    monkeypatch.setattr(client.bot, "recorder", recorder)
+    monkeypatch.setattr(client.bot, "recording", True)
+    client.empty_timers.clear()
+    return types.SimpleNamespace(channel=channel, voice_client=voice_client, recorder=recorder, submitted=submitted)
+
+
+def test_events_share_one_timer(recording):
+    async def scenario():
+        member = types.SimpleNamespace(bot=False)
+        for _ in range(300):
+            await client.on_voice_state_update(member, state(recording.channel), state(None))
+        assert len(client.empty_timers) == 1
+
+        # Someone rejoins before the wait is over
+        recording.channel.members = [member]
+        await client.on_voice_state_update(member, state(None), state(recording.channel))
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert not client.empty_timers
+    assert recording.submitted == [] and recording.voice_client.disconnects == 0
+
+
+def test_rejoin_during_stop_still_submits(recording):
+    async def scenario():
+        member = types.SimpleNamespace(bot=False)
+        await client.on_voice_state_update(member, state(recording.channel), state(None))
+
+        # The wait is over and the recorder is being flushed when they come back
+        await asyncio.sleep(0.1)
+        recording.channel.members = [member]
+        await client.on_voice_state_update(member, state(None), state(recording.channel))
+        await asyncio.sleep(0.3)
+
+    asyncio.run(scenario())
+    assert recording.submitted == [(recording.recorder.session_dir, 7, None)]
+    assert recording.voice_client.disconnects == 1
+    assert client.bot.voice_client is None
+    assert recording.channel.sent == ["⏳ `2026-10-19T10-00-00.000_05-30` waiting for transcription"]
+
+
+def test_stop_twice_submits_once(recording):
+    async def scenario():
+        await asyncio.gather(
+            client.bot.stop_recording(recording.channel, reason="command"),
+            client.bot.stop_recording(reason="disconnected")
+        )
+
+    asyncio.run(scenario())
+    assert len(recording.submitted) == 1
+
+
+def test_unsaved_recording_is_not_submitted(recording, monkeypatch):
+    async def wait_closed(timeout=60):
+        return False
+
+    monkeypatch.setattr(recording.recorder, "wait_closed", wait_closed)
+    asyncio.run(client.bot.stop_recording(recording.channel, reason="command"))
+
+    assert recording.submitted == []
+    assert recording.channel.sent[0].startswith("❌ `2026-10-19T10-00-00.000_05-30` did not finish saving")
@@ -0,0 +1,53 @@
+import bot.processing.pipeline as pipeline
+import bot.utils.config as config
+from bot.processing import backfill
+from bot.utils.file_utils import safe_load_json, save_metadata_checkpoint
+from bot.utils.retention import delete_session_audio
+from bot.utils.session_index import is_transcribed
+from conftest import make_session
+
+
+def delete_audio(session_dir):
+    metadata = safe_load_json(session_dir / "metadata.json")
+    delete_session_audio(session_dir, metadata, "size")
+    save_metadata_checkpoint(session_dir, metadata)
+
+
+def test_select_skips_deleted_audio(sessions_dir):
+    kept = make_session(sessions_dir, session_id="2026-10-18T09-00-00.000_05-30")
+    deleted = make_session(sessions_dir)
+    delete_audio(deleted)
+
+    assert backfill.select_sessions(sessions_dir) == [kept]
+
+
+def test_backfill_session_skips_deleted_audio(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir)
+    delete_audio(session_dir)
+
+    backfill.init_worker("fake", "cpu", "int8", None)
+    assert backfill.backfill_session(str(session_dir), "balanced") == ("skipped", None)
+    assert fake_model.calls == 0
+    assert not (session_dir / "transcript.txt").exists()
+
+
+def test_cli_decoding_profile(sessions_dir, capsys):
+    make_session(sessions_dir)
+    backfill.main(["--sessions-dir", str(sessions_dir), "--decoding-profile", "fast", "--dry-run"])
+    assert "Selected 1 session(s)" in capsys.readouterr().out
+
+
+def test_worker_uses_selected_sessions_dir(tmp_path, fake_model, monkeypatch):
+    # The worker's config, as re-imported by a spawned process
+    monkeypatch.setattr(config, "SESSIONS_DIR", str(tmp_path / "default"))
+    monkeypatch.setattr(backfill, "load_model", pipeline.load_model)
+    monkeypatch.setattr(backfill, "_model", None)
+
+    other = tmp_path / "other"
+    session_dir = make_session(other)
+
+    backfill.init_worker("fake", "cpu", "int8", None, str(other))
+    assert backfill.backfill_session(str(session_dir), "balanced") == ("done", "ingest")
+
+    assert is_transcribed(session_dir.name, other)
+    assert not (tmp_path / "default").exists()
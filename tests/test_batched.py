@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from bot.processing.batched import ChunkPacker
+
+SAMPLING_RATE = 16000
+
+
+def test_locate_maps_pack_time_to_track_time():
+    packer = ChunkPacker()
+    alice = np.zeros(60 * SAMPLING_RATE, np.float32)
+    bob = np.zeros(30 * SAMPLING_RATE, np.float32)
+
+    # alice 10-20 s, bob 5-8 s, alice 40-45 s
+    packer.add("s1", "alice", alice, 10 * SAMPLING_RATE, 20 * SAMPLING_RATE)
+    packer.add("s2", "bob", bob, 5 * SAMPLING_RATE, 8 * SAMPLING_RATE)
+    packer.add("s1", "alice", alice, 40 * SAMPLING_RATE, 45 * SAMPLING_RATE)
+
+    assert packer.seconds() == 18
+    assert packer.clip_timestamps() == [
+        {"start": 0, "end": 10}, {"start": 10, "end": 13}, {"start": 13, "end": 18}
+    ]
+
+    for pack_time, track_time, owner in [
+        (0.0, 10.0, ("s1", "alice")),
+        (9.5, 19.5, ("s1", "alice")),
+        (10.0, 5.0, ("s2", "bob")),
+        (12.5, 7.5, ("s2", "bob")),
+        (13.0, 40.0, ("s1", "alice")),
+        (17.9, 44.9, ("s1", "alice")),
+    ]:
+        session, track, offset = packer.locate(pack_time)
+        assert (session, track) == owner
+        assert pack_time + offset == pytest.approx(track_time)
+
+
+def test_locate_before_first_chunk():
+    # Whisper can place a word's start slightly before 0
+    packer = ChunkPacker()
+    packer.add("s1", "alice", np.zeros(SAMPLING_RATE * 10, np.float32), SAMPLING_RATE * 3, SAMPLING_RATE * 5)
+    assert packer.locate(-0.02) == ("s1", "alice", 3.0)
+
+
+def test_reset_clears_pack():
+    packer = ChunkPacker()
+    packer.add("s1", "alice", np.zeros(SAMPLING_RATE, np.float32), 0, SAMPLING_RATE)
+    packer.reset()
+    assert packer.seconds() == 0 and packer.clip_timestamps() == []
@@ -0,0 +1,79 @@
+from bot.processing.dedupe import StagedSegment, find_echoes, find_track_echoes
+
+
+def segment(user_id, seq, start_ms, text, probability=None):
+    words = [[0, 0, word, probability] for word in text.split()] if probability is not None else None
+    return StagedSegment(user_id, seq, start_ms, start_ms + 2000, text, words)
+
+
+def row(seq, start_ms, text, probability):
+    return {
+        "seq": seq, "start_ms": start_ms, "end_ms": start_ms + 2000, "text": text,
+        "words": [[0, 0, word, probability] for word in text.split()]
+    }
+
+
+def test_less_confident_copy_is_the_echo():
+    segments = [
+        segment("alice", 0, 10_000, "Let's move the release to Thursday.", 0.9),
+        segment("bob", 0, 10_400, "let's move the release to thursday", 0.4),
+    ]
+    assert find_echoes(segments) == {("bob", 0): (("alice", 0), 1.0)}
+
+
+def test_neighbouring_bucket_is_searched():
+    # Either side of a 3 s bucket boundary
+    segments = [
+        segment("alice", 0, 2_900, "The budget review is next week.", 0.9),
+        segment("bob", 0, 3_100, "The budget review is next week.", 0.5),
+    ]
+    assert ("bob", 0) in find_echoes(segments)
+
+
+def test_not_echoes():
+    segments = [
+        # Too far apart
+        segment("alice", 0, 0, "The budget review is next week.", 0.9),
+        segment("bob", 0, 5_000, "The budget review is next week.", 0.5),
+        # Same speaker
+        segment("alice", 1, 20_000, "Can everyone see my screen now?"),
+        segment("alice", 2, 20_500, "Can everyone see my screen now?"),
+        # Short replies match by coincidence
+        segment("alice", 3, 30_000, "Yeah, okay."),
+        segment("bob", 1, 30_100, "Yeah, okay."),
+        # Different words
+        segment("alice", 4, 40_000, "I'll send the notes after lunch."),
+        segment("bob", 2, 40_200, "We still need a room for Friday."),
+    ]
+    assert find_echoes(segments) == {}
+
+
+def test_partial_echo_inside_longer_segment():
+    segments = [
+        segment("alice", 0, 0, "So the plan is to ship the beta on Monday and then collect feedback.", 0.9),
+        segment("bob", 0, 1_000, "ship the beta on Monday", 0.3),
+    ]
+    assert list(find_echoes(segments)) == [("bob", 0)]
+
+
+def test_echoes_point_at_the_clearest_copy():
+    # Three tracks hear the same phrase; the clearest one survives
+    segments = [
+        segment("alice", 0, 0, "Can everyone hear me okay?", 0.95),
+        segment("bob", 0, 200, "Can everyone hear me okay?", 0.6),
+        segment("carol", 0, 300, "Can everyone hear me okay?", 0.5),
+    ]
+    echoes = find_echoes(segments)
+    assert {key: source for key, (source, _) in echoes.items()} == {
+        ("bob", 0): ("alice", 0),
+        ("carol", 0): ("alice", 0),
+    }
+
+
+def test_find_track_echoes():
+    tracks = {
+        "1": [row(0, 0, "Let's move the release to Thursday.", 0.9)],
+        "2": [row(0, 300, "Let's move the release to Thursday.", 0.4), row(1, 9_000, "Sounds good to me then.", 0.9)],
+    }
+    assert find_track_echoes(tracks, "s") == [["2", 0, "1", 0, 1.0]]
+    assert find_track_echoes({"1": tracks["1"]}) == []
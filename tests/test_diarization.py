@@ -0,0 +1,62 @@
+import numpy as np
+
+from bot.processing.diarization import TrackDiarization, agglomerate, cluster_embeddings
+
+
+def unit(*values):
+    v = np.array(values, dtype=np.float64)
+    return v / np.linalg.norm(v)
+
+
+def test_similar_clusters_merge():
+    sums = np.array([unit(1, 0, 0), unit(0.95, 0.1, 0), unit(0, 1, 0), unit(0, 0.95, 0.1)]) * 10
+    counts = np.full(4, 10.0)
+    owner = agglomerate(sums, counts, threshold=0.5, max_speakers=6)
+    assert owner[0] == owner[1] and owner[2] == owner[3] and owner[0] != owner[2]
+
+
+def test_max_speakers_forces_merges():
+    sums = np.array([unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)]) * 10
+    counts = np.full(3, 10.0)
+    assert len(set(agglomerate(sums, counts, threshold=0.5, max_speakers=3))) == 3
+    assert len(set(agglomerate(sums, counts, threshold=0.5, max_speakers=2))) == 2
+
+
+def test_tiny_cluster_joins_its_nearest():
+    # One stray window, under MIN_CLUSTER_SHARE of the speech
+    sums = np.array([unit(1, 0, 0) * 100, unit(0, 1, 0) * 100, unit(0.2, 0, 1)])
+    counts = np.array([100.0, 100.0, 1.0])
+    owner = agglomerate(sums, counts, threshold=0.5, max_speakers=6)
+    assert owner[2] == owner[0] != owner[1]
+
+
+def test_inputs_are_not_modified():
+    sums = np.array([unit(1, 0), unit(1, 0.1)])
+    counts = np.array([1.0, 1.0])
+    agglomerate(sums, counts, threshold=0.5, max_speakers=6)
+    assert counts.tolist() == [1.0, 1.0]
+
+
+def test_cluster_embeddings_numbers_speakers_in_order():
+    rng = np.random.default_rng(0)
+    first, second = rng.normal(size=(2, 32))
+    embeddings = np.concatenate([
+        second + 0.05 * rng.normal(size=(40, 32)),
+        first + 0.05 * rng.normal(size=(40, 32)),
+        second + 0.05 * rng.normal(size=(20, 32)),
+    ])
+
+    labels = cluster_embeddings(embeddings, threshold=0.3, max_speakers=6)
+    assert labels.tolist() == [0] * 40 + [1] * 40 + [0] * 20
+    assert cluster_embeddings(np.zeros((0, 32))).tolist() == []
+
+
+def test_speaker_for():
+    times = np.array([[0.0, 1.5], [0.75, 2.25], [5.0, 6.5]])
+    diarization = TrackDiarization(times, np.array([0, 0, 1]))
+
+    assert diarization.speaker_for(0.2, 2.0) == "Speaker 1"
+    assert diarization.speaker_for(5.5, 6.0) == "Speaker 2"
+    # Between windows, the nearest one decides
+    assert diarization.speaker_for(4.0, 4.2) == "Speaker 2"
+    assert TrackDiarization(times, np.zeros(3, dtype=int)).speaker_for(0, 1) is None
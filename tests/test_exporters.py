@@ -0,0 +1,63 @@
+import pytest
+
+import bot.processing.exporters as exporters
+from bot.processing.exporters import MultiExporter
+
+ORIGIN_MS = 1_760_000_000_000
+
+
+@pytest.fixture
+def session_dir(sessions_dir):
+    path = sessions_dir / "2026-10-19T10-00-00.000_05-30"
+    path.mkdir()
+    return path
+
+
+def test_previous_transcript_stays_until_close(session_dir):
+    (session_dir / "transcript.txt").write_text("old\n", encoding="utf8")
+
+    out = MultiExporter(session_dir, ORIGIN_MS, ["txt", "srt"])
+    out.write(ORIGIN_MS, ORIGIN_MS + 1000, "1", "alice", "Hello.")
+    # A reader during the re-export sees the finished old file
+    assert (session_dir / "transcript.txt").read_text(encoding="utf8") == "old\n"
+    assert not (session_dir / "transcript.srt").exists()
+
+    out.close()
+    assert "alice: Hello." in (session_dir / "transcript.txt").read_text(encoding="utf8")
+    assert sorted(p.name for p in session_dir.iterdir()) == ["transcript.srt", "transcript.txt"]
+
+
+def test_failed_export_keeps_previous_transcript(session_dir):
+    (session_dir / "transcript.txt").write_text("old\n", encoding="utf8")
+
+    with pytest.raises(RuntimeError):
+        with MultiExporter(session_dir, ORIGIN_MS, ["txt"]) as out:
+            out.write(ORIGIN_MS, ORIGIN_MS + 1000, "1", "alice", "Hello.")
+            raise RuntimeError("database is locked")
+
+    assert (session_dir / "transcript.txt").read_text(encoding="utf8") == "old\n"
+    assert sorted(p.name for p in session_dir.iterdir()) == ["transcript.txt"]
+
+
+def test_opened_exporters_are_closed_when_one_fails(session_dir, monkeypatch):
+    opened = []
+
+    class Broken(exporters.Exporter):
+        extension = "broken"
+
+        def __init__(self, session_path, origin_ms):
+            raise OSError("disk full")
+
+    class Tracked(exporters.TextExporter):
+        def __init__(self, session_path, origin_ms):
+            super().__init__(session_path, origin_ms)
+            opened.append(self)
+
+    monkeypatch.setitem(exporters.EXPORTERS, "txt", Tracked)
+    monkeypatch.setitem(exporters.EXPORTERS, "broken", Broken)
+
+    with pytest.raises(OSError):
+        MultiExporter(session_dir, ORIGIN_MS, ["txt", "broken"])
+
+    assert opened[0].file.closed
+    assert list(session_dir.iterdir()) == []
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+import bot.utils.loop_monitor as loop_monitor
+from bot.utils.loop_monitor import LoopLagMonitor
+
+
+def blocking_callback():
+    time.sleep(0.3)
+
+
+def test_stall_is_logged(monkeypatch):
+    events = []
+    monkeypatch.setattr(loop_monitor, "log_event", lambda event, **fields: events.append((event, fields)))
+
+    async def scenario():
+        monitor = LoopLagMonitor(threshold=0.05, interval=0.02)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_callback()
+        await asyncio.sleep(0.05)
+        monitor.task.cancel()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+
+    assert monitor.stalls >= 1
+    lags = [fields for event, fields in events if event == "loop_lag" and "lag_ms" in fields]
+    assert lags and lags[0]["lag_ms"] >= 200
+
+    # The watchdog caught the loop inside the blocking call
+    blocked = [fields for event, fields in events if event == "loop_lag" and "blocked_ms" in fields]
+    assert blocked and "blocking_callback" in blocked[0]["stack"]
@@ -0,0 +1,120 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from bot.processing.migrate import migrate_db
+from bot.processing.transcript_db import SCHEMA_VERSION, create_schema, datetime_to_ms, init_db
+
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    db_path = tmp_path / "2026-10-19T10-00-00.000_05-30" / "transcriptions.db"
+    db_path.parent.mkdir()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+        CREATE TABLE transcripts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            user_id TEXT,
+            username TEXT,
+            text TEXT
+        )
+        """)
+        conn.executemany(
+            "INSERT INTO transcripts (timestamp, user_id, username, text) VALUES (?, ?, ?, ?)",
+            [
+                ("2026-10-19T10:00:01+05:30", "1", "alice", "Good morning."),
+                ("2026-10-19T10:00:03+05:30", "2", "bob", "Morning."),
+                ("2026-10-19T10:00:05+05:30", "1", "alice", "Shall we start?"),
+            ]
+        )
+    return db_path
+
+
+def test_legacy_schema_is_refused(legacy_db):
+    with pytest.raises(RuntimeError, match="legacy"):
+        init_db(legacy_db)
+
+
+def test_v0_to_v3(legacy_db):
+    assert migrate_db(legacy_db)
+    assert not migrate_db(legacy_db)
+
+    with sqlite3.connect(legacy_db) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert "speaker" in columns(conn, "segments")
+        rows = conn.execute(
+            "SELECT session_id, start_ms, end_ms, user_id, seq, text FROM transcripts ORDER BY start_ms"
+        ).fetchall()
+
+    start = datetime_to_ms(datetime.fromisoformat("2026-10-19T10:00:01+05:30"))
+    assert rows == [
+        (legacy_db.parent.name, start, start, "1", 0, "Good morning."),
+        (legacy_db.parent.name, start + 2000, start + 2000, "2", 0, "Morning."),
+        (legacy_db.parent.name, start + 4000, start + 4000, "1", 1, "Shall we start?"),
+    ]
+    init_db(legacy_db)
+
+
+def v2_db(tmp_path):
+    db_path = tmp_path / "transcriptions.db"
+    with sqlite3.connect(db_path) as conn:
+        create_schema(conn)
+        conn.execute("DROP TABLE segments")
+        conn.execute("DROP TABLE sub_speakers")
+        conn.execute("""
+        CREATE TABLE segments (
+            user_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            start_ms INTEGER NOT NULL,
+            end_ms INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            text TEXT NOT NULL,
+            words TEXT,
+            PRIMARY KEY (user_id, seq)
+        ) WITHOUT ROWID
+        """)
+        conn.execute(
+            "INSERT INTO transcripts VALUES ('s', 1000, '1', 0, 2000, 'alice', 'Hello.')"
+        )
+        conn.execute("PRAGMA user_version = 2")
+    return db_path
+
+
+@pytest.mark.parametrize("upgrade", [migrate_db, init_db])
+def test_v2_to_v3_keeps_transcripts(tmp_path, upgrade):
+    db_path = v2_db(tmp_path)
+    upgrade(db_path)
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert "speaker" in columns(conn, "segments")
+        assert conn.execute("SELECT text FROM transcripts").fetchall() == [("Hello.",)]
+        assert conn.execute("SELECT COUNT(*) FROM sub_speakers").fetchone()[0] == 0
+
+
+def test_v1_is_the_legacy_schema(legacy_db):
+    with sqlite3.connect(legacy_db) as conn:
+        conn.execute("PRAGMA user_version = 1")
+
+    with pytest.raises(RuntimeError, match="migrate"):
+        init_db(legacy_db)
+
+    assert migrate_db(legacy_db)
+    with sqlite3.connect(legacy_db) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0] == 3
+
+
+def test_empty_v1_gets_current_schema(tmp_path):
+    db_path = tmp_path / "transcriptions.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA user_version = 1")
+
+    assert migrate_db(db_path)
+    init_db(db_path)
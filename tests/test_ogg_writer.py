@@ -0,0 +1,109 @@
+import struct
+
+import pytest
+from faster_whisper import decode_audio
+
+from bot.voice.ogg_writer import OPUS_SILENCE, OggOpusWriter, ogg_crc, opus_packet_samples
+
+
+def read_pages(path):
+    """Returns (flags, granule, sequence, packet sizes, lacing count) per page, checking each CRC."""
+    data = path.read_bytes()
+    pages = []
+    offset = 0
+    while offset < len(data):
+        capture, version, flags, granule, serial, seq, crc, n_segments = struct.unpack_from(
+            "<4sBBqIIIB", data, offset
+        )
+        assert capture == b"OggS" and version == 0
+
+        lacing = data[offset + 27:offset + 27 + n_segments]
+        end = offset + 27 + n_segments + sum(lacing)
+
+        page = bytearray(data[offset:end])
+        page[22:26] = b"\x00\x00\x00\x00"
+        assert ogg_crc(page) == crc
+
+        sizes, size = [], 0
+        for value in lacing:
+            size += value
+            if value < 255:
+                sizes.append(size)
+                size = 0
+        pages.append((flags, granule, seq, sizes, n_segments))
+        offset = end
+    return pages
+
+
+def test_crc_matches_reference():
+    # CRC-32 with polynomial 0x04C11DB7, no reflection, zero init and final XOR
+    assert ogg_crc(b"123456789") == 0x89A1897F
+
+
+@pytest.mark.parametrize("packet, samples", [
+    (OPUS_SILENCE, 960),                 # CELT 20 ms, one frame
+    (bytes([0x01 << 3 | 1]), 1920),      # SILK 20 ms, two frames
+    (bytes([0x03 << 3 | 3, 3]), 8640),   # SILK 60 ms, three frames
+    (b"", 0),
+])
+def test_packet_samples(packet, samples):
+    assert opus_packet_samples(packet) == samples
+
+
+def test_pages(tmp_path):
+    path = tmp_path / "track.opus"
+    writer = OggOpusWriter(path, channels=2)
+    for _ in range(60):
+        writer.writeframes(OPUS_SILENCE)
+    writer.writeframes(b"\xf8" + b"\x00" * 299)
+    writer.close()
+
+    pages = read_pages(path)
+    assert [p[2] for p in pages] == list(range(len(pages)))
+
+    head, tags, *audio = pages
+    assert head[0] == 0x02 and head[1] == 0 and head[3] == [19]
+    assert tags[1] == 0
+    assert path.read_bytes()[28:36] == b"OpusHead"
+
+    # 50 packets per page, a 300 byte packet takes two lacing values
+    assert [len(p[3]) for p in audio] == [50, 11]
+    assert audio[1][3][-1] == 300 and audio[1][4] == 12
+    assert [p[1] for p in audio] == [50 * 960, 61 * 960]
+    assert audio[-1][0] == 0x04
+
+
+def test_page_holds_at_most_255_lacing_values(tmp_path):
+    path = tmp_path / "track.opus"
+    writer = OggOpusWriter(path)
+    # 40 packets of 7 lacing values each
+    for _ in range(40):
+        writer.writeframes(b"\xf8" + b"\x00" * 1600)
+    writer.close()
+
+    audio = read_pages(path)[2:]
+    assert [len(p[3]) for p in audio] == [36, 4]
+    assert all(p[4] <= 255 for p in audio)
+
+
+def test_checkpoint_leaves_a_readable_file(tmp_path):
+    path = tmp_path / "track.opus"
+    writer = OggOpusWriter(path)
+    for _ in range(10):
+        writer.writeframes(OPUS_SILENCE)
+    writer.checkpoint()
+
+    # The file is complete up to the checkpoint while still open
+    pages = read_pages(path)
+    assert pages[-1][1] == 10 * 960 and pages[-1][0] == 0x00
+    writer.close()
+
+
+def test_decodes_to_recorded_length(tmp_path):
+    path = tmp_path / "track.opus"
+    writer = OggOpusWriter(path)
+    for _ in range(100):
+        writer.writeframes(OPUS_SILENCE)
+    writer.close()
+
+    assert len(decode_audio(str(path), sampling_rate=16000)) == 2 * 16000
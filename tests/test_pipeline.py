@@ -0,0 +1,164 @@
+import sqlite3
+
+import pytest
+
+import bot.processing.pipeline as pipeline
+import bot.processing.transcriber as transcriber
+import bot.utils.config as config
+from bot.processing.pipeline import PipelineContext, SessionPipeline, run_session_pipeline
+from bot.utils.file_utils import safe_load_json, save_metadata_checkpoint
+from bot.utils.retention import compress_session, delete_session_audio
+from conftest import make_session
+
+
+def run(session_dir, **kwargs):
+    run_session_pipeline(session_dir, "fake", "cpu", "int8", None, **kwargs)
+
+
+def stale_stage(session_dir):
+    return SessionPipeline(PipelineContext(session_dir, "fake", "cpu", "int8", None)).stale_stage()
+
+
+def archive(session_dir, keep_hash=True):
+    metadata = safe_load_json(session_dir / "metadata.json")
+    compress_session(session_dir, metadata, "flac")
+    if not keep_hash:
+        for user in metadata["users"].values():
+            del user["audio_hash"]
+    save_metadata_checkpoint(session_dir, metadata)
+
+
+def transcript_rows(session_dir):
+    with sqlite3.connect(session_dir / "transcriptions.db") as conn:
+        return conn.execute("SELECT user_id, text FROM transcripts ORDER BY user_id").fetchall()
+
+
+# ---------- Deleted audio ----------
+
+def test_deleted_audio_keeps_transcript(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+    rows = transcript_rows(session_dir)
+    transcript = (session_dir / "transcript.txt").read_text(encoding="utf8")
+    assert len(rows) == 2 and transcript
+
+    metadata = safe_load_json(session_dir / "metadata.json")
+    delete_session_audio(session_dir, metadata, "age")
+    save_metadata_checkpoint(session_dir, metadata)
+
+    with pytest.raises(FileNotFoundError, match="deleted by retention"):
+        run(session_dir, force={"merge"})
+
+    assert transcript_rows(session_dir) == rows
+    assert (session_dir / "transcript.txt").read_text(encoding="utf8") == transcript
+
+
+def test_missing_track_is_refused(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+    rows = transcript_rows(session_dir)
+
+    (session_dir / "users" / "2.bob.wav").unlink()
+    with pytest.raises(FileNotFoundError, match="bob"):
+        run(session_dir)
+
+    assert transcript_rows(session_dir) == rows
+
+
+# ---------- Cache keys ----------
+
+def test_rerun_is_cached(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+    assert fake_model.calls == 2
+
+    assert stale_stage(session_dir) is None
+    run(session_dir)
+    assert fake_model.calls == 2
+
+
+def test_changed_track_is_retranscribed(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+
+    with open(session_dir / "users" / "2.bob.wav", "r+b") as f:
+        f.seek(-2, 2)
+        f.write(b"\x01\x00")
+
+    assert stale_stage(session_dir) == "ingest"
+    run(session_dir)
+    assert fake_model.calls == 3
+
+
+@pytest.mark.parametrize("keep_hash", [True, False], ids=["hash_in_metadata", "memoized_hash"])
+def test_archived_session_stays_cached(sessions_dir, fake_model, keep_hash):
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+
+    archive(session_dir, keep_hash)
+    assert sorted(p.suffix for p in (session_dir / "users").iterdir()) == [".flac", ".flac"]
+
+    assert stale_stage(session_dir) is None
+    run(session_dir)
+    assert fake_model.calls == 2
+
+
+@pytest.mark.parametrize("keep_hash", [True, False], ids=["hash_in_metadata", "memoized_hash"])
+def test_archived_session_keeps_diarization_cache(sessions_dir, fake_model, monkeypatch, keep_hash):
+    diarizations = []
+
+    def diarize_track(*args):
+        diarizations.append(real_diarize_track(*args))
+        return diarizations[-1]
+
+    real_diarize_track = transcriber.diarize_track
+    monkeypatch.setattr(transcriber, "diarize_track", diarize_track)
+
+    session_dir = make_session(sessions_dir, names=("alice",), seconds=3)
+    metadata = safe_load_json(session_dir / "metadata.json")
+    metadata["users"]["1"]["shared"] = True
+    save_metadata_checkpoint(session_dir, metadata)
+
+    run(session_dir)
+    archive(session_dir, keep_hash)
+    # Re-transcribed, e.g. with another model
+    transcript = session_dir / pipeline.ARTIFACTS_DIR / "transcribe" / "1.jsonl"
+    transcript.unlink()
+    run(session_dir)
+    assert [d.cached for d in diarizations] == [False, True]
+
+    # A new VAD config finds other speech, which needs its own embeddings
+    monkeypatch.setattr(config, "VAD_SPEECH_PAD_MS", config.VAD_SPEECH_PAD_MS + 100)
+    monkeypatch.setattr(pipeline, "get_speech_timestamps", lambda audio, options: [{"start": 0, "end": 16000}])
+    run(session_dir)
+    assert [d.cached for d in diarizations] == [False, True, False]
+
+
+# ---------- Language detection ----------
+
+def test_detection_reuses_vad_speech(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir, names=("alice",), seconds=45)
+    run(session_dir)
+
+    # The first 30 s of speech the VAD stage found, not a second VAD pass over the track
+    assert fake_model.detections == [(30 * 16000, False)]
+
+
+# ---------- Summary ----------
+
+def test_empty_transcript_summary_is_cached(sessions_dir, fake_model, monkeypatch):
+    monkeypatch.setattr(config, "SUMMARY_BACKEND", "extractive")
+    monkeypatch.setattr(pipeline, "get_speech_timestamps", lambda audio, options: [])
+    session_dir = make_session(sessions_dir)
+
+    run(session_dir)
+    assert transcript_rows(session_dir) == []
+    assert not (session_dir / "summary.md").exists()
+    assert stale_stage(session_dir) is None
+
+
+def test_cli_decoding_profile(sessions_dir, monkeypatch):
+    profiles = []
+    monkeypatch.setattr(pipeline, "run_session_pipeline", lambda *args, profile, force: profiles.append(profile))
+    pipeline.main(["--decoding-profile", "fast", str(sessions_dir)])
+    assert profiles == ["fast"]
@@ -0,0 +1,36 @@
+import bot.utils.config as config
+from bot.utils.file_utils import safe_load_json
+from bot.utils.retention import run_maintenance
+from bot.utils.session_index import upsert_session
+from conftest import make_session
+
+
+def transcribed_session(sessions_dir, session_id):
+    session_dir = make_session(sessions_dir, session_id=session_id)
+    upsert_session(session_dir, safe_load_json(session_dir / "metadata.json"), transcribed=True)
+    return session_dir
+
+
+def audio_suffixes(session_dir):
+    return sorted(p.suffix for p in (session_dir / "users").iterdir())
+
+
+def test_busy_is_checked_before_each_session(sessions_dir, monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_CODEC", "flac")
+    monkeypatch.setattr(config, "RETENTION_AUDIO_DAYS", 0)
+    monkeypatch.setattr(config, "RETENTION_MAX_GB", 0)
+
+    first = transcribed_session(sessions_dir, "2026-10-18T09-00-00.000_05-30")
+    second = transcribed_session(sessions_dir, "2026-10-19T10-00-00.000_05-30")
+
+    # A re-pass of the second session is queued while the first is compressed
+    calls = []
+
+    def busy():
+        calls.append(None)
+        return {second.name} if len(calls) > 1 else set()
+
+    run_maintenance(sessions_dir, busy)
+
+    assert audio_suffixes(first) == [".flac", ".flac"]
+    assert audio_suffixes(second) == [".wav", ".wav"]
@@ -0,0 +1,136 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import types
+
+import pytest
+
+import bot.processing.scheduler as scheduler
+from bot.processing.scheduler import DevicePool, TranscriptionJob, TranscriptionScheduler
+from bot.processing.progress import ProgressMonitor
+from conftest import make_session
+
+
+class FakeProcess:
+    exitcode = 0
+
+    def is_alive(self):
+        return False
+
+    def join(self):
+        pass
+
+
+@pytest.fixture
+def started(monkeypatch):
+    """Session IDs of every worker the scheduler spawns."""
+    started = []
+
+    def spawn(session_dir, *args):
+        started.append(session_dir.name)
+        return FakeProcess()
+
+    monkeypatch.setattr(scheduler, "spawn_processing", spawn)
+    return started
+
+
+def make_scheduler(gpu_workers=1, cpu_workers=1):
+    tasks = TranscriptionScheduler()
+    tasks.pools = [
+        DevicePool("gpu", "cuda", "large-v3", "float16", 24, gpu_workers),
+        DevicePool("cpu", "cpu", "small", "int8", 8, cpu_workers, fallback=True),
+    ]
+    return tasks
+
+
+def job(name, audio_s, guild_id=None, idle=False):
+    return TranscriptionJob(name, audio_s, guild_id, "balanced", idle, repass=False)
+
+
+def test_order_is_fair_then_shortest(started):
+    tasks = make_scheduler(gpu_workers=0, cpu_workers=0)
+    tasks.pending = [
+        job("idle", 1, "a", idle=True),
+        job("long", 600, "a"),
+        job("short", 60, "a"),
+        job("busy-guild", 10, "b"),
+    ]
+    tasks.pools[0].running = [types.SimpleNamespace(guild_id="b", process=FakeProcess())]
+
+    assert [j.session_id for j in tasks.ordered_pending()] == ["short", "long", "busy-guild", "idle"]
+
+
+def test_repass_never_uses_fallback_pool(started):
+    # GPU full: normal work spills over to the CPU pool, re-passes wait
+    tasks = make_scheduler(gpu_workers=0)
+    tasks.pending = [job("repass", 60, idle=True)]
+    tasks.pump()
+    assert started == []
+
+    tasks.pending.append(job("draft", 60))
+    tasks.pump()
+    assert started == ["draft"]
+    assert [j.session_id for j in tasks.pending] == ["repass"]
+
+
+def test_submit_estimates_audio(sessions_dir, started):
+    session_dir = make_session(sessions_dir, seconds=3)
+    tasks = make_scheduler()
+
+    queued = asyncio.run(tasks.submit(session_dir))
+    assert queued.audio_s == pytest.approx(6.0)
+    assert started == [session_dir.name]
+
+
+def test_reap_returns_finished_drafts(started):
+    tasks = make_scheduler()
+    draft = TranscriptionJob("draft", 60, None, "fast", repass=True)
+    final = TranscriptionJob("final", 60, None, "accurate", repass=False)
+    for queued in (draft, final):
+        queued.process = FakeProcess()
+        tasks.pools[0].running.append(queued)
+
+    assert tasks.reap() == [draft]
+    assert tasks.running_jobs() == []
+
+
+def oom_killed():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_killed_worker_reports_failure(monkeypatch):
+    events = []
+    tasks = make_scheduler()
+    tasks.progress_queue = types.SimpleNamespace(put=events.append)
+
+    def spawn(*args):
+        process = multiprocessing.Process(target=oom_killed)
+        process.start()
+        return process
+
+    monkeypatch.setattr(scheduler, "spawn_processing", spawn)
+    tasks.pending = [job("killed", 60)]
+    tasks.pump()
+    tasks.running_jobs()[0].process.join()
+
+    assert tasks.reap() == []
+    failure = {"session_id": "killed", "event": "failed", "error": f"worker exited with {-signal.SIGKILL}"}
+    assert failure in events
+
+    # The status message is finalized and dropped
+    monitor = ProgressMonitor()
+    status = monitor.watch("killed")
+    monitor.handle({"session_id": "killed", "event": "started"})
+    monitor.handle(failure)
+    asyncio.run(monitor.flush(status))
+    assert status.render() == f"❌ `killed` transcription failed: worker exited with {-signal.SIGKILL}"
+    assert monitor.sessions == {}
+
+
+def test_worker_error_is_kept():
+    monitor = ProgressMonitor()
+    status = monitor.watch("s")
+    monitor.handle({"session_id": "s", "event": "failed", "error": "CUDA out of memory"})
+    monitor.handle({"session_id": "s", "event": "failed", "error": "worker exited with 1"})
+    assert status.last["error"] == "CUDA out of memory"
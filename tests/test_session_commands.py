@@ -0,0 +1,53 @@
+import gzip
+import os
+
+import bot.utils.config as config
+from bot.commands.session_commands import prepare_transcript_file, resolve_session_dir, transcript_ready
+from bot.processing.transcript_db import init_db
+from bot.utils.file_utils import safe_load_json
+from bot.utils.session_index import upsert_session
+from conftest import make_session
+from test_pipeline import run
+
+
+def test_not_ready_while_processing(sessions_dir):
+    session_dir = make_session(sessions_dir)
+    # As the recorder leaves it, then the first thing a worker does
+    upsert_session(session_dir, safe_load_json(session_dir / "metadata.json"), transcribed=False)
+    init_db(session_dir / "transcriptions.db")
+
+    assert resolve_session_dir(session_dir.name) == session_dir
+    assert not transcript_ready(session_dir)
+
+
+def test_ready_once_transcribed(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+    assert transcript_ready(session_dir)
+
+
+def test_unindexed_session_uses_manifest(sessions_dir, fake_model):
+    session_dir = make_session(sessions_dir)
+    init_db(session_dir / "transcriptions.db")
+    assert not transcript_ready(session_dir)
+
+    run(session_dir)
+    (sessions_dir / "index.db").unlink()
+    assert transcript_ready(session_dir)
+
+
+def test_gzip_follows_reexport(sessions_dir, fake_model, monkeypatch):
+    monkeypatch.setattr(config, "TRANSCRIPT_GZIP_THRESHOLD", 0)
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+
+    gz_path = prepare_transcript_file(session_dir, "txt")
+    assert gzip.decompress(gz_path.read_bytes()) == (session_dir / "transcript.txt").read_bytes()
+
+    # A re-pass swaps in a transcript written before the old one was gzipped
+    path = session_dir / "transcript.txt"
+    path.write_text("re-pass\n", encoding="utf8")
+    old = gz_path.stat().st_mtime_ns - 1_000_000_000
+    os.utime(path, ns=(old, old))
+
+    assert gzip.decompress(prepare_transcript_file(session_dir, "txt").read_bytes()) == b"re-pass\n"
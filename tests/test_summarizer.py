@@ -0,0 +1,47 @@
+import asyncio
+
+import bot.processing.summarizer as summarizer
+import bot.utils.config as config
+from bot.processing.summarizer import SUMMARY_FILE, ExtractiveBackend, SummaryRefresher, refresh_in_worker
+from conftest import make_session
+from test_pipeline import run
+
+
+def test_worker_loads_backend_once(sessions_dir, fake_model, monkeypatch):
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+
+    loads = []
+
+    def load_backend():
+        loads.append(None)
+        return ExtractiveBackend()
+
+    monkeypatch.setattr(summarizer, "_backend", None)
+    monkeypatch.setattr(summarizer, "load_backend", load_backend)
+
+    for _ in range(2):
+        assert refresh_in_worker(str(session_dir)) == str(session_dir / SUMMARY_FILE)
+    assert len(loads) == 1
+
+
+def test_refresh_runs_in_worker_process(sessions_dir, fake_model, monkeypatch):
+    session_dir = make_session(sessions_dir)
+    run(session_dir)
+
+    # Read again by the spawned worker
+    monkeypatch.setenv("LOG_FILE", str(config.LOG_FILE))
+    monkeypatch.setenv("SUMMARY_BACKEND", "extractive")
+
+    refresher = SummaryRefresher()
+
+    async def refresh_twice():
+        return await asyncio.gather(refresher.refresh(session_dir), refresher.refresh(session_dir))
+
+    try:
+        paths = asyncio.run(refresh_twice())
+    finally:
+        refresher.pool.shutdown()
+
+    assert paths == [session_dir / SUMMARY_FILE] * 2
+    assert (session_dir / SUMMARY_FILE).read_text(encoding="utf8").startswith("# Meeting summary")
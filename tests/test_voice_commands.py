@@ -0,0 +1,104 @@
+import asyncio
+import types
+
+import discord
+import pytest
+
+import bot.commands.voice_commands as voice_commands
+import bot.utils.config as config
+from bot import MeetingBot
+
+
+class Captions:
+    started = []
+
+    def __init__(self, channel, guild_id=None):
+        self.closed = False
+        Captions.started.append(self)
+
+    async def start(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class Interaction:
+    def __init__(self):
+        self.sent = []
+        self.response = types.SimpleNamespace(defer=self.defer)
+        self.followup = types.SimpleNamespace(send=self.send)
+
+    async def defer(self, ephemeral=False):
+        pass
+
+    async def send(self, content, ephemeral=False):
+        self.sent.append(content)
+
+
+class VoiceClient:
+    channel = types.SimpleNamespace(id=1)
+    guild = types.SimpleNamespace(id=7)
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def listen(self, sink):
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def meeting_bot(monkeypatch):
+    monkeypatch.setattr(config, "RECORD_OPUS", False)
+    monkeypatch.setattr(voice_commands, "LiveCaptions", Captions)
+    Captions.started.clear()
+
+    meeting_bot = MeetingBot(command_prefix="?", intents=discord.Intents.none())
+    voice_commands.setup_voice_commands(meeting_bot)
+    return meeting_bot
+
+
+def record(meeting_bot, interaction):
+    command = meeting_bot.tree.get_command("record")
+    asyncio.run(command.callback(interaction, captions=types.SimpleNamespace(mention="#captions")))
+
+
+def test_captions_closed_when_recorder_fails(meeting_bot, monkeypatch):
+    async def create(channel=None, captions=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(voice_commands.Recorder, "create", create)
+    meeting_bot.voice_client = VoiceClient()
+
+    interaction = Interaction()
+    record(meeting_bot, interaction)
+
+    assert Captions.started[0].closed
+    assert interaction.sent == ["Failed to start recording: disk full"]
+    assert not meeting_bot.recording and meeting_bot.recorder is None
+
+
+def test_recorder_cleaned_up_when_listen_fails(meeting_bot, monkeypatch):
+    recorders = []
+
+    class Recorder:
+        def __init__(self, captions):
+            self.captions = captions
+            recorders.append(self)
+
+        def cleanup(self):
+            self.captions.close()
+
+    async def create(channel=None, captions=None):
+        return Recorder(captions)
+
+    monkeypatch.setattr(voice_commands.Recorder, "create", create)
+    meeting_bot.voice_client = VoiceClient(RuntimeError("not connected"))
+
+    interaction = Interaction()
+    record(meeting_bot, interaction)
+
+    assert Captions.started[0].closed
+    assert interaction.sent == ["Failed to start recording: not connected"]
+    assert meeting_bot.recorder is None
@@ -1,6 +1,8 @@
 """Command-line argument parsing"""
 import argparse
 
+from bot.processing.profiles import PROFILES
+
 
 def parse_arguments():
     """Parse command-line arguments for the bot"""
@@ -10,5 +12,11 @@ def parse_arguments():
     parser.add_argument("--model", type=str, help="Specific Whisper model to use (e.g., base, small, medium, large-v3)")
     parser.add_argument("--cuda-path", type=str, help="Path to CUDA toolkit installation")
     parser.add_argument("--cache-dir", type=str, help="Custom directory for huggingface cache")
+    parser.add_argument("--decoding-profile", choices=list(PROFILES), help="Default decoding profile for transcription")
+    parser.add_argument("--accurate-repass", action="store_true", help="Re-transcribe fast drafts with the accurate profile when idle")
+    parser.add_argument("--metrics-port", type=int, help="Port for the local /metrics endpoint (0 disables it)")
+    parser.add_argument("--profile", type=float, nargs="?", const=60, metavar="SECONDS",
+                        help="Profile CPU and memory of each recording and transcription worker for SECONDS (default 60)")
+    parser.add_argument("--record-opus", action="store_true", help="Store raw Opus packets (.opus) instead of decoded WAVs")
     
     return parser.parse_args()